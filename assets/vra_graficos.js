@@ -0,0 +1,213 @@
+/*
+ * Biblioteca mínima de gráficos em SVG usada pelo dashboard no modo --output-mode json.
+ * Não tem dependências nem acessa a internet: desenha barras, linhas e pizza
+ * a partir do JSON de agregados gerado pelo results.py.
+ */
+(function (global) {
+    'use strict';
+
+    var SVG_NS = 'http://www.w3.org/2000/svg';
+    var WIDTH = 1000;
+
+    function el(name, attrs, text) {
+        var node = document.createElementNS(SVG_NS, name);
+        Object.keys(attrs || {}).forEach(function (key) {
+            node.setAttribute(key, attrs[key]);
+        });
+        if (text !== undefined) {
+            node.textContent = text;
+        }
+        return node;
+    }
+
+    function formatValue(value, format) {
+        if (format === 'percent') {
+            return value.toFixed(1) + '%';
+        }
+        return String(value);
+    }
+
+    // Arredonda o topo do eixo para um valor "redondo" (1, 2, 5 x 10^n)
+    function niceMax(value) {
+        if (value <= 0) {
+            return 1;
+        }
+        var magnitude = Math.pow(10, Math.floor(Math.log10(value)));
+        var steps = [1, 2, 5, 10];
+        for (var i = 0; i < steps.length; i++) {
+            if (value <= steps[i] * magnitude) {
+                return steps[i] * magnitude;
+            }
+        }
+        return 10 * magnitude;
+    }
+
+    function newSvg(height) {
+        return el('svg', {
+            viewBox: '0 0 ' + WIDTH + ' ' + height,
+            width: '100%',
+            role: 'img',
+            'font-family': 'Segoe UI, Tahoma, Geneva, Verdana, sans-serif'
+        });
+    }
+
+    function drawTitle(svg, spec) {
+        svg.appendChild(el('text', {
+            x: WIDTH / 2, y: 28, 'text-anchor': 'middle', 'font-size': 20, 'font-weight': 'bold'
+        }, spec.title));
+    }
+
+    // Eixo Y com linhas de grade; devolve a função que converte valor em y
+    function drawValueAxis(svg, spec, box, maxValue) {
+        var top = niceMax(maxValue * 1.08);
+        var ticks = 5;
+        for (var i = 0; i <= ticks; i++) {
+            var value = top * i / ticks;
+            var y = box.bottom - (box.bottom - box.top) * i / ticks;
+            svg.appendChild(el('line', {
+                x1: box.left, x2: box.right, y1: y, y2: y, stroke: '#000', 'stroke-opacity': i ? 0.1 : 0.6
+            }));
+            svg.appendChild(el('text', {
+                x: box.left - 8, y: y + 4, 'text-anchor': 'end', 'font-size': 12
+            }, formatValue(Math.round(value * 100) / 100, spec.format)));
+        }
+        svg.appendChild(el('text', {
+            x: 18, y: (box.top + box.bottom) / 2, 'text-anchor': 'middle', 'font-size': 14,
+            transform: 'rotate(-90 18 ' + (box.top + box.bottom) / 2 + ')'
+        }, spec.ylabel || ''));
+        svg.appendChild(el('text', {
+            x: (box.left + box.right) / 2, y: box.height - 8, 'text-anchor': 'middle', 'font-size': 14
+        }, spec.xlabel || ''));
+        return function (v) {
+            return box.bottom - (box.bottom - box.top) * v / top;
+        };
+    }
+
+    function categoryLabel(svg, label, x, y, rotate) {
+        var attrs = {x: x, y: y, 'font-size': 12, 'text-anchor': rotate ? 'end' : 'middle'};
+        if (rotate) {
+            attrs.transform = 'rotate(-45 ' + x + ' ' + y + ')';
+        }
+        svg.appendChild(el('text', attrs, label));
+    }
+
+    function barChart(container, spec) {
+        var height = spec.rotateLabels ? 620 : 520;
+        var box = {left: 80, right: WIDTH - 20, top: 60, bottom: height - (spec.rotateLabels ? 200 : 70), height: height};
+        var svg = newSvg(height);
+        drawTitle(svg, spec);
+        var values = spec.values;
+        var y = drawValueAxis(svg, spec, box, Math.max.apply(null, values.concat([0])));
+        var slot = (box.right - box.left) / Math.max(values.length, 1);
+        values.forEach(function (value, i) {
+            var x = box.left + slot * i;
+            var bar = el('rect', {
+                x: x + slot * 0.1, y: y(value), width: slot * 0.8, height: box.bottom - y(value),
+                fill: spec.color, 'fill-opacity': 0.8
+            });
+            bar.appendChild(el('title', {}, spec.labels[i] + ': ' + formatValue(value, spec.format)));
+            svg.appendChild(bar);
+            if (value > 0 || !spec.skipZero) {
+                svg.appendChild(el('text', {
+                    x: x + slot / 2, y: y(value) - 4, 'text-anchor': 'middle', 'font-size': 11, 'font-weight': 'bold'
+                }, formatValue(value, spec.format)));
+            }
+            categoryLabel(svg, String(spec.labels[i]), x + slot / 2, box.bottom + 18, spec.rotateLabels);
+        });
+        container.appendChild(svg);
+    }
+
+    function lineChart(container, spec) {
+        var height = 520;
+        var box = {left: 80, right: WIDTH - 40, top: 60, bottom: height - 70, height: height};
+        var svg = newSvg(height);
+        drawTitle(svg, spec);
+        var values = spec.values;
+        var y = drawValueAxis(svg, spec, box, Math.max.apply(null, values.concat([0])));
+        var step = values.length > 1 ? (box.right - box.left - 40) / (values.length - 1) : 0;
+        var points = values.map(function (value, i) {
+            return [box.left + 20 + step * i + (values.length > 1 ? 0 : (box.right - box.left - 40) / 2), y(value)];
+        });
+        svg.appendChild(el('polyline', {
+            points: points.map(function (p) { return p.join(','); }).join(' '),
+            fill: 'none', stroke: spec.color, 'stroke-width': 3
+        }));
+        points.forEach(function (p, i) {
+            svg.appendChild(el('circle', {cx: p[0], cy: p[1], r: 6, fill: spec.color}));
+            svg.appendChild(el('text', {
+                x: p[0], y: p[1] - 12, 'text-anchor': 'middle', 'font-size': 12, 'font-weight': 'bold'
+            }, formatValue(values[i], spec.format)));
+            categoryLabel(svg, String(spec.labels[i]), p[0], box.bottom + 18, false);
+        });
+        container.appendChild(svg);
+    }
+
+    function pieChart(container, spec) {
+        var height = 560;
+        var svg = newSvg(height);
+        drawTitle(svg, spec);
+        var cx = WIDTH / 2, cy = height / 2 + 20, r = 200;
+        var total = spec.values.reduce(function (a, b) { return a + b; }, 0) || 1;
+        var colors = spec.colors || [spec.color];
+        // Começa no topo (90 graus), no sentido anti-horário, como no Matplotlib
+        var angle = Math.PI / 2;
+        spec.values.forEach(function (value, i) {
+            var sweep = 2 * Math.PI * value / total;
+            var end = angle + sweep;
+            var x1 = cx + r * Math.cos(angle), y1 = cy - r * Math.sin(angle);
+            var x2 = cx + r * Math.cos(end), y2 = cy - r * Math.sin(end);
+            var color = colors[i % colors.length];
+            var path = value >= total
+                ? el('circle', {cx: cx, cy: cy, r: r, fill: color})
+                : el('path', {
+                    d: 'M' + cx + ',' + cy + ' L' + x1 + ',' + y1 +
+                       ' A' + r + ',' + r + ' 0 ' + (sweep > Math.PI ? 1 : 0) + ',0 ' + x2 + ',' + y2 + ' Z',
+                    fill: color
+                });
+            svg.appendChild(path);
+            var middle = angle + sweep / 2;
+            svg.appendChild(el('text', {
+                x: cx + r * 0.6 * Math.cos(middle), y: cy - r * 0.6 * Math.sin(middle) + 5,
+                'text-anchor': 'middle', 'font-size': 15, 'font-weight': 'bold', fill: '#fff'
+            }, (100 * value / total).toFixed(1) + '%'));
+            svg.appendChild(el('text', {
+                x: cx + r * 1.15 * Math.cos(middle), y: cy - r * 1.15 * Math.sin(middle) + 5,
+                'text-anchor': Math.cos(middle) >= 0 ? 'start' : 'end', 'font-size': 15
+            }, spec.labels[i]));
+            angle = end;
+        });
+        container.appendChild(svg);
+    }
+
+    var KINDS = {bar: barChart, line: lineChart, pie: pieChart};
+
+    function render(container, spec) {
+        container.textContent = '';
+        KINDS[spec.kind](container, spec);
+    }
+
+    function renderAll(data) {
+        var nodes = document.querySelectorAll('[data-chart]');
+        Array.prototype.forEach.call(nodes, function (node) {
+            var spec = data.charts[node.getAttribute('data-chart')];
+            if (spec) {
+                render(node, spec);
+            }
+        });
+    }
+
+    function load(url) {
+        return fetch(url)
+            .then(function (response) { return response.json(); })
+            .then(renderAll)
+            .catch(function () {
+                var nodes = document.querySelectorAll('[data-chart]');
+                Array.prototype.forEach.call(nodes, function (node) {
+                    node.textContent = 'Não foi possível carregar ' + url +
+                        '. Abra o dashboard por um servidor web (por exemplo: python -m http.server).';
+                });
+            });
+    }
+
+    global.VraGraficos = {render: render, renderAll: renderAll, load: load};
+})(window);
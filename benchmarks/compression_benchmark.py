@@ -0,0 +1,151 @@
+"""Compara o espaço em disco e a velocidade de leitura dos CSVs sem compressão,
+com gzip e com zstd.
+
+Usa os mesmos CSVs sintéticos de run_benchmarks.py (benchmarks/data/<tamanho>/all)
+e grava uma cópia comprimida de cada um em benchmarks/data/<tamanho>/compressao/.
+Para cada compressão mede:
+    disco        - bytes ocupados e razão em relação ao CSV puro
+    descompressão - leitura do arquivo inteiro descomprimido, sem parse (MB/s)
+    leitura      - vra_schema.read_vra_csv de todos os arquivos, sem cache (linhas/s)
+
+Em volumes lentos a leitura comprimida costuma ganhar, porque lê menos bytes;
+com os arquivos no page cache o disco some da conta. Use --drop-caches (root,
+Linux) para medir com o cache do sistema limpo antes de cada leitura.
+
+Exemplo:
+    python benchmarks/compression_benchmark.py --size 1M --output benchmarks/compressao.json
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run_benchmarks
+import vra_format
+import vra_schema
+import vra_compression
+
+COMPRESSIONS = ['none', 'gzip'] + (['zstd'] if vra_compression.HAS_ZSTD else [])
+
+
+def prepare_compressed(workdir, compression):
+    """Copia os CSVs de workdir/all com a compressão pedida (uma vez só); retorna os caminhos"""
+    sources = sorted(glob.glob(os.path.join(workdir, 'all', '*.csv')))
+    if compression == 'none':
+        return sources
+    target_dir = os.path.join(workdir, 'compressao', compression)
+    os.makedirs(target_dir, exist_ok=True)
+    paths = []
+    for source in sources:
+        path = vra_compression.with_suffix(os.path.join(target_dir, os.path.basename(source)), compression)
+        if not os.path.exists(path):
+            tmp_path = path + '.tmp'
+            with open(source, 'rb') as src, open(tmp_path, 'wb') as raw:
+                writer = vra_compression.compressing_writer(raw, compression)
+                for chunk in iter(lambda: src.read(1024 * 1024), b''):
+                    writer.write(chunk)
+                writer.close()
+            os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+
+def drop_caches():
+    """Esvazia o page cache do Linux (precisa de root); retorna se conseguiu"""
+    try:
+        subprocess.run(['sync'], check=True)
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3\n')
+        return True
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+
+def measure(paths, repeat, clear_cache):
+    """Melhor tempo (de `repeat`) para descomprimir e para ler com o esquema"""
+    formats = {path: vra_format.detect_format(path) for path in paths}
+    uncompressed = 0
+    best_decompress = best_parse = float('inf')
+    rows = 0
+    for _ in range(repeat):
+        if clear_cache:
+            drop_caches()
+        start = time.perf_counter()
+        uncompressed = 0
+        for path in paths:
+            with vra_compression.open_reader(path) as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    uncompressed += len(chunk)
+        best_decompress = min(best_decompress, time.perf_counter() - start)
+
+        if clear_cache:
+            drop_caches()
+        start = time.perf_counter()
+        rows = sum(len(vra_schema.read_vra_csv(path, file_format=formats[path])) for path in paths)
+        best_parse = min(best_parse, time.perf_counter() - start)
+    return {
+        'files': len(paths),
+        'disk_bytes': sum(os.path.getsize(path) for path in paths),
+        'uncompressed_bytes': uncompressed,
+        'rows': rows,
+        'decompress_s': best_decompress,
+        'decompress_mb_s': uncompressed / (1024 * 1024) / best_decompress if best_decompress else None,
+        'parse_s': best_parse,
+        'parse_rows_s': rows / best_parse if best_parse else None,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Espaço em disco e velocidade de leitura por compressão")
+    parser.add_argument('--size', default='1M', help="Tamanho dos dados sintéticos (ex.: 1M, 10M)")
+    parser.add_argument('--compressions', nargs='+', choices=COMPRESSIONS, default=COMPRESSIONS)
+    parser.add_argument('--repeat', type=int, default=3, help="Repetições; vale a melhor (padrão: 3)")
+    parser.add_argument('--drop-caches', action='store_true',
+                        help="Limpa o page cache antes de cada leitura (root, Linux)")
+    parser.add_argument('--data-dir', default=run_benchmarks.DATA_DIR, help="Onde gerar os CSVs sintéticos")
+    parser.add_argument('--output', help="Grava os resultados neste JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.drop_caches and not drop_caches():
+        print("⚠ Não foi possível limpar o page cache (precisa de root); medindo com o cache quente")
+        args.drop_caches = False
+
+    workdir = run_benchmarks.prepare_data(args.size, args.data_dir)
+    results = {}
+    for compression in args.compressions:
+        results[compression] = measure(prepare_compressed(workdir, compression), max(1, args.repeat),
+                                       args.drop_caches)
+
+    plain = results.get('none', next(iter(results.values())))['disk_bytes']
+    print(f"{'compressão':<10} {'disco (MB)':>11} {'razão':>7} {'descomp. MB/s':>14} {'leitura (s)':>12} "
+          f"{'linhas/s':>12}")
+    for compression, result in results.items():
+        result['ratio'] = plain / result['disk_bytes'] if result['disk_bytes'] else None
+        print(f"{compression:<10} {result['disk_bytes'] / (1024 * 1024):11.1f} {result['ratio']:7.2f} "
+              f"{result['decompress_mb_s']:14.0f} {result['parse_s']:12.2f} {result['parse_rows_s']:12,.0f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'machine': {'python': platform.python_version(), 'cpus': os.cpu_count(),
+                            'page_cache_cleared': args.drop_caches},
+                'size': args.size,
+                'results': results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"Resultados salvos em: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Gera CSVs sintéticos no formato do VRA da ANAC para os benchmarks.
+
+Os arquivos têm o mesmo cabeçalho, separador e formatos de data dos CSVs
+reais, divididos em um arquivo por mês. Com a mesma semente o resultado é
+sempre idêntico, para que medições em máquinas diferentes sejam comparáveis.
+
+Exemplo:
+    python benchmarks/generate_vra.py --rows 1M --output benchmarks/data/1M/all
+"""
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+HEADER = [
+    'Sigla ICAO Empresa Aérea', 'Empresa Aérea', 'Número Voo', 'Código DI', 'Código Tipo Linha',
+    'Modelo Equipamento', 'Número de Assentos', 'Sigla ICAO Aeroporto Origem',
+    'Descrição Aeroporto Origem', 'Partida Prevista', 'Partida Real', 'Sigla ICAO Aeroporto Destino',
+    'Descrição Aeroporto Destino', 'Chegada Prevista', 'Chegada Real', 'Situação Voo',
+    'Justificativa', 'Referência', 'Situação Partida', 'Situação Chegada',
+]
+
+N_AIRLINES = 40
+N_AIRPORTS = 150
+MODELS = ['A320', 'A321', 'B738', 'B38M', 'E195', 'AT76', 'A20N', 'E190']
+LINE_TYPES = np.array(['N', 'N', 'N', 'R', 'I'])
+STATUS = np.array(['REALIZADO', 'CANCELADO', 'NÃO INFORMADO'])
+STATUS_P = [0.90, 0.08, 0.02]
+
+
+def parse_size(text):
+    """Aceita 1000, 1M, 10M, 500k..."""
+    text = text.strip().upper()
+    multiplier = {'K': 1_000, 'M': 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip('KM')) * multiplier)
+
+
+def _format(timestamps, fmt, mask=None):
+    # Formata só os valores distintos (minutos se repetem muito) e espalha
+    codes, uniques = pd.factorize(timestamps)
+    text = pd.DatetimeIndex(uniques).strftime(fmt).to_numpy(dtype=object)[codes]
+    if mask is not None:
+        text[mask] = ''
+    return text
+
+
+def generate_month(rng, year, month, rows):
+    """DataFrame de um mês de voos sintéticos"""
+    airline = rng.zipf(1.6, rows) % N_AIRLINES
+    origin = rng.zipf(1.4, rows) % N_AIRPORTS
+    destination = (origin + 1 + rng.integers(0, N_AIRPORTS - 1, rows)) % N_AIRPORTS
+    status = rng.choice(len(STATUS), rows, p=STATUS_P)
+    cancelled = status == 1
+
+    start = np.datetime64(f'{year:04d}-{month:02d}-01T00:00')
+    days = pd.Period(f'{year}-{month:02d}').days_in_month
+    scheduled = start + rng.integers(0, days * 24 * 60, rows).astype('timedelta64[m]')
+    departure_delay = np.maximum(rng.normal(8, 25, rows), -15).astype('int64').astype('timedelta64[m]')
+    duration = (40 + rng.integers(0, 300, rows)).astype('timedelta64[m]')
+    arrival_delay = departure_delay + rng.integers(-10, 15, rows).astype('timedelta64[m]')
+
+    airline_codes = np.array([f'A{i:02d}' for i in range(N_AIRLINES)])
+    airline_names = np.array([f'EMPRESA AÉREA {i:02d} LTDA' for i in range(N_AIRLINES)])
+    airport_codes = np.array([f'S{chr(65 + i // 26 % 26)}{chr(65 + i % 26)}{i // 676}' for i in range(N_AIRPORTS)])
+    airport_names = np.array([f'AEROPORTO {code} - CIDADE {i} - BRASIL' for i, code in enumerate(airport_codes)])
+
+    return pd.DataFrame({
+        'Sigla ICAO Empresa Aérea': airline_codes[airline],
+        'Empresa Aérea': airline_names[airline],
+        'Número Voo': rng.integers(1, 9999, rows),
+        'Código DI': '0',
+        'Código Tipo Linha': LINE_TYPES[rng.integers(0, len(LINE_TYPES), rows)],
+        'Modelo Equipamento': np.array(MODELS)[rng.integers(0, len(MODELS), rows)],
+        'Número de Assentos': rng.integers(70, 240, rows),
+        'Sigla ICAO Aeroporto Origem': airport_codes[origin],
+        'Descrição Aeroporto Origem': airport_names[origin],
+        'Partida Prevista': _format(scheduled, '%d/%m/%Y %H:%M'),
+        'Partida Real': _format(scheduled + departure_delay, '%d/%m/%Y %H:%M', cancelled),
+        'Sigla ICAO Aeroporto Destino': airport_codes[destination],
+        'Descrição Aeroporto Destino': airport_names[destination],
+        'Chegada Prevista': _format(scheduled + duration, '%d/%m/%Y %H:%M'),
+        'Chegada Real': _format(scheduled + duration + arrival_delay, '%d/%m/%Y %H:%M', cancelled),
+        'Situação Voo': STATUS[status],
+        'Justificativa': '',
+        'Referência': _format(scheduled.astype('datetime64[D]'), '%Y-%m-%d'),
+        'Situação Partida': '',
+        'Situação Chegada': '',
+    }, columns=HEADER)
+
+
+def generate(rows, output, rows_per_file=100_000, first_year=2021, seed=42):
+    """Gera `rows` linhas divididas em arquivos mensais; retorna os caminhos"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(output, exist_ok=True)
+    paths = []
+    months = max(1, -(-rows // rows_per_file))
+    for index in range(months):
+        year, month = first_year + index // 12, index % 12 + 1
+        month_rows = min(rows_per_file, rows - index * rows_per_file)
+        path = os.path.join(output, f'VRA_{year}_{month:02d}.csv')
+        generate_month(rng, year, month, month_rows).to_csv(path, sep=';', index=False, encoding='utf-8')
+        paths.append(path)
+        print(f"Gerado: {path} - {month_rows} registros")
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera CSVs sintéticos no formato do VRA")
+    parser.add_argument('--rows', default='1M', help="Total de linhas (ex.: 1M, 10M, 50M)")
+    parser.add_argument('--rows-per-file', type=int, default=100_000,
+                        help="Linhas por arquivo mensal (padrão: 100000, próximo de um mês real)")
+    parser.add_argument('--output', required=True, help="Diretório de saída (ex.: benchmarks/data/1M/all)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+    generate(parse_size(args.rows), args.output, args.rows_per_file, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Benchmarks de ponta a ponta do dashboard com dados sintéticos.
+
+Para cada tamanho, gera os CSVs (uma vez, em benchmarks/data/<tamanho>/all),
+roda results.py em subprocessos com --profile-json e junta os relatórios por
+cenário:
+    cold         - sem cache: lê e converte todos os CSVs, agrega em memória
+    warm         - cache Parquet quente, agregação em memória
+    streaming    - cache quente, agregação em pedaços (--streaming)
+    incremental  - store SQLite já populado, nada a reprocessar
+
+Com --baseline, compara tempo total e pico de memória com uma execução
+anterior e sai com código 1 se algum cenário piorar além da tolerância.
+
+Exemplo:
+    python benchmarks/run_benchmarks.py --sizes 1M 10M --output benchmarks/resultado.json
+    python benchmarks/run_benchmarks.py --sizes 1M --baseline benchmarks/resultado.json
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+import generate_vra
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_SCRIPT = os.path.join(ROOT, 'results.py')
+DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+
+# Cenário -> (argumentos extras, limpar o cache antes)
+SCENARIOS = {
+    'cold': (['--no-store'], True),
+    'warm': (['--no-store'], False),
+    'streaming': (['--no-store', '--streaming'], False),
+    'incremental': ([], False),
+}
+
+# Métricas comparadas com a linha de base (maior = pior)
+METRICS = ['total_wall_s', 'peak_rss_mb']
+
+
+def prepare_data(size, data_dir):
+    """Gera os CSVs do tamanho pedido, se ainda não existirem"""
+    workdir = os.path.join(data_dir, size)
+    csv_dir = os.path.join(workdir, 'all')
+    marker = os.path.join(workdir, 'completo')
+    if not os.path.exists(marker):
+        shutil.rmtree(csv_dir, ignore_errors=True)
+        generate_vra.generate(generate_vra.parse_size(size), csv_dir)
+        open(marker, 'w').close()
+    return workdir
+
+
+def run_scenario(workdir, name, extra_args, jobs):
+    """Roda results.py no diretório do tamanho e devolve o relatório de desempenho"""
+    report_path = os.path.join(workdir, f'perfil_{name}.json')
+    command = [sys.executable, RESULTS_SCRIPT, '--jobs', str(jobs), '--profile-json', report_path] + extra_args
+    subprocess.run(command, cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+    with open(report_path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    # O pico relevante é o do processo principal ou o do maior worker
+    report['peak_rss_mb'] = max(report['peak_rss_mb'] or 0, report['children_peak_rss_mb'] or 0)
+    return report
+
+
+def run_size(size, data_dir, jobs, scenarios):
+    workdir = prepare_data(size, data_dir)
+    results = {}
+    for name in scenarios:
+        extra_args, clear_cache = SCENARIOS[name]
+        if clear_cache:
+            shutil.rmtree(os.path.join(workdir, '.cache_vra'), ignore_errors=True)
+        if name == 'incremental':
+            # Primeira execução popula o store; a medida é a seguinte
+            run_scenario(workdir, name, extra_args, jobs)
+        report = run_scenario(workdir, name, extra_args, jobs)
+        results[name] = report
+        print(f"{size:>5} {name:<12} {report['total_wall_s']:8.2f}s  {report['peak_rss_mb']:8.1f} MB")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Lista as regressões em relação à linha de base"""
+    regressions = []
+    for size, scenarios in results.items():
+        for name, report in scenarios.items():
+            reference = baseline.get(size, {}).get(name)
+            if reference is None:
+                continue
+            for metric in METRICS:
+                before, after = reference.get(metric), report.get(metric)
+                if before and after and after > before * (1 + tolerance):
+                    regressions.append(
+                        f"{size} {name} {metric}: {before:.2f} -> {after:.2f} (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do dashboard com dados sintéticos do VRA")
+    parser.add_argument('--sizes', nargs='+', default=['1M'], help="Tamanhos a medir (ex.: 1M 10M 50M)")
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Onde gerar os CSVs sintéticos")
+    parser.add_argument('--output', help="Grava os resultados neste JSON")
+    parser.add_argument('--baseline', help="JSON de uma execução anterior para comparação")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Piora relativa aceita antes de acusar regressão (padrão: 0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {size: run_size(size, args.data_dir, args.jobs, args.scenarios) for size in args.sizes}
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'machine': {'python': platform.python_version(), 'cpus': os.cpu_count(), 'jobs': args.jobs},
+                'results': results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"Resultados salvos em: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("❌ Regressões em relação à linha de base:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("✅ Sem regressões em relação à linha de base")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import os
+import sys
+import argparse
+import vra_cache
+import vra_store
+import vra_charts
+import vra_output
+import vra_profiling
+import vra_compression
+import vra_sketches
+import scraper_anac
+import results
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Sincronização completa em um comando: baixa o que a ANAC publicou de novo,
+# lê os CSVs direto da árvore do scraper (dados_vra_anac/<ano>/, sem copiar
+# nada para 'all'), guarda os sketches da prévia e refaz o dashboard. Cada
+# etapa já é incremental: o scraper usa requisições condicionais, só CSVs
+# novos ou alterados vão para o cache colunar, para os sketches e para o banco
+# de agregados, e os gráficos só são redesenhados quando os números mudam.
+# Cada CSV novo é lido uma vez só: os sketches saem do cache colunar.
+# Um lock impede que execuções sobrepostas (do cron, por exemplo) mexam no
+# mesmo estado ao mesmo tempo.
+
+LOCK_PATH = os.path.join(vra_cache.CACHE_DIR, 'pipeline.lock')
+
+# Código de saída quando outra execução está com o lock (EX_TEMPFAIL do sysexits.h)
+EXIT_LOCKED = 75
+
+
+class PipelineLock:
+    """Lock exclusivo em um arquivo; o sistema o libera se o processo morrer"""
+
+    def __init__(self, path=LOCK_PATH):
+        self.path = path
+        self._file = None
+
+    def acquire(self, wait=False):
+        """Tenta pegar o lock; sem `wait`, retorna False na hora se ele estiver ocupado"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK if wait else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return False
+        # O PID de quem está rodando fica no arquivo, para diagnóstico
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{os.getpid()}\n")
+        lock_file.flush()
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+
+def download(args):
+    """Etapa 1: baixa (ou revalida) os CSVs; retorna quantos falharam"""
+    scraper_args = ['--output-dir', args.data_dir, '--workers', str(args.workers),
+                    '--base-url', args.base_url, '--compression', args.compression]
+    if args.years:
+        scraper_args += ['--years', *args.years]
+    totals = scraper_anac.sync(scraper_anac.parse_args(scraper_args))
+    return totals[scraper_anac.FAILED]
+
+
+def ingest(csv_files, jobs, cache_dir=vra_cache.CACHE_DIR):
+    """Etapa 2: converte para o cache colunar só os CSVs novos ou alterados; retorna quantos falharam"""
+    failed = 0
+    with vra_profiling.stage('ingest', rows=0) as stage:
+        for file, rows, error in results.ingest_csv_files(csv_files, jobs, cache_dir):
+            if error is not None:
+                print(f"Erro ao converter {file}: {error}")
+                failed += 1
+                continue
+            stage['rows'] += rows
+            print(f"Arquivo convertido: {file} - {rows} registros")
+    return failed
+
+
+def sketch(csv_files, jobs, cache_dir=vra_cache.CACHE_DIR):
+    """Etapa 3: monta do cache colunar os sketches da prévia (results.py --preview); retorna quantos falharam"""
+    failed = 0
+    with vra_profiling.stage('sketch', rows=0) as stage:
+        for file, sketches, stored, error in results.sketch_csv_files(csv_files, jobs, cache_dir):
+            if error is not None:
+                print(f"Erro ao resumir {file}: {error}")
+                failed += 1
+            elif not stored:
+                stage['rows'] += sketches['total_flights']
+                print(f"Sketches montados: {file} - {sketches['total_flights']} registros")
+    return failed
+
+
+def prune(data_dir, cache_dir=vra_cache.CACHE_DIR):
+    """Apaga cache colunar, registros de ingestão e sketches de CSVs removidos ou renomeados"""
+    for source in vra_cache.prune_orphans(cache_dir):
+        print(f"Cache removido (o CSV não existe mais): {source}")
+    for path in vra_sketches.prune_orphans(data_dir):
+        print(f"Sketches removidos (o CSV não existe mais): {path}")
+
+
+def pending_changes(csv_files, store_path, sources):
+    """Arquivos novos/alterados e removidos desde a última atualização do banco de agregados"""
+    conn = vra_store.open_store(store_path)
+    try:
+        return vra_store.stale_files(conn, csv_files), vra_store.missing_files(conn, csv_files, sources)
+    finally:
+        conn.close()
+
+
+def run(args):
+    """Executa o pipeline com o lock já obtido; retorna o código de saída"""
+    failed = 0
+    if not args.skip_download:
+        print("⬇ Baixando arquivos novos da ANAC...")
+        failed += download(args)
+
+    csv_files = results.find_csv_files([args.data_dir])
+    if not csv_files:
+        print(f"Nenhum arquivo CSV encontrado em '{args.data_dir}'")
+        return 1
+
+    print(f"\n📥 Atualizando o cache colunar ({len(csv_files)} arquivos em '{args.data_dir}')...")
+    prune(args.data_dir)
+    failed += ingest(csv_files, args.jobs)
+    failed += sketch(csv_files, args.jobs)
+
+    stale, removed = pending_changes(csv_files, args.store, [args.data_dir])
+    if not stale and not removed and os.path.exists(args.output) and not args.force:
+        print(f"\n= Nenhum arquivo novo, alterado ou removido; '{args.output}' já está em dia")
+        return 1 if failed else 0
+
+    print(f"\n📊 Atualizando o dashboard: {len(stale)} arquivos novos ou alterados, {len(removed)} removidos")
+    results.create_flight_cancellation_dashboard(jobs=args.jobs, store_path=args.store, dpi=args.dpi,
+                                                 image_format=args.format, output_mode=args.output_mode,
+                                                 output_path=args.output, sources=[args.data_dir])
+    return 1 if failed else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Baixa os CSVs novos da ANAC, atualiza o cache e os agregados e refaz o dashboard")
+    parser.add_argument('--data-dir', default='dados_vra_anac',
+                        help="Diretório do scraper, lido no lugar com as subpastas (padrão: dados_vra_anac)")
+    parser.add_argument('--skip-download', action='store_true',
+                        help="Não acessa a ANAC; só processa o que já está em --data-dir")
+    parser.add_argument('--years', nargs='+',
+                        help="Anos a baixar (padrão: todos os publicados na raiz do VRA)")
+    parser.add_argument('--base-url', default=scraper_anac.BASE_URL,
+                        help="URL raiz do diretório VRA")
+    parser.add_argument('--compression', choices=['none', *vra_compression.SUFFIXES], default='none',
+                        help="Guarda os CSVs baixados comprimidos, .csv.gz ou .csv.zst (padrão: none)")
+    parser.add_argument('--workers', type=int, default=4,
+                        help="Downloads simultâneos (padrão: 4)")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Processos para converter e agregar os CSVs (padrão: número de núcleos)")
+    parser.add_argument('--store', default=vra_store.STORE_PATH,
+                        help=f"Banco com os agregados de cada arquivo (padrão: {vra_store.STORE_PATH})")
+    parser.add_argument('--output', default='dashboard_cancelamentos_voos.html',
+                        help="Caminho do HTML publicado")
+    parser.add_argument('--dpi', type=int, default=300,
+                        help="Resolução dos gráficos (padrão: 300)")
+    parser.add_argument('--format', choices=sorted(vra_charts.MIME_TYPES), default='png',
+                        help="Formato das imagens dos gráficos (padrão: png)")
+    parser.add_argument('--output-mode', choices=vra_output.OUTPUT_MODES, default='inline',
+                        help="Modo do HTML, como no results.py (padrão: inline)")
+    parser.add_argument('--force', action='store_true',
+                        help="Refaz o dashboard mesmo sem arquivos novos")
+    parser.add_argument('--wait', action='store_true',
+                        help="Espera a execução em andamento terminar em vez de sair na hora")
+    parser.add_argument('--lock', default=LOCK_PATH,
+                        help=f"Arquivo de lock (padrão: {LOCK_PATH})")
+    parser.add_argument('--profile-json', metavar='PATH',
+                        help="Grava tempo, linhas/s e pico de memória de cada etapa em um JSON")
+    parser.add_argument('--cprofile', metavar='PATH',
+                        help="Grava o perfil do cProfile da execução (veja com python -m pstats)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    lock = PipelineLock(args.lock)
+    if not lock.acquire(wait=args.wait):
+        print(f"Outra execução do pipeline está em andamento (lock: {args.lock}); nada foi feito")
+        return EXIT_LOCKED
+    try:
+        with vra_profiling.profiled(args.profile_json, args.cprofile):
+            return run(args)
+    finally:
+        lock.release()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,348 +1,760 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 import glob
+import json
+import html
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from datetime import datetime
-import numpy as np
-import base64
-from io import BytesIO
-
-def create_flight_cancellation_dashboard():
-    # Configurar estilo dos gráficos
-    plt.style.use('default')
-    sns.set_palette("husl")
-    plt.rcParams['figure.figsize'] = (12, 8)
-    plt.rcParams['font.size'] = 10
-    
-    # Ler todos os CSVs da pasta 'all'
-    csv_files = glob.glob(os.path.join('all', '*.csv'))
-    
-    if not csv_files:
-        print("Nenhum arquivo CSV encontrado na pasta 'all'")
-        return
-    
-    # Combinar todos os CSVs
-    dataframes = []
-    for file in csv_files:
-        try:
-            # Ler CSV com separador correto (ponto e vírgula)
-            df = pd.read_csv(file, sep=';', encoding='utf-8')
-            dataframes.append(df)
-            print(f"Arquivo carregado: {file} - {len(df)} registros")
-        except Exception as e:
-            print(f"Erro ao carregar {file}: {e}")
-    
-    if not dataframes:
-        print("Nenhum arquivo CSV válido encontrado")
-        return
-    
-    # Combinar todos os dataframes
-    df = pd.concat(dataframes, ignore_index=True)
-    print(f"Total de registros combinados: {len(df)}")
-    
-    # Filtrar apenas voos cancelados
-    df_cancelled = df[df['Situação Voo'] == 'CANCELADO'].copy()
-    print(f"Total de voos cancelados: {len(df_cancelled)}")
-    
-    if len(df_cancelled) == 0:
-        print("Nenhum voo cancelado encontrado nos dados")
-        return
-    
-    # Preparar dados para análise
-    df_cancelled['Data'] = pd.to_datetime(df_cancelled['Referência'], format='%Y-%m-%d', errors='coerce')
-    df_cancelled['Ano'] = df_cancelled['Data'].dt.year
-    df_cancelled['Mês'] = df_cancelled['Data'].dt.month
-    df_cancelled['Dia_Semana'] = df_cancelled['Data'].dt.day_name()
-    
-    # Extrair hora da partida prevista
-    df_cancelled['Hora_Partida'] = pd.to_datetime(df_cancelled['Partida Prevista'], format='%d/%m/%Y %H:%M', errors='coerce').dt.hour
-    
-    # Função para converter gráfico em base64
-    def plot_to_base64():
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', bbox_inches='tight', dpi=300, facecolor='white')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-        buffer.close()
-        plt.close()
-        return f"data:image/png;base64,{image_base64}"
-    
-    # Lista para armazenar gráficos
-    charts = []
-    
-    # 1. Empresas aéreas que mais cancelam voos
-    plt.figure(figsize=(14, 8))
-    airline_counts = df_cancelled['Empresa Aérea'].value_counts().head(15)
-    bars = plt.bar(range(len(airline_counts)), airline_counts.values, color='#e74c3c', alpha=0.8)
-    plt.title('Top 15 Empresas Aéreas com Mais Cancelamentos', fontsize=16, fontweight='bold', pad=20)
-    plt.xlabel('Empresa Aérea', fontsize=12)
-    plt.ylabel('Número de Cancelamentos', fontsize=12)
-    plt.xticks(range(len(airline_counts)), airline_counts.index, rotation=45, ha='right')
-    
-    # Adicionar valores nas barras
-    for bar, value in zip(bars, airline_counts.values):
-        plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5, 
-                str(value), ha='center', va='bottom', fontweight='bold')
-    
-    plt.tight_layout()
-    charts.append(('Empresas que Mais Cancelam Voos', plot_to_base64()))
-    
-    # 2. Porcentagem de voos cancelados por empresa
-    plt.figure(figsize=(14, 8))
-    total_flights = df.groupby('Empresa Aérea').size()
-    cancelled_flights = df_cancelled.groupby('Empresa Aérea').size()
-    cancellation_rate = (cancelled_flights / total_flights * 100).fillna(0).sort_values(ascending=False).head(15)
-    
-    bars = plt.bar(range(len(cancellation_rate)), cancellation_rate.values, color='#c0392b', alpha=0.8)
-    plt.title('Taxa de Cancelamento por Empresa Aérea (%)', fontsize=16, fontweight='bold', pad=20)
-    plt.xlabel('Empresa Aérea', fontsize=12)
-    plt.ylabel('Porcentagem de Cancelamentos (%)', fontsize=12)
-    plt.xticks(range(len(cancellation_rate)), cancellation_rate.index, rotation=45, ha='right')
-    
-    # Adicionar valores nas barras
-    for bar, value in zip(bars, cancellation_rate.values):
-        plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1, 
-                f'{value:.1f}%', ha='center', va='bottom', fontweight='bold')
-    
-    plt.tight_layout()
-    charts.append(('Taxa de Cancelamento por Empresa', plot_to_base64()))
-    
-    # 3. Aeroportos de origem com mais cancelamentos
-    plt.figure(figsize=(14, 8))
-    # Usar descrição do aeroporto para melhor visualização
-    origin_counts = df_cancelled['Descrição Aeroporto Origem'].value_counts().head(15)
-    # Encurtar nomes muito longos
-    origin_labels = [label[:50] + '...' if len(label) > 50 else label for label in origin_counts.index]
-    
-    bars = plt.bar(range(len(origin_counts)), origin_counts.values, color='#f39c12', alpha=0.8)
-    plt.title('Top 15 Aeroportos de Origem com Mais Cancelamentos', fontsize=16, fontweight='bold', pad=20)
-    plt.xlabel('Aeroporto de Origem', fontsize=12)
-    plt.ylabel('Número de Cancelamentos', fontsize=12)
-    plt.xticks(range(len(origin_counts)), origin_labels, rotation=45, ha='right')
-    
-    # Adicionar valores nas barras
-    for bar, value in zip(bars, origin_counts.values):
-        plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5, 
-                str(value), ha='center', va='bottom', fontweight='bold')
-    
-    plt.tight_layout()
-    charts.append(('Aeroportos de Origem com Mais Cancelamentos', plot_to_base64()))
-    
-    # 4. Horários com mais cancelamentos
-    plt.figure(figsize=(14, 8))
-    hour_counts = df_cancelled['Hora_Partida'].value_counts().sort_index()
-    bars = plt.bar(hour_counts.index, hour_counts.values, color='#9b59b6', alpha=0.8)
-    plt.title('Cancelamentos por Hora do Dia', fontsize=16, fontweight='bold', pad=20)
-    plt.xlabel('Hora do Dia', fontsize=12)
-    plt.ylabel('Número de Cancelamentos', fontsize=12)
-    plt.xticks(range(0, 24, 2))
-    plt.grid(True, alpha=0.3, axis='y')
-    
-    # Adicionar valores nas barras
-    for bar, value in zip(bars, hour_counts.values):
-        if value > 0:
-            plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5, 
-                    str(value), ha='center', va='bottom', fontweight='bold', fontsize=9)
-    
-    plt.tight_layout()
-    charts.append(('Cancelamentos por Horário', plot_to_base64()))
-    
-    # 5. Épocas (meses) com mais cancelamentos
-    plt.figure(figsize=(14, 8))
-    month_counts = df_cancelled['Mês'].value_counts().sort_index()
-    month_names = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 
-                  'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-    
-    bars = plt.bar(range(len(month_counts)), month_counts.values, color='#27ae60', alpha=0.8)
-    plt.title('Cancelamentos por Mês', fontsize=16, fontweight='bold', pad=20)
-    plt.xlabel('Mês', fontsize=12)
-    plt.ylabel('Número de Cancelamentos', fontsize=12)
-    plt.xticks(range(len(month_counts)), [month_names[i-1] for i in month_counts.index])
-    
-    # Adicionar valores nas barras
-    for bar, value in zip(bars, month_counts.values):
-        plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5, 
-                str(value), ha='center', va='bottom', fontweight='bold')
-    
-    plt.tight_layout()
-    charts.append(('Cancelamentos por Mês', plot_to_base64()))
-    
-    # 6. Anos com mais cancelamentos
-    plt.figure(figsize=(14, 8))
-    year_counts = df_cancelled['Ano'].value_counts().sort_index()
-    plt.plot(year_counts.index, year_counts.values, marker='o', linewidth=3, markersize=10, color='#e74c3c')
-    plt.title('Evolução dos Cancelamentos por Ano', fontsize=16, fontweight='bold', pad=20)
-    plt.xlabel('Ano', fontsize=12)
-    plt.ylabel('Número de Cancelamentos', fontsize=12)
-    plt.grid(True, alpha=0.3)
-    
-    # Adicionar valores nos pontos
-    for x, y in zip(year_counts.index, year_counts.values):
-        plt.text(x, y + max(year_counts.values) * 0.02, str(y), ha='center', va='bottom', fontweight='bold')
-    
-    plt.tight_layout()
-    charts.append(('Cancelamentos por Ano', plot_to_base64()))
-    
-    # 7. Dia da semana com mais cancelamentos
-    plt.figure(figsize=(14, 8))
-    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    day_counts = df_cancelled['Dia_Semana'].value_counts().reindex(day_order, fill_value=0)
-    day_names_pt = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
-    
-    bars = plt.bar(day_names_pt, day_counts.values, color='#16a085', alpha=0.8)
-    plt.title('Cancelamentos por Dia da Semana', fontsize=16, fontweight='bold', pad=20)
-    plt.xlabel('Dia da Semana', fontsize=12)
-    plt.ylabel('Número de Cancelamentos', fontsize=12)
-    
-    # Adicionar valores nas barras
-    for bar, value in zip(bars, day_counts.values):
-        if value > 0:
-            plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5, 
-                    str(value), ha='center', va='bottom', fontweight='bold')
-    
-    plt.tight_layout()
-    charts.append(('Cancelamentos por Dia da Semana', plot_to_base64()))
-    
-    # 8. Gráfico de pizza - Distribuição por tipo de linha
-    plt.figure(figsize=(10, 10))
-    tipo_linha_counts = df_cancelled['Código Tipo Linha'].value_counts()
-    tipo_linha_labels = {'I': 'Internacional', 'N': 'Nacional', 'R': 'Regional'}
-    labels = [tipo_linha_labels.get(code, f'Tipo {code}') for code in tipo_linha_counts.index]
-    
-    colors = ['#e74c3c', '#3498db', '#f39c12']
-    wedges, texts, autotexts = plt.pie(tipo_linha_counts.values, labels=labels, autopct='%1.1f%%', 
-                                      colors=colors, startangle=90, textprops={'fontsize': 12})
-    plt.title('Distribuição de Cancelamentos por Tipo de Linha', fontsize=16, fontweight='bold', pad=20)
-    
-    # Melhorar aparência dos textos
-    for autotext in autotexts:
-        autotext.set_color('white')
-        autotext.set_fontweight('bold')
-    
-    plt.tight_layout()
-    charts.append(('Distribuição por Tipo de Linha', plot_to_base64()))
-    
-    # Calcular estatísticas gerais
-    total_voos = len(df)
-    total_cancelados = len(df_cancelled)
-    taxa_cancelamento = (total_cancelados / total_voos) * 100
-    empresa_mais_cancela = df_cancelled['Empresa Aérea'].value_counts().index[0]
-    aeroporto_mais_cancela = df_cancelled['Sigla ICAO Aeroporto Origem'].value_counts().index[0]
-    
-    # Gerar HTML
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="pt-BR">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Dashboard de Cancelamentos de Voos - Brasil</title>
-        <style>
-            body {{
+import vra_cache
+import vra_schema
+import vra_aggregates
+import vra_store
+import vra_charts
+import vra_output
+import vra_profiling
+import vra_filters
+import vra_compression
+import vra_sketches
+
+# Pasta padrão com os CSVs a analisar
+DEFAULT_SOURCE = 'all'
+
+# Prévia rápida (--preview): arquivo gerado e linhas das tabelas de maiores canceladoras
+PREVIEW_OUTPUT = 'dashboard_previa.html'
+PREVIEW_TOP_N = 10
+
+# Estilo do dashboard, também usado pela prévia (--preview)
+DASHBOARD_STYLE = """
+            body {
                 font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
                 margin: 0;
                 padding: 20px;
                 background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
                 min-height: 100vh;
-            }}
-            .container {{
+            }
+            .container {
                 max-width: 1200px;
                 margin: 0 auto;
                 background: white;
                 border-radius: 15px;
                 box-shadow: 0 10px 30px rgba(0,0,0,0.3);
                 overflow: hidden;
-            }}
-            .header {{
+            }
+            .header {
                 text-align: center;
                 background: linear-gradient(135deg, #2c3e50 0%, #34495e 100%);
                 color: white;
                 padding: 40px 20px;
-            }}
-            .header h1 {{
+            }
+            .header h1 {
                 margin: 0;
                 font-size: 2.5em;
                 margin-bottom: 10px;
-            }}
-            .header p {{
+            }
+            .header p {
                 margin: 5px 0;
                 font-size: 1.1em;
                 opacity: 0.9;
-            }}
-            .stats {{
+            }
+            .stats {
                 display: grid;
                 grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
                 gap: 20px;
                 padding: 30px;
                 background: #f8f9fa;
-            }}
-            .stat-card {{
+            }
+            .stat-card {
                 background: white;
                 padding: 25px;
                 border-radius: 10px;
                 box-shadow: 0 4px 15px rgba(0,0,0,0.1);
                 text-align: center;
                 border-left: 5px solid #e74c3c;
-            }}
-            .stat-number {{
+            }
+            .stat-number {
                 font-size: 2.5em;
                 font-weight: bold;
                 color: #e74c3c;
                 margin-bottom: 5px;
-            }}
-            .stat-label {{
+            }
+            .stat-label {
                 color: #7f8c8d;
                 font-size: 1.1em;
                 font-weight: 500;
-            }}
-            .chart-container {{
+            }
+            .chart-container {
                 background: white;
                 margin: 20px;
                 padding: 30px;
                 border-radius: 15px;
                 box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-            }}
-            .chart-title {{
+            }
+            .chart-title {
                 font-size: 1.8em;
                 font-weight: bold;
                 margin-bottom: 20px;
                 color: #2c3e50;
                 border-bottom: 3px solid #e74c3c;
                 padding-bottom: 15px;
-            }}
-            .chart-image {{
+            }
+            .chart-canvas {
+                width: 100%;
+                min-height: 300px;
+            }
+            .chart-image {
                 width: 100%;
                 height: auto;
                 border-radius: 10px;
                 box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            }}
-            .footer {{
+            }
+            .data-table {
+                width: 100%;
+                border-collapse: collapse;
+                font-size: 0.95em;
+            }
+            .data-table th, .data-table td {
+                padding: 8px 12px;
+                border-bottom: 1px solid #ecf0f1;
+                text-align: left;
+            }
+            .data-table th {
+                background: #f8f9fa;
+                color: #2c3e50;
+            }
+            .data-table td:nth-last-child(-n+3) {
+                text-align: right;
+            }
+            .footer {
                 text-align: center;
                 margin-top: 30px;
                 padding: 30px;
                 background: #2c3e50;
                 color: white;
-            }}
-            .footer p {{
+            }
+            .footer p {
                 margin: 5px 0;
                 opacity: 0.8;
-            }}
-            .highlight {{
+            }
+            .highlight {
                 background: linear-gradient(120deg, #a8edea 0%, #fed6e3 100%);
                 padding: 20px;
                 margin: 20px;
                 border-radius: 10px;
                 border-left: 5px solid #e74c3c;
-            }}
-        </style>
+            }
+        """
+
+def format_mb(value):
+    return f"{value:,.0f} MB" if value is not None else "indisponível"
+
+def find_csv_files(sources=None):
+    """CSVs das fontes: arquivos entram como estão e pastas são percorridas com as subpastas
+
+    Assim a árvore do scraper (dados_vra_anac/<ano>/) é lida no lugar, sem copiar
+    os arquivos para 'all'. CSVs comprimidos (.csv.gz, .csv.zst) também entram.
+    Arquivos repetidos entram uma vez só.
+    """
+    csv_files = {}
+    for source in sources or [DEFAULT_SOURCE]:
+        if os.path.isdir(source):
+            found = [file for pattern in vra_compression.CSV_PATTERNS
+                     for file in glob.glob(os.path.join(source, '**', pattern), recursive=True)]
+        elif os.path.isfile(source):
+            found = [source]
+        else:
+            print(f"Fonte não encontrada: {source}")
+            continue
+        for file in found:
+            csv_files.setdefault(os.path.abspath(file), file)
+    return list(csv_files.values())
+
+def _describe_sources(sources):
+    return ', '.join(f"'{source}'" for source in sources or [DEFAULT_SOURCE])
+
+def _load_csv(file, cache_dir, use_threads=True):
+    """Carrega um CSV (no processo atual ou em um worker) sem deixar a exceção escapar"""
+    try:
+        df, from_cache = vra_cache.load_vra_file(file, cache_dir, use_threads)
+        return df, from_cache, None
+    except Exception as e:
+        return None, False, e
+
+def _init_worker(threads):
+    # Divide os núcleos entre os processos para o pyarrow não disputar CPU
+    if vra_schema.HAS_PYARROW:
+        import pyarrow
+        pyarrow.set_cpu_count(threads)
+
+def _map_in_pool(func, items, jobs, *args):
+    """Chama func(item, *args, use_threads) para cada item em até `jobs` processos
+
+    Gera (item, resultado) na ordem de `items`. Com um só processo (ou um só
+    item) tudo roda aqui mesmo, com o use_threads padrão de `func`. As funções
+    devolvem o erro no resultado em vez de levantá-lo, para um arquivo com
+    problema não derrubar os demais. As etapas medidas nos workers
+    (vra_profiling) voltam junto com cada resultado e entram no relatório.
+    """
+    if jobs <= 1 or len(items) <= 1:
+        for item in items:
+            yield item, func(item, *args)
+        return
+
+    jobs = min(jobs, len(items))
+    threads = max(1, (os.cpu_count() or 1) // jobs)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(threads,)) as executor:
+        results = executor.map(_profiled_call, repeat(func), repeat(vra_profiling.enabled()), items,
+                               *(repeat(arg) for arg in args), repeat(threads > 1))
+        for item, (result, stages) in zip(items, results):
+            vra_profiling.merge(stages)
+            yield item, result
+
+def _profiled_call(func, profile, *args):
+    """Roda func(*args) em um worker e devolve (resultado, etapas medidas nele)"""
+    with vra_profiling.collect(profile) as stages:
+        result = func(*args)
+    return result, stages
+
+def load_csv_files(csv_files, jobs=1, cache_dir=vra_cache.CACHE_DIR):
+    """Carrega os CSVs em paralelo, devolvendo (arquivo, df, from_cache, erro) na ordem da lista"""
+    for file, result in _map_in_pool(_load_csv, csv_files, jobs, cache_dir):
+        yield (file, *result)
+
+def _ingest_file(file, cache_dir, use_threads=True):
+    """Converte um CSV para o cache colunar (no processo atual ou em um worker)"""
+    try:
+        return vra_cache.ensure_cached(file, cache_dir, use_threads), None
+    except Exception as e:
+        return 0, e
+
+def ingest_csv_files(csv_files, jobs=1, cache_dir=vra_cache.CACHE_DIR):
+    """Converte para o cache colunar só os CSVs novos ou alterados, gerando (arquivo, linhas, erro)"""
+    pending = [file for file in csv_files if not vra_cache.fresh_cache_path(file, cache_dir)]
+    for file, result in _map_in_pool(_ingest_file, pending, jobs, cache_dir):
+        yield (file, *result)
+
+def _sketch_file(file, cache_dir, use_threads=True):
+    """Sketches de um CSV: os gravados ao lado dele ou montados agora (no processo atual ou em um worker)"""
+    try:
+        sketches = vra_sketches.load_sketches(file)
+        if sketches is not None:
+            return sketches, True, None
+        # Do cache colunar, se o arquivo já foi convertido; senão, da leitura leve do CSV
+        sketches = vra_sketches.build_sketches(file, use_threads=use_threads, cache_dir=cache_dir)
+        try:
+            vra_sketches.save_sketches(file, sketches)
+        except OSError as e:
+            # Pasta só de leitura: a prévia sai do mesmo jeito, só não fica guardada
+            print(f"⚠ Sketches de {file} não gravados: {e}")
+        return sketches, False, None
+    except Exception as e:
+        return None, False, e
+
+def sketch_csv_files(csv_files, jobs=1, cache_dir=vra_cache.CACHE_DIR):
+    """Sketches dos CSVs, montando em paralelo os que faltam: gera (arquivo, sketches, já gravados, erro)"""
+    for file, result in _map_in_pool(_sketch_file, csv_files, jobs, cache_dir):
+        yield (file, *result)
+
+def _aggregate_file(file, cache_dir, chunksize, cube=False, use_threads=True):
+    """Agrega um arquivo pedaço a pedaço (no processo atual ou em um worker)"""
+    try:
+        aggregates = vra_aggregates.empty_aggregates()
+        from_cache = False
+        for chunk, from_cache in vra_cache.iter_vra_file(file, cache_dir, chunksize, use_threads):
+            aggregates = vra_aggregates.merge_aggregates(aggregates, vra_aggregates.aggregate_frame(chunk, cube))
+        return aggregates, from_cache, None
+    except Exception as e:
+        return None, False, e
+
+def aggregate_csv_files(csv_files, jobs=1, cache_dir=vra_cache.CACHE_DIR, chunksize=500_000, cube=False):
+    """Agrega os CSVs em modo streaming, devolvendo (arquivo, agregados, from_cache, erro)"""
+    for file, result in _map_in_pool(_aggregate_file, csv_files, jobs, cache_dir, chunksize, cube):
+        yield (file, *result)
+
+def _aggregate_file_filtered(entry, cache_dir, chunksize, streaming, use_threads=True):
+    """Agrega um arquivo para vários filtros com uma única leitura (no processo atual ou em um worker)
+
+    `entry` é o par (arquivo, filtros) do plano de aggregate_filtered_files.
+    """
+    file, filters = entry
+    try:
+        partials = [vra_aggregates.empty_aggregates() for _ in filters]
+        # Lê só o necessário para atender todos os filtros; cada um recorta o seu pedaço
+        row_filter = vra_filters.envelope(filters)
+        if streaming:
+            chunks = vra_cache.iter_vra_file(file, cache_dir, chunksize, use_threads, row_filter)
+        else:
+            chunks = [vra_cache.load_vra_file(file, cache_dir, use_threads, row_filter)]
+        rows, from_cache = 0, False
+        for chunk, from_cache in chunks:
+            rows += len(chunk)
+            for index, dashboard_filter in enumerate(filters):
+                partial = vra_aggregates.aggregate_frame(dashboard_filter.apply(chunk))
+                partials[index] = vra_aggregates.merge_aggregates(partials[index], partial)
+        return partials, rows, from_cache, None
+    except Exception as e:
+        return None, 0, False, e
+
+def aggregate_filtered_files(plan, jobs=1, cache_dir=vra_cache.CACHE_DIR, chunksize=500_000, streaming=False):
+    """Agrega cada (arquivo, filtros) do plano, devolvendo (arquivo, parciais, linhas lidas, from_cache, erro)"""
+    for (file, _), result in _map_in_pool(_aggregate_file_filtered, plan, jobs, cache_dir, chunksize, streaming):
+        yield (file, *result)
+
+def file_date_range(file, cache_dir=vra_cache.CACHE_DIR, conn=None):
+    """Período de um CSV sem lê-lo: do cache ou do registro de ingestão, do banco de agregados
+    (`conn`) e, por último, do ano/mês no nome do arquivo; (None, None) se nada disso ajudar"""
+    first_date, last_date = vra_cache.date_range(file, cache_dir)
+    if first_date is None and conn is not None:
+        first_date, last_date = vra_store.file_date_range(conn, file)
+    if first_date is None:
+        first_date, last_date = vra_cache.date_range_from_name(file)
+    return first_date, last_date
+
+def filtered_aggregates(csv_files, filters, jobs=1, cache_dir=vra_cache.CACHE_DIR, chunksize=500_000,
+                        streaming=False, store_path=vra_store.STORE_PATH):
+    """Calcula os agregados de vários recortes dos dados lendo cada arquivo uma única vez
+
+    Arquivos cujo período (veja file_date_range) não cruza o de nenhum filtro
+    não são lidos. Retorna, para cada filtro, (agregados, arquivos com voos).
+    """
+    plan = []
+    conn = vra_store.open_store(store_path) if store_path and os.path.exists(store_path) else None
+    try:
+        ranges = {file: file_date_range(file, cache_dir, conn) for file in csv_files}
+    finally:
+        if conn is not None:
+            conn.close()
+    for file in csv_files:
+        first_date, last_date = ranges[file]
+        wanted = [index for index, dashboard_filter in enumerate(filters)
+                  if dashboard_filter.overlaps(first_date, last_date)]
+        if wanted:
+            plan.append((file, wanted))
+        else:
+            print(f"Arquivo ignorado (fora do período): {file}")
+
+    results = [(vra_aggregates.empty_aggregates(), []) for _ in filters]
+    with vra_profiling.stage('parse_aggregate', rows=0) as stage:
+        file_filters = [(file, [filters[index] for index in wanted]) for file, wanted in plan]
+        for (file, wanted), (_, partials, rows, from_cache, error) in zip(
+                plan, aggregate_filtered_files(file_filters, jobs, cache_dir, chunksize, streaming)):
+            if error is not None:
+                print(f"Erro ao carregar {file}: {error}")
+                continue
+            for index, partial in zip(wanted, partials):
+                aggregates, used_files = results[index]
+                results[index] = (vra_aggregates.merge_aggregates(aggregates, partial), used_files)
+                if partial['total_flights']:
+                    used_files.append(file)
+            stage['rows'] += rows
+            print(f"Arquivo carregado: {file} - {rows} registros no filtro" + (" (cache)" if from_cache else ""))
+    return results
+
+def load_aggregates(csv_files, jobs=1, cache_dir=vra_cache.CACHE_DIR):
+    """Carrega todos os CSVs em um único DataFrame e calcula os agregados"""
+    # Combinar todos os CSVs
+    # Cada arquivo é lido já tipado (reaproveitando o cache colunar se não mudou),
+    # em até `jobs` processos
+    dataframes = []
+    with vra_profiling.stage('parse') as stage:
+        for file, df, from_cache, error in load_csv_files(csv_files, jobs, cache_dir):
+            if error is not None:
+                print(f"Erro ao carregar {file}: {error}")
+                continue
+            dataframes.append(df)
+            print(f"Arquivo carregado: {file} - {len(df)} registros" + (" (cache)" if from_cache else ""))
+        stage['rows'] = sum(len(df) for df in dataframes)
+    
+    if not dataframes:
+        return None
+    
+    # Combinar todos os dataframes
+    with vra_profiling.stage('concat', rows=stage['rows']):
+        df = vra_cache.concat_frames(dataframes)
+    del dataframes
+    return vra_aggregates.aggregate_frame(df)
+
+def stream_aggregates(csv_files, jobs=1, cache_dir=vra_cache.CACHE_DIR, chunksize=500_000):
+    """Calcula os agregados lendo cada arquivo em pedaços, sem montar o DataFrame completo"""
+    partials = []
+    # Em modo streaming a leitura e a agregação acontecem juntas, pedaço a pedaço
+    with vra_profiling.stage('parse_aggregate') as stage:
+        for file, aggregates, from_cache, error in aggregate_csv_files(csv_files, jobs, cache_dir, chunksize):
+            if error is not None:
+                print(f"Erro ao carregar {file}: {error}")
+                continue
+            partials.append(aggregates)
+            print(f"Arquivo carregado: {file} - {aggregates['total_flights']} registros" + (" (cache)" if from_cache else ""))
+        stage['rows'] = sum(partial['total_flights'] for partial in partials)
+    
+    if not partials:
+        return None
+    with vra_profiling.stage('merge'):
+        return vra_aggregates.merge_all(partials)
+
+def incremental_aggregates(csv_files, jobs=1, cache_dir=vra_cache.CACHE_DIR, chunksize=500_000,
+                           store_path=vra_store.STORE_PATH, sources=None):
+    """Atualiza o banco de agregados só com os arquivos novos ou alterados e soma tudo
+
+    `sources` são as fontes lidas: só parciais de arquivos dentro delas (ou que
+    sumiram do disco) são retirados do banco.
+    """
+    conn = vra_store.open_store(store_path)
+    try:
+        for path in vra_store.retract_missing(conn, csv_files, sources or [DEFAULT_SOURCE]):
+            print(f"Arquivo removido dos agregados: {path}")
+
+        stale = vra_store.stale_files(conn, csv_files)
+        for file in csv_files:
+            if file not in stale:
+                print(f"Arquivo carregado: {file} - {vra_store.file_totals(conn, file)} registros (agregados salvos)")
+
+        valid = [file for file in csv_files if file not in stale]
+        with vra_profiling.stage('parse_aggregate', rows=0) as stage:
+            # O cubo vai para o banco, para as consultas filtradas da API (vra_api.py)
+            for file, aggregates, from_cache, error in aggregate_csv_files(stale, jobs, cache_dir, chunksize,
+                                                                           cube=True):
+                if error is not None:
+                    print(f"Erro ao carregar {file}: {error}")
+                    continue
+                vra_store.save_partial(conn, file, aggregates)
+                valid.append(file)
+                stage['rows'] += aggregates['total_flights']
+                print(f"Arquivo carregado: {file} - {aggregates['total_flights']} registros" + (" (cache)" if from_cache else ""))
+
+        with vra_profiling.stage('merge'):
+            return vra_store.merged_aggregates(conn, valid)
+    finally:
+        conn.close()
+
+def write_ingestion_report(csv_files, cache_dir=vra_cache.CACHE_DIR, report_path=vra_cache.INGESTION_REPORT):
+    """Grava o relatório de ingestão (JSON) e avisa se houve arquivos com falha ou linhas descartadas"""
+    if not report_path:
+        return
+    report = {'generated_at': datetime.now().isoformat(timespec='seconds'),
+              **vra_cache.ingestion_report(csv_files, cache_dir)}
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    tmp_path = report_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, report_path)
+    totals = report['totals']
+    if totals['failed'] or totals['bad_lines']:
+        print(f"⚠ Ingestão: {totals['failed']} arquivos com falha e {totals['bad_lines']} linhas inválidas "
+              f"descartadas (detalhes em {report_path})")
+
+def create_flight_cancellation_dashboard(jobs=1, cache_dir=vra_cache.CACHE_DIR, streaming=False,
+                                         chunksize=500_000, store_path=vra_store.STORE_PATH,
+                                         dpi=300, image_format='png', output_mode='inline',
+                                         output_path='dashboard_cancelamentos_voos.html', filters=None,
+                                         sources=None, ingestion_report=vra_cache.INGESTION_REPORT):
+    # Ler todos os CSVs das fontes (por padrão, a pasta 'all')
+    csv_files = find_csv_files(sources)
+    
+    if not csv_files:
+        print(f"Nenhum arquivo CSV encontrado em {_describe_sources(sources)}")
+        return
+    
+    rss_before = vra_profiling.peak_rss_mb()
+
+    if filters is not None and not filters.is_empty():
+        # Com filtros cada arquivo é lido já recortado; o banco só tem os totais gerais
+        [(aggregates, used_files)] = filtered_aggregates(csv_files, [filters], jobs, cache_dir, chunksize,
+                                                         streaming, store_path)
+        files_count = len(used_files)
+    else:
+        # Sem banco de agregados (store_path=None), tudo é recalculado a cada execução
+        if store_path:
+            if streaming:
+                print("ℹ Com o banco de agregados cada arquivo já é lido em pedaços de --chunksize linhas; "
+                      "--streaming não muda nada aqui")
+            aggregates = incremental_aggregates(csv_files, jobs, cache_dir, chunksize, store_path, sources)
+        elif streaming:
+            aggregates = stream_aggregates(csv_files, jobs, cache_dir, chunksize)
+        else:
+            aggregates = load_aggregates(csv_files, jobs, cache_dir)
+        files_count = len(csv_files)
+    write_ingestion_report(csv_files, cache_dir, ingestion_report)
+    
+    if aggregates is None:
+        print("Nenhum arquivo CSV válido encontrado")
+        return
+    
+    write_dashboard(aggregates, files_count, jobs, dpi, image_format, output_mode, output_path, filters, rss_before)
+
+def generate_reports(reports, jobs=1, cache_dir=vra_cache.CACHE_DIR, streaming=False, chunksize=500_000,
+                     dpi=300, image_format='png', output_mode='inline', sources=None,
+                     ingestion_report=vra_cache.INGESTION_REPORT):
+    """Gera vários dashboards filtrados lendo os dados uma única vez
+
+    `reports` é uma lista de (filtro, caminho do HTML).
+    """
+    csv_files = find_csv_files(sources)
+    
+    if not csv_files:
+        print(f"Nenhum arquivo CSV encontrado em {_describe_sources(sources)}")
+        return
+    
+    rss_before = vra_profiling.peak_rss_mb()
+    results = filtered_aggregates(csv_files, [dashboard_filter for dashboard_filter, output_path in reports],
+                                  jobs, cache_dir, chunksize, streaming)
+    write_ingestion_report(csv_files, cache_dir, ingestion_report)
+    for (dashboard_filter, output_path), (aggregates, used_files) in zip(reports, results):
+        print(f"\n📄 {output_path}: {dashboard_filter.describe() or 'sem filtros'}")
+        write_dashboard(aggregates, len(used_files), jobs, dpi, image_format, output_mode, output_path,
+                        dashboard_filter, rss_before)
+
+def _preview_selection(file_sketches, filters=None):
+    """Arquivos da prévia: os que cruzam o período de --start/--end ou, sem período, os do último mês"""
+    if filters is not None and (filters.start is not None or filters.end is not None):
+        return [file for file, sketches in file_sketches.items()
+                if filters.overlaps(sketches['first_date'], sketches['last_date'])]
+    last_dates = [sketches['last_date'] for sketches in file_sketches.values() if sketches['last_date'] is not None]
+    if not last_dates:
+        return list(file_sketches)
+    month_start = max(last_dates).replace(day=1)
+    return [file for file, sketches in file_sketches.items()
+            if sketches['last_date'] is None or sketches['last_date'] >= month_start]
+
+def preview_dashboard(jobs=1, cache_dir=vra_cache.CACHE_DIR, filters=None, sources=None, exact=False,
+                      output_path=PREVIEW_OUTPUT):
+    """Prévia rápida a partir dos sketches de cada CSV (vra_sketches), sem ler os dados completos
+
+    Totais e período são exatos; maiores canceladoras e valores distintos são
+    estimativas com margem de erro. Com `exact`, os mesmos arquivos são lidos
+    por inteiro (só as colunas da prévia) e os valores exatos aparecem ao lado.
+    """
+    csv_files = find_csv_files(sources)
+    if not csv_files:
+        print(f"Nenhum arquivo CSV encontrado em {_describe_sources(sources)}")
+        return
+
+    file_sketches = {}
+    with vra_profiling.stage('sketch', rows=0) as stage:
+        for file, sketches, stored, error in sketch_csv_files(csv_files, jobs, cache_dir):
+            if error is not None:
+                print(f"Erro ao resumir {file}: {error}")
+                continue
+            file_sketches[file] = sketches
+            stage['rows'] += sketches['total_flights']
+            if not stored:
+                print(f"Sketches montados: {file} - {sketches['total_flights']} registros")
+
+    selected = _preview_selection(file_sketches, filters)
+    if not selected:
+        print("Nenhum arquivo no período informado")
+        return
+    with vra_profiling.stage('sketch_merge'):
+        merged = vra_sketches.merge_all(file_sketches[file] for file in selected)
+
+    exact_counts = None
+    if exact:
+        with vra_profiling.stage('exact', rows=0) as stage:
+            for file in selected:
+                counts = vra_sketches.exact_counts(file, vra_cache.cached_format(file, cache_dir))
+                exact_counts = counts if exact_counts is None else vra_sketches.merge_exact(exact_counts, counts)
+                stage['rows'] += counts['total_flights']
+    write_preview(merged, exact_counts, output_path)
+
+def _preview_tables(merged, exact_counts=None, n=PREVIEW_TOP_N):
+    """Tabelas da prévia: (título, cabeçalhos, linhas), como em vra_output.table_blocks"""
+    tables = []
+    for dimension, title, label in [('airline', 'Empresas que mais cancelam', 'Empresa'),
+                                    ('origin', 'Aeroportos de origem com mais cancelamentos', 'Aeroporto')]:
+        headers = [label, 'Cancelamentos (estimativa)', 'Intervalo', 'Taxa estimada']
+        if exact_counts is not None:
+            headers += ['Cancelamentos (exato)', 'Taxa exata']
+        rows = []
+        for key, cancelled, lower, upper, flights in vra_sketches.top_estimates(merged, dimension, n):
+            row = [key, cancelled, f"{lower:,} a {upper:,}", cancelled / flights * 100 if flights else None]
+            if exact_counts is not None:
+                exact_cancelled = int(exact_counts[f'cancelled_by_{dimension}'].get(key, 0))
+                exact_flights = int(exact_counts[f'flights_by_{dimension}'].get(key, 0))
+                row += [exact_cancelled, exact_cancelled / exact_flights * 100 if exact_flights else None]
+            rows.append(row)
+        tables.append((f"{title} (top {n})", headers, rows))
+
+    headers = ['Medida', 'Estimativa', 'Margem (~95%)']
+    if exact_counts is not None:
+        headers += ['Exato']
+    rows = []
+    for key, label in [('routes', 'Rotas distintas (origem → destino)'),
+                       ('flight_numbers', 'Voos distintos (empresa + número)')]:
+        estimate, margin = vra_sketches.distinct_estimate(merged, key)
+        row = [label, round(estimate), f"± {margin:,.0f}"]
+        if exact_counts is not None:
+            row += [len(exact_counts[key])]
+        rows.append(row)
+    tables.append(("Valores distintos", headers, rows))
+    return tables
+
+def _text_cell(value):
+    # Como vra_output._cell, mas para o terminal (sem escapar HTML)
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f"{value:.2f}%"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+def write_preview(merged, exact_counts=None, output_path=PREVIEW_OUTPUT):
+    """Gera o HTML da prévia e resume os números no terminal"""
+    total_voos = merged['total_flights']
+    total_cancelados = merged['total_cancelled']
+    if total_voos == 0:
+        print("Nenhum voo encontrado nos arquivos da prévia")
+        return
+    taxa_cancelamento = total_cancelados / total_voos * 100
+    periodo = (f"{merged['first_date'].strftime('%d/%m/%Y')} a {merged['last_date'].strftime('%d/%m/%Y')}"
+               if merged['first_date'] is not None else "desconhecido")
+    cms_error = merged['cancelled'].error_bound()
+    confidence = merged['cancelled'].confidence() * 100
+    tables = _preview_tables(merged, exact_counts)
+
+    html_content = f"""
+    <!DOCTYPE html>
+    <html lang="pt-BR">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Prévia - Cancelamentos de Voos - Brasil</title>
+        <style>{DASHBOARD_STYLE}</style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>⚡ Prévia de Cancelamentos de Voos</h1>
+                <p>Estimativas a partir de resumos aproximados de cada arquivo</p>
+                <p>Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}</p>
+            </div>
+            
+            <div class="stats">
+                <div class="stat-card">
+                    <div class="stat-number">{total_cancelados:,}</div>
+                    <div class="stat-label">Total de Cancelamentos</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-number">{merged['files']}</div>
+                    <div class="stat-label">Arquivos Resumidos</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-number">{total_voos:,}</div>
+                    <div class="stat-label">Total de Voos</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-number">{taxa_cancelamento:.2f}%</div>
+                    <div class="stat-label">Taxa de Cancelamento</div>
+                </div>
+            </div>
+            
+            <div class="highlight">
+                <h3>📐 Como ler a prévia:</h3>
+                <p><strong>Período dos arquivos:</strong> {periodo}</p>
+                <p>Totais e taxa geral são exatos. As contagens por empresa e aeroporto são estimativas: com
+                {confidence:.1f}% de confiança, passam do valor real em no máximo {cms_error:,.0f}, e o
+                intervalo mostra onde o valor real está.</p>
+                <p>Os valores distintos têm erro padrão de
+                {merged['routes'].relative_error() * 100:.1f}%; a margem é de dois erros padrão.</p>
+            </div>
+    """
+    for table_html in vra_output.table_blocks(tables):
+        html_content += table_html
+    html_content += """
+            <div class="footer">
+                <p><strong>Prévia do Dashboard de Cancelamentos de Voos - Brasil</strong></p>
+                <p>Para os números exatos e os gráficos, gere o dashboard completo (sem --preview)</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+    with vra_profiling.stage('html_write'):
+        tmp_path = output_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+        os.replace(tmp_path, output_path)
+
+    print("\n" + "="*60)
+    print("⚡ PRÉVIA (ESTIMATIVAS)")
+    print("="*60)
+    print(f"📁 Arquivos: {merged['files']} - período {periodo}")
+    print(f"📊 Total de voos: {total_voos:,}")
+    print(f"❌ Total de cancelamentos: {total_cancelados:,} ({taxa_cancelamento:.2f}%)")
+    for title, headers, rows in tables:
+        print(f"\n{title}")
+        for row in rows:
+            print("  " + " | ".join(_text_cell(value) for value in row))
+    print(f"\nContagens por empresa/aeroporto: no máximo +{cms_error:,.0f} acima do real "
+          f"({confidence:.1f}% de confiança)")
+    print("="*60)
+    print(f"📄 Abra o arquivo '{output_path}' no seu navegador!")
+    print("="*60)
+
+def write_dashboard(aggregates, files_count, jobs=1, dpi=300, image_format='png', output_mode='inline',
+                    output_path='dashboard_cancelamentos_voos.html', filters=None, rss_before=None):
+    """Gera o HTML do dashboard a partir dos agregados"""
+    if aggregates['total_flights'] == 0:
+        print("Nenhum voo encontrado com os filtros informados")
+        return
+
+    print(f"Total de registros combinados: {aggregates['total_flights']}")
+    rss_loaded = vra_profiling.peak_rss_mb()
+    print(f"Total de voos cancelados: {aggregates['total_cancelled']}")
+    
+    if aggregates['total_cancelled'] == 0:
+        print("Nenhum voo cancelado encontrado nos dados")
+        return
+    
+    # Calcular estatísticas gerais
+    total_voos = aggregates['total_flights']
+    total_cancelados = aggregates['total_cancelled']
+    taxa_cancelamento = (total_cancelados / total_voos) * 100
+    empresa_mais_cancela = vra_aggregates.top(aggregates['cancelled_by_airline'], 1).index[0]
+    aeroporto_mais_cancela = vra_aggregates.top(aggregates['cancelled_by_origin_icao'], 1).index[0]
+    
+    # Gráficos: desenhados no navegador a partir de um JSON, ou renderizados aqui
+    # (em paralelo e só os que mudaram) e embutidos no HTML ou gravados à parte
+    scripts = ""
+    if output_mode == 'json':
+        summary = {
+            'total_flights': total_voos,
+            'total_cancelled': total_cancelados,
+            'cancellation_rate': taxa_cancelamento,
+            'first_date': aggregates['first_date'],
+            'last_date': aggregates['last_date'],
+        }
+        with vra_profiling.stage('json_write'):
+            chart_blocks, scripts = vra_output.json_chart_blocks(aggregates, output_path, summary)
+    else:
+        with vra_profiling.stage('render'):
+            charts = vra_charts.render_charts(aggregates, dpi, image_format, jobs)
+        if output_mode == 'files':
+            chart_blocks = vra_output.file_chart_blocks(charts, output_path)
+        else:
+            chart_blocks = vra_output.inline_chart_blocks(charts)
+    
+    description = filters.describe() if filters is not None else ''
+    filters_html = f"\n                <p>Filtros: {html.escape(description)}</p>" if description else ''
+    
+    # Gerar HTML
+    html_content = f"""
+    <!DOCTYPE html>
+    <html lang="pt-BR">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Dashboard de Cancelamentos de Voos - Brasil</title>
+        <style>{DASHBOARD_STYLE}</style>
     </head>
     <body>
         <div class="container">
             <div class="header">
                 <h1>✈️ Dashboard de Cancelamentos de Voos</h1>
                 <p>Análise Completa dos Dados de Voos Brasileiros</p>
-                <p>Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}</p>
+                <p>Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}</p>{filters_html}
             </div>
             
             <div class="stats">
@@ -351,7 +763,7 @@ def create_flight_cancellation_dashboard():
                     <div class="stat-label">Total de Cancelamentos</div>
                 </div>
                 <div class="stat-card">
-                    <div class="stat-number">{len(csv_files)}</div>
+                    <div class="stat-number">{files_count}</div>
                     <div class="stat-label">Arquivos Processados</div>
                 </div>
                 <div class="stat-card">
@@ -368,33 +780,33 @@ def create_flight_cancellation_dashboard():
                 <h3>🔍 Principais Insights:</h3>
                 <p><strong>Empresa que mais cancela:</strong> {empresa_mais_cancela}</p>
                 <p><strong>Aeroporto com mais cancelamentos:</strong> {aeroporto_mais_cancela}</p>
-                <p><strong>Período analisado:</strong> {df_cancelled['Data'].min().strftime('%d/%m/%Y')} a {df_cancelled['Data'].max().strftime('%d/%m/%Y')}</p>
+                <p><strong>Período analisado:</strong> {aggregates['first_date'].strftime('%d/%m/%Y')} a {aggregates['last_date'].strftime('%d/%m/%Y')}</p>
             </div>
     """
     
-    # Adicionar gráficos ao HTML
-    for title, chart_data in charts:
-        html_content += f"""
-        <div class="chart-container">
-            <div class="chart-title">{title}</div>
-            <img src="{chart_data}" alt="{title}" class="chart-image">
-        </div>
-        """
+    # Adicionar gráficos e tabelas (rotas e atrasos) ao HTML
+    tables = vra_charts.route_tables(aggregates) + vra_charts.delay_tables(aggregates)
+    for chart_html in chart_blocks + vra_output.table_blocks(tables):
+        html_content += chart_html
     
-    html_content += """
+    html_content += f"""
             <div class="footer">
                 <p><strong>Dashboard de Cancelamentos de Voos - Brasil</strong></p>
                 <p>Desenvolvido com Python, Pandas, Matplotlib e Seaborn</p>
                 <p>Dados processados automaticamente a partir dos arquivos CSV da ANAC</p>
             </div>
         </div>
+    {scripts}
     </body>
     </html>
     """
     
-    # Salvar HTML
-    with open('dashboard_cancelamentos_voos.html', 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    # Salvar HTML (arquivo temporário + troca, para quem está servindo a página nunca ver metade dela)
+    with vra_profiling.stage('html_write'):
+        tmp_path = output_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+        os.replace(tmp_path, output_path)
     
     print("\n" + "="*60)
     print("🎉 DASHBOARD CRIADO COM SUCESSO!")
@@ -404,15 +816,125 @@ def create_flight_cancellation_dashboard():
     print(f"📈 Taxa de cancelamento: {taxa_cancelamento:.2f}%")
     print(f"🏢 Empresa que mais cancela: {empresa_mais_cancela}")
     print(f"✈️ Aeroporto com mais cancelamentos: {aeroporto_mais_cancela}")
-    print(f"📁 Arquivos processados: {len(csv_files)}")
+    print(f"📁 Arquivos processados: {files_count}")
+    print(f"💾 Pico de memória (RSS do maior processo): antes da carga {format_mb(rss_before)}, "
+          f"após a carga {format_mb(rss_loaded)}, final {format_mb(vra_profiling.peak_rss_mb())}")
     print("="*60)
-    print("📄 Abra o arquivo 'dashboard_cancelamentos_voos.html' no seu navegador!")
+    print(f"📄 Abra o arquivo '{output_path}' no seu navegador!")
     print("="*60)
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gera o dashboard de cancelamentos a partir dos CSVs da pasta 'all' (ou de --source)")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Número de processos para ler os CSVs (padrão: número de núcleos)")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Agrega cada arquivo em pedaços, sem montar todos os dados na memória (com o banco "
+                             "de agregados, o padrão, a leitura já é em pedaços; a opção vale com --no-store ou "
+                             "com filtros)")
+    parser.add_argument('--chunksize', type=int, default=500_000,
+                        help="Linhas por pedaço no modo --streaming e na atualização do banco de agregados "
+                             "(padrão: 500000)")
+    parser.add_argument('--store', default=vra_store.STORE_PATH,
+                        help=f"Banco com os agregados de cada arquivo (padrão: {vra_store.STORE_PATH})")
+    parser.add_argument('--no-store', action='store_true',
+                        help="Recalcula tudo sem usar o banco de agregados")
+    parser.add_argument('--dpi', type=int, default=300,
+                        help="Resolução dos gráficos (padrão: 300)")
+    parser.add_argument('--format', choices=sorted(vra_charts.MIME_TYPES), default='png',
+                        help="Formato das imagens dos gráficos (padrão: png)")
+    parser.add_argument('--output-mode', choices=vra_output.OUTPUT_MODES, default='inline',
+                        help="inline: imagens embutidas no HTML; files: imagens em arquivos com hash no nome; "
+                             "json: agregados em JSON desenhados no navegador (padrão: inline)")
+    parser.add_argument('--output',
+                        help=f"Caminho do HTML gerado (padrão: dashboard_cancelamentos_voos.html, "
+                             f"ou {PREVIEW_OUTPUT} com --preview)")
+    parser.add_argument('--source', dest='sources', action='append', metavar='CAMINHO',
+                        help=f"Pasta (lida com as subpastas) ou arquivo CSV a analisar; repita para vários "
+                             f"(padrão: {DEFAULT_SOURCE}). Ex.: --source dados_vra_anac")
+    filters = parser.add_argument_group('filtros', "Recortam os dados do dashboard (arquivos fora do período nem são lidos)")
+    filters.add_argument('--start', help="Data inicial (AAAA, AAAA-MM ou AAAA-MM-DD)")
+    filters.add_argument('--end', help="Data final, inclusiva (AAAA, AAAA-MM ou AAAA-MM-DD)")
+    filters.add_argument('--airline', dest='airlines', action='append', metavar='EMPRESA',
+                         help="Empresa aérea, como aparece nos dados (repita para várias)")
+    filters.add_argument('--origin', dest='origins', action='append', metavar='ICAO',
+                         help="Sigla ICAO do aeroporto de origem (repita para vários)")
+    filters.add_argument('--destination', dest='destinations', action='append', metavar='ICAO',
+                         help="Sigla ICAO do aeroporto de destino (repita para vários)")
+    filters.add_argument('--line-type', dest='line_types', action='append', metavar='CÓDIGO',
+                         help="Código do tipo de linha, por exemplo N, R ou I (repita para vários)")
+    parser.add_argument('--reports', metavar='JSON',
+                        help="Gera vários dashboards filtrados em uma única leitura dos dados; o JSON é uma lista "
+                             "de objetos com 'output' e os filtros (start, end, airlines, origins, destinations, "
+                             "line_types)")
+    parser.add_argument('--preview', action='store_true',
+                        help="Prévia rápida com estimativas (Count-Min, Misra-Gries e HyperLogLog) a partir de "
+                             "sketches guardados ao lado de cada CSV; cobre o último mês ou --start/--end")
+    parser.add_argument('--exact', action='store_true',
+                        help="Com --preview, lê também os dados completos e mostra os valores exatos ao lado")
+    parser.add_argument('--ingestion-report', default=vra_cache.INGESTION_REPORT, metavar='PATH',
+                        help=f"JSON com o formato detectado, as linhas descartadas e as falhas de cada CSV "
+                             f"(padrão: {vra_cache.INGESTION_REPORT})")
+    parser.add_argument('--profile-json', metavar='PATH',
+                        help="Grava tempo, linhas/s e pico de memória de cada etapa em um JSON")
+    parser.add_argument('--cprofile', metavar='PATH',
+                        help="Grava o perfil do cProfile da execução (veja com python -m pstats)")
+    args = parser.parse_args(argv)
+    try:
+        args.filters = vra_filters.DashboardFilter(args.start, args.end, args.airlines, args.origins,
+                                                   args.destinations, args.line_types)
+        args.reports = load_reports(args.reports) if args.reports else None
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.reports and not args.filters.is_empty():
+        parser.error("use os filtros dentro do arquivo de --reports, não na linha de comando")
+    if args.exact and not args.preview:
+        parser.error("--exact só vale com --preview")
+    if args.preview and (args.reports or any(getattr(args, name) for name in vra_filters.VALUE_FILTERS)):
+        parser.error("--preview só aceita os filtros de período (--start e --end)")
+    if not args.output:
+        args.output = PREVIEW_OUTPUT if args.preview else 'dashboard_cancelamentos_voos.html'
+    return args
+
+def load_reports(path):
+    """Lê a lista de dashboards de --reports: [(filtro, caminho do HTML)]"""
+    with open(path, 'r', encoding='utf-8') as f:
+        specs = json.load(f)
+    if not isinstance(specs, list) or not specs:
+        raise ValueError(f"{path}: esperada uma lista de relatórios")
+    reports = []
+    for spec in specs:
+        spec = dict(spec)
+        output_path = spec.pop('output', None)
+        if not output_path:
+            raise ValueError(f"{path}: todo relatório precisa de 'output'")
+        reports.append((vra_filters.DashboardFilter.from_dict(spec), output_path))
+    outputs = [output_path for _, output_path in reports]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError(f"{path}: há relatórios com o mesmo 'output'")
+    return reports
+
 if __name__ == "__main__":
-    # Criar pasta 'all' se não existir
-    if not os.path.exists('all'):
-        os.makedirs('all')
+    args = parse_args()
+
+    # Criar pasta 'all' se não existir (só quando ela é a fonte)
+    if not args.sources and not os.path.exists(DEFAULT_SOURCE):
+        os.makedirs(DEFAULT_SOURCE)
         print("📁 Pasta 'all' criada. Coloque seus arquivos CSV nela e execute novamente.")
     else:
-        create_flight_cancellation_dashboard()
\ No newline at end of file
+        with vra_profiling.profiled(args.profile_json, args.cprofile):
+            if args.preview:
+                preview_dashboard(jobs=args.jobs, filters=args.filters, sources=args.sources,
+                                  exact=args.exact, output_path=args.output)
+            elif args.reports:
+                generate_reports(args.reports, jobs=args.jobs, streaming=args.streaming,
+                                 chunksize=args.chunksize, dpi=args.dpi, image_format=args.format,
+                                 output_mode=args.output_mode, sources=args.sources,
+                                 ingestion_report=args.ingestion_report)
+            else:
+                create_flight_cancellation_dashboard(jobs=args.jobs, streaming=args.streaming,
+                                                 chunksize=args.chunksize,
+                                                 store_path=None if args.no_store else args.store,
+                                                 dpi=args.dpi, image_format=args.format,
+                                                 output_mode=args.output_mode, output_path=args.output,
+                                                 filters=args.filters, sources=args.sources,
+                                                 ingestion_report=args.ingestion_report)
\ No newline at end of file
@@ -1,105 +1,611 @@
 import requests
+from requests.adapters import HTTPAdapter
 import os
-from urllib.parse import urljoin
+import time
+import argparse
+import threading
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlparse, urldefrag
+from html.parser import HTMLParser
+from email.utils import parsedate_to_datetime
 import re
+import unicodedata
 from pathlib import Path
+import vra_profiling
+import vra_compression
 
-def get_csv_links_from_page(url):
+# Raiz do diretório VRA no site da ANAC
+BASE_URL = "https://siros.anac.gov.br/siros/registros/diversos/vra/"
+# Usados só se a listagem da raiz não puder ser lida (os anos são descobertos nela)
+DEFAULT_YEARS = ["2021", "2022", "2023", "2024", "2025"]
+
+# Tempo máximo (segundos) para conectar/ler de cada requisição
+REQUEST_TIMEOUT = 60
+CHUNK_SIZE = 64 * 1024
+
+# Nome do manifesto salvo dentro do diretório de download
+MANIFEST_NAME = "manifest.json"
+
+# Mesmo com a listagem do ano igual à anterior, a ANAC pode republicar um mês
+# corrigido com o mesmo nome: os meses mais recentes e os arquivos conferidos
+# há mais de alguns dias são revalidados (requisição condicional) sempre
+RECENT_MONTHS = 3
+REVALIDATE_AFTER_DAYS = 30
+
+# Meses por extenso (ou abreviados) em nomes de arquivo como VRA_Janeiro_2022.csv
+MONTH_NAMES = ['janeiro', 'fevereiro', 'marco', 'abril', 'maio', 'junho',
+               'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro']
+
+# Resultados possíveis de download_file
+DOWNLOADED = "downloaded"
+NOT_MODIFIED = "not_modified"
+FAILED = "failed"
+
+
+class HostLimiter:
+    """Limita quantas requisições simultâneas cada host pode receber"""
+
+    def __init__(self, max_per_host):
+        self.max_per_host = max_per_host
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def slot(self, url):
+        """Retorna o semáforo do host da URL (use com `with`)"""
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._semaphores[host]
+
+
+def create_session(pool_size=10):
+    """Cria uma sessão HTTP com conexões keep-alive compartilhadas entre threads"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class LinkExtractor(HTMLParser):
+    """Coleta o href de cada link (<a>) de uma página"""
+
+    def __init__(self):
+        super().__init__()
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            href = dict(attrs).get('href')
+            if href:
+                self.links.append(href.strip())
+
+
+def extract_links(html, page_url):
+    """URLs absolutas dos links de uma página, sem repetições e na ordem em que aparecem"""
+    parser = LinkExtractor()
+    parser.feed(html)
+    parser.close()
+    links = {}
+    for href in parser.links:
+        links.setdefault(urldefrag(urljoin(page_url, href))[0], None)
+    return list(links)
+
+
+def csv_links(links):
+    """Só os links para arquivos .csv"""
+    return [link for link in links if urlparse(link).path.lower().endswith('.csv')]
+
+
+def month_from_name(filename):
+    """(ano, mês) no nome do arquivo: VRA_2024_01.csv, VRA_2024_1.csv ou VRA_Janeiro_2024.csv; ou None"""
+    name = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii').lower()
+    match = re.search(r'(?<!\d)((?:19|20)\d{2})(?:[_\-.]?(0[1-9]|1[0-2])|[_\-.]([1-9]))(?!\d)', name)
+    if match:
+        return int(match.group(1)), int(match.group(2) or match.group(3))
+    year = re.search(r'(?<!\d)((?:19|20)\d{2})(?!\d)', name)
+    for month, month_name in enumerate(MONTH_NAMES, start=1):
+        if year and re.search(rf'(?<![a-z])(?:{month_name}|{month_name[:3]})(?![a-z])', name):
+            return int(year.group(1)), month
+    return None
+
+
+def _http_date(value):
+    """Cabeçalho Last-Modified em segundos desde a época (0 se ausente ou inválido)"""
+    try:
+        return parsedate_to_datetime(value).timestamp() if value else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def publication_order(year, csv_url, entry=None):
+    """Chave para ordenar os arquivos do mais antigo ao mais recente
+
+    Usa o ano e o mês do nome do arquivo; sem mês no nome, o ano da pasta.
+    Empates (ou nomes sem data) são decididos pelo Last-Modified guardado no
+    manifesto e, por fim, pelo nome.
+    """
+    filename = os.path.basename(urlparse(csv_url).path)
+    month = month_from_name(filename)
+    if month is None:
+        month = (int(year) if str(year).isdigit() else 0, 0)
+    return month, _http_date((entry or {}).get('last_modified')), filename
+
+
+def year_links(links, base_url):
+    """Anos (subpastas AAAA/) logo abaixo da raiz, em ordem"""
+    years = set()
+    for link in links:
+        if link.startswith(base_url) and re.fullmatch(r'\d{4}/?', link[len(base_url):]):
+            years.add(link[len(base_url):].strip('/'))
+    return sorted(years)
+
+
+def fetch_listing(url, session=None, manifest=None, limiter=None):
+    """Links de uma página de listagem, com requisição condicional
+
+    A listagem fica guardada no manifesto com o ETag/Last-Modified e o SHA-256
+    do corpo. Retorna (links, changed): changed é False quando o servidor
+    responde 304 ou devolve exatamente a mesma página. Erros de rede sobem
+    como requests.RequestException.
+    """
+    http = session or requests
+    slot = limiter.slot(url) if limiter else threading.Semaphore()
+    cached = manifest.get_listing(url) if manifest else None
+    headers = {}
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
+
+    with slot:
+        response = http.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304 and cached:
+        return cached['links'], False
+    response.raise_for_status()
+
+    body_sha256 = hashlib.sha256(response.content).hexdigest()
+    if cached and cached.get('sha256') == body_sha256:
+        links, changed = cached['links'], False
+    else:
+        links, changed = extract_links(response.text, url), True
+    if manifest:
+        manifest.set_listing(url, {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'sha256': body_sha256,
+            'links': links,
+        })
+    return links, changed
+
+
+def get_csv_links_from_page(url, session=None):
     """Extrai todos os links de arquivos CSV de uma página"""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        # Procura por arquivos .csv na página
-        csv_pattern = r'(\w+\.csv)'
-        csv_files = re.findall(csv_pattern, response.text)
-        
-        # Cria URLs completas para os arquivos CSV
-        csv_urls = [urljoin(url, csv_file) for csv_file in csv_files]
-        return csv_urls
-    
+        links, _ = fetch_listing(url, session)
+        return csv_links(links)
     except requests.RequestException as e:
         print(f"Erro ao acessar {url}: {e}")
         return []
 
-def download_file(url, local_path):
-    """Baixa um arquivo da URL para o caminho local"""
+
+def discover_years(base_url, session=None, manifest=None, limiter=None):
+    """Anos publicados na raiz do VRA; se a raiz não puder ser lida, DEFAULT_YEARS"""
     try:
-        print(f"Baixando: {url}")
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        
-        # Cria o diretório se não existir
-        os.makedirs(os.path.dirname(local_path), exist_ok=True)
-        
-        with open(local_path, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
-        
-        print(f"✓ Salvo em: {local_path}")
-        return True
-        
+        links, _ = fetch_listing(base_url, session, manifest, limiter)
     except requests.RequestException as e:
-        print(f"✗ Erro ao baixar {url}: {e}")
+        print(f"Erro ao listar os anos em {base_url}: {e}; usando {', '.join(DEFAULT_YEARS)}")
+        return DEFAULT_YEARS
+    years = year_links(links, base_url)
+    if not years:
+        print(f"Nenhuma pasta de ano encontrada em {base_url}; usando {', '.join(DEFAULT_YEARS)}")
+        return DEFAULT_YEARS
+    return years
+
+class Manifest:
+    """Guarda ETag, Last-Modified, tamanho e SHA-256 de cada URL baixada"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.files = {}
+        self.partials = {}
+        self.listings = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.files = data.get('files', {})
+            self.partials = data.get('partials', {})
+            self.listings = data.get('listings', {})
+
+    def get(self, url):
+        with self._lock:
+            return self.files.get(url)
+
+    def get_partial(self, url):
+        with self._lock:
+            return self.partials.get(url)
+
+    def set_partial(self, url, validators):
+        with self._lock:
+            if validators:
+                self.partials[url] = validators
+            else:
+                self.partials.pop(url, None)
+            self._save()
+
+    def get_listing(self, url):
+        with self._lock:
+            return self.listings.get(url)
+
+    def set_listing(self, url, entry):
+        with self._lock:
+            self.listings[url] = entry
+            self._save()
+
+    def update(self, url, entry):
+        with self._lock:
+            self.files[url] = {**entry, 'checked_at': time.time()}
+            self.partials.pop(url, None)
+            self._save()
+
+    def mark_checked(self, url):
+        """Registra que o servidor confirmou que o arquivo não mudou"""
+        with self._lock:
+            if url in self.files:
+                self.files[url]['checked_at'] = time.time()
+                self._save()
+
+    def _save(self):
+        # Escreve em arquivo temporário e renomeia, para nunca corromper o manifesto
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': self.files, 'partials': self.partials, 'listings': self.listings},
+                      f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def hash_file_into(path, digest):
+    """Atualiza o digest com o conteúdo de um arquivo local (descomprimido, se for .gz/.zst)"""
+    with vra_compression.open_reader(path) as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest
+
+
+def is_complete(local_path, entry, verify=False):
+    """Confere se o arquivo local corresponde ao que está no manifesto"""
+    if not os.path.exists(local_path) or os.path.getsize(local_path) != entry.get('size'):
         return False
+    if verify:
+        return hash_file_into(local_path, hashlib.sha256()).hexdigest() == entry.get('sha256')
+    return True
+
+
+def adopt_existing(url, local_path, http, manifest):
+    """Registra no manifesto um arquivo baixado antes do manifesto existir
+
+    Só aceita o arquivo se o tamanho bater com o Content-Length do servidor;
+    caso contrário ele é tratado como parcial e baixado de novo.
+    """
+    response = http.head(url, timeout=REQUEST_TIMEOUT, allow_redirects=True)
+    response.raise_for_status()
+    length = response.headers.get('Content-Length')
+    size = os.path.getsize(local_path)
+    if length is None or int(length) != size:
+        return False
+    manifest.update(url, {
+        'path': local_path,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'size': size,
+        'sha256': hash_file_into(local_path, hashlib.sha256()).hexdigest(),
+    })
+    return True
+
+
+def range_validator(validators):
+    """Escolhe o validador para If-Range (ETags fracas não servem)"""
+    if not validators:
+        return None
+    etag = validators.get('etag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return validators.get('last_modified')
+
+
+def content_range_starts_at(response, offset):
+    """Confere se a resposta 206 começa exatamente onde o parcial parou"""
+    content_range = response.headers.get('Content-Range', '')
+    match = re.match(r'bytes (\d+)-', content_range)
+    return bool(match) and int(match.group(1)) == offset
+
+
+def expected_size(response, resume_from):
+    """Tamanho total esperado do arquivo, quando o servidor informa"""
+    if response.status_code == 206:
+        match = re.search(r'/(\d+)$', response.headers.get('Content-Range', ''))
+        return int(match.group(1)) if match else None
+    length = response.headers.get('Content-Length')
+    # Com Content-Encoding o corpo decodificado não tem o tamanho informado
+    if length is None or response.headers.get('Content-Encoding'):
+        return None
+    return int(length)
+
+def download_file(url, local_path, session=None, limiter=None, manifest=None, verify=False, compression=None):
+    """Baixa um arquivo da URL para o caminho local
+
+    Com um manifesto, o download é condicional (If-None-Match/If-Modified-Since),
+    retoma arquivos parciais com Range e só troca o arquivo final, de forma
+    atômica, quando o conteúdo chega inteiro. Com `compression` ('gzip' ou
+    'zstd') o arquivo é comprimido enquanto chega; no manifesto ficam o tamanho
+    em disco e o SHA-256 do conteúdo original. Retorna DOWNLOADED, NOT_MODIFIED
+    ou FAILED.
+    """
+    http = session or requests
+    slot = limiter.slot(url) if limiter else threading.Semaphore()
+    part_path = local_path + '.part'
+    entry = manifest.get(url) if manifest else None
+    try:
+        # Conferir o arquivo local (com --verify, o SHA-256 inteiro) não usa a
+        # rede: é feito antes de ocupar uma das conexões do host
+        complete = bool(entry) and is_complete(local_path, entry, verify)
+        with slot:
+            headers = {}
+            resume_from = 0
+
+            if complete:
+                # Arquivo íntegro: pergunta ao servidor se mudou
+                if entry.get('etag'):
+                    headers['If-None-Match'] = entry['etag']
+                if entry.get('last_modified'):
+                    headers['If-Modified-Since'] = entry['last_modified']
+            elif manifest and not entry and not compression and os.path.exists(local_path):
+                # Arquivo de uma versão anterior do script, sem manifesto
+                if adopt_existing(url, local_path, http, manifest):
+                    print(f"⚠ Arquivo já existe: {local_path}")
+                    return NOT_MODIFIED
+            elif manifest and not compression and os.path.exists(part_path):
+                # Retoma o download interrompido, se ainda for a mesma versão
+                # (um parcial comprimido não tem como ser continuado)
+                validator = range_validator(manifest.get_partial(url))
+                if validator:
+                    resume_from = os.path.getsize(part_path)
+                    headers['Range'] = f"bytes={resume_from}-"
+                    headers['If-Range'] = validator
+
+            # O with devolve a conexão ao pool da sessão também quando a leitura ou a gravação falha
+            with http.get(url, stream=True, headers=headers, timeout=REQUEST_TIMEOUT) as response:
+                if response.status_code == 304:
+                    if manifest:
+                        manifest.mark_checked(url)
+                    print(f"= Sem alterações: {local_path}")
+                    return NOT_MODIFIED
+                if response.status_code == 416 and resume_from:
+                    # Parcial inválido para o servidor: recomeça do zero (com esta conexão já liberada)
+                    response.close()
+                    os.remove(part_path)
+                    manifest.set_partial(url, None)
+                    return download_file(url, local_path, session, limiter=None, manifest=manifest, verify=verify,
+                                         compression=compression)
+                response.raise_for_status()
+
+                if response.status_code != 206 or not content_range_starts_at(response, resume_from):
+                    resume_from = 0
+
+                print(f"Baixando: {url}" + (f" (retomando de {resume_from} bytes)" if resume_from else ""))
+
+                # Cria o diretório se não existir
+                os.makedirs(os.path.dirname(local_path) or '.', exist_ok=True)
+
+                validators = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                }
+                if manifest:
+                    manifest.set_partial(url, validators)
+
+                digest = hashlib.sha256()
+                if resume_from:
+                    hash_file_into(part_path, digest)
+
+                received = resume_from
+                with vra_profiling.stage('download') as stage, \
+                        open(part_path, 'ab' if resume_from else 'wb') as file:
+                    writer = vra_compression.compressing_writer(file, compression) if compression else file
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        writer.write(chunk)
+                        digest.update(chunk)
+                        received += len(chunk)
+                        stage['bytes'] = stage.get('bytes', 0) + len(chunk)
+                    if compression:
+                        writer.close()
+                    file.flush()
+                    os.fsync(file.fileno())
+
+                expected = expected_size(response, resume_from)
+                if expected is not None and received != expected:
+                    raise requests.RequestException(f"download incompleto ({received} de {expected} bytes)")
+
+            # Troca atômica: o arquivo final nunca fica pela metade
+            os.replace(part_path, local_path)
+            if manifest:
+                manifest.update(url, {
+                    'path': local_path,
+                    'etag': validators['etag'],
+                    'last_modified': validators['last_modified'],
+                    'size': os.path.getsize(local_path),
+                    'sha256': digest.hexdigest(),
+                    'compression': compression,
+                })
+            # Mudou a compressão: a cópia antiga (com outra extensão) sai do disco
+            if entry and entry.get('path') not in (None, local_path) and os.path.exists(entry['path']):
+                os.remove(entry['path'])
+                print(f"Removido: {entry['path']} (substituído por {local_path})")
+
+        print(f"✓ Salvo em: {local_path}")
+        return DOWNLOADED
+
+    except (requests.RequestException, OSError) as e:
+        print(f"✗ Erro ao baixar {url}: {e}")
+        return FAILED
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Baixa os arquivos CSV do VRA publicados pela ANAC")
+    parser.add_argument('--workers', type=int, default=4,
+                        help="Número de downloads simultâneos (padrão: 4; use 1 para baixar em sequência)")
+    parser.add_argument('--max-per-host', type=int, default=4,
+                        help="Máximo de conexões simultâneas por host (padrão: 4)")
+    parser.add_argument('--base-url', default=BASE_URL,
+                        help="URL raiz do diretório VRA (útil para testar com um servidor local)")
+    parser.add_argument('--years', nargs='+',
+                        help="Anos a baixar (padrão: todos os publicados na raiz do VRA)")
+    parser.add_argument('--output-dir', default="dados_vra_anac",
+                        help="Diretório base para salvar os arquivos")
+    parser.add_argument('--verify', action='store_true',
+                        help="Recalcula o SHA-256 dos arquivos locais antes de revalidar")
+    parser.add_argument('--compression', choices=['none', *vra_compression.SUFFIXES], default='none',
+                        help="Grava os CSVs comprimidos (.csv.gz ou .csv.zst), comprimindo durante o download "
+                             "(padrão: none)")
+    parser.add_argument('--revalidate', action='store_true',
+                        help="Revalida cada arquivo no servidor mesmo quando a listagem do ano não mudou")
+    parser.add_argument('--recent-months', type=int, default=RECENT_MONTHS,
+                        help=f"Meses mais recentes revalidados mesmo com a listagem igual, porque a ANAC "
+                             f"republica correções com o mesmo nome (padrão: {RECENT_MONTHS})")
+    parser.add_argument('--revalidate-after', type=float, default=REVALIDATE_AFTER_DAYS, metavar='DIAS',
+                        help=f"Revalida também os arquivos conferidos há mais de DIAS dias "
+                             f"(padrão: {REVALIDATE_AFTER_DAYS})")
+    parser.add_argument('--profile-json', metavar='PATH',
+                        help="Grava tempo, bytes/s dos downloads e pico de memória de cada etapa em um JSON")
+    parser.add_argument('--cprofile', metavar='PATH',
+                        help="Grava o perfil do cProfile da execução (veja com python -m pstats)")
+    args = parser.parse_args(argv)
+    if args.compression == 'zstd' and not vra_compression.HAS_ZSTD:
+        parser.error("--compression zstd precisa do pacote zstandard (pip install zstandard)")
+    args.compression = None if args.compression == 'none' else args.compression
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    with vra_profiling.profiled(args.profile_json, args.cprofile):
+        sync(args)
+
+def recently_checked(entry, max_age_days):
+    """O servidor confirmou o arquivo há menos de `max_age_days` dias?"""
+    checked_at = entry.get('checked_at')
+    return checked_at is not None and time.time() - checked_at < max_age_days * 24 * 3600
+
+def sync(args):
+    """Baixa (ou revalida) os arquivos dos anos pedidos; retorna quantos ficaram em cada resultado"""
+    workers = max(1, args.workers)
+
+    base_url = args.base_url if args.base_url.endswith('/') else args.base_url + '/'
 
-def main():
-    # URLs base para cada ano
-    base_urls = [
-        "https://siros.anac.gov.br/siros/registros/diversos/vra/2021/",
-        "https://siros.anac.gov.br/siros/registros/diversos/vra/2022/",
-        "https://siros.anac.gov.br/siros/registros/diversos/vra/2023/",
-        "https://siros.anac.gov.br/siros/registros/diversos/vra/2024/",
-        "https://siros.anac.gov.br/siros/registros/diversos/vra/2025/"
-    ]
-    
     # Diretório base para salvar os arquivos
-    download_dir = "dados_vra_anac"
-    
+    download_dir = args.output_dir
+
+    # Sessão única (keep-alive) usada na listagem e nos downloads
+    session = create_session(pool_size=max(workers, args.max_per_host))
+    limiter = HostLimiter(max(1, args.max_per_host))
+    manifest = Manifest(os.path.join(download_dir, MANIFEST_NAME))
+
     total_downloaded = 0
+    total_unchanged = 0
     total_failed = 0
-    
-    for base_url in base_urls:
+    pending = []
+    queued = set()
+
+    # Anos pedidos ou descobertos na raiz; as listagens dos anos são buscadas em
+    # paralelo e com requisição condicional (a versão anterior fica no manifesto)
+    with vra_profiling.stage('listing') as stage:
+        years = args.years or discover_years(base_url, session, manifest, limiter)
+        year_urls = {year: urljoin(base_url, f"{year}/") for year in years}
+        listings = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(fetch_listing, url, session, manifest, limiter): year
+                       for year, url in year_urls.items()}
+            for future in as_completed(futures):
+                try:
+                    listings[futures[future]] = future.result()
+                except requests.RequestException as e:
+                    print(f"Erro ao acessar {year_urls[futures[future]]}: {e}")
+        stage['rows'] = len(year_urls)
+
+    # Os meses mais recentes (pelo ano e mês do nome do arquivo) são sempre revalidados
+    ordered = sorted((publication_order(year, csv_url, manifest.get(csv_url)), csv_url)
+                     for year, (links, _) in listings.items() for csv_url in csv_links(links))
+    recent = {csv_url for _, csv_url in ordered[-args.recent_months:]} if args.recent_months > 0 else set()
+
+    for year, year_url in year_urls.items():
         print(f"\n{'='*60}")
-        print(f"Processando: {base_url}")
+        print(f"Processando: {year_url}")
         print(f"{'='*60}")
-        
-        # Extrai o ano da URL
-        year = base_url.split('/')[-2]
+
         year_dir = os.path.join(download_dir, year)
-        
-        # Obtém todos os links CSV da página
-        csv_urls = get_csv_links_from_page(base_url)
-        
+        links, changed = listings.get(year, ([], True))
+        csv_urls = csv_links(links)
+
         if not csv_urls:
             print(f"Nenhum arquivo CSV encontrado para {year}")
             continue
-        
+
         print(f"Encontrados {len(csv_urls)} arquivos CSV para {year}")
-        
-        # Baixa cada arquivo CSV
+
+        skipped = 0
         for csv_url in csv_urls:
-            filename = os.path.basename(csv_url)
-            local_path = os.path.join(year_dir, filename)
-            
-            # Verifica se o arquivo já existe
-            if os.path.exists(local_path):
-                print(f"⚠ Arquivo já existe: {local_path}")
+            filename = os.path.basename(urlparse(csv_url).path)
+            local_path = vra_compression.with_suffix(os.path.join(year_dir, filename), args.compression)
+
+            # Links repetidos na listagem de um ano são baixados uma vez só (o caminho local inclui o ano)
+            if local_path in queued:
+                continue
+            queued.add(local_path)
+
+            # Listagem igual à da última execução: os arquivos já baixados,
+            # íntegros e conferidos há pouco não são revalidados um a um, exceto
+            # os meses mais recentes (e todos com --revalidate)
+            entry = manifest.get(csv_url)
+            if (not changed and not args.revalidate and csv_url not in recent and entry
+                    and recently_checked(entry, args.revalidate_after)
+                    and is_complete(local_path, entry, args.verify)):
+                skipped += 1
                 continue
-            
-            # Baixa o arquivo
-            if download_file(csv_url, local_path):
+
+            pending.append((csv_url, local_path))
+
+        if skipped:
+            total_unchanged += skipped
+            print(f"= Listagem sem alterações: {skipped} arquivos já baixados não foram revalidados")
+
+    # Baixa (ou revalida) os arquivos CSV em paralelo, respeitando o limite por host
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(download_file, csv_url, local_path, session, limiter,
+                                   manifest, args.verify, args.compression)
+                   for csv_url, local_path in pending]
+        for future in as_completed(futures):
+            status = future.result()
+            if status == DOWNLOADED:
                 total_downloaded += 1
+            elif status == NOT_MODIFIED:
+                total_unchanged += 1
             else:
                 total_failed += 1
-    
+
+    session.close()
+
     # Resumo final
     print(f"\n{'='*60}")
     print(f"RESUMO DO DOWNLOAD")
     print(f"{'='*60}")
     print(f"✓ Arquivos baixados com sucesso: {total_downloaded}")
+    print(f"= Arquivos sem alterações: {total_unchanged}")
     print(f"✗ Arquivos com falha: {total_failed}")
     print(f"📁 Arquivos salvos em: {os.path.abspath(download_dir)}")
+    return {DOWNLOADED: total_downloaded, NOT_MODIFIED: total_unchanged, FAILED: total_failed}
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,127 @@
+import os
+import re
+import sys
+import shutil
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import generate_vra
+import results
+import vra_aggregates
+
+# Conjunto sintético pequeno: 3 meses de 2000 voos (benchmarks/generate_vra.py)
+ROWS_PER_FILE = 2000
+
+
+@pytest.fixture(scope='session')
+def vra_dir(tmp_path_factory):
+    """Pasta com CSVs sintéticos de janeiro a março de 2022"""
+    directory = tmp_path_factory.mktemp('vra') / 'all'
+    generate_vra.generate(3 * ROWS_PER_FILE, str(directory), rows_per_file=ROWS_PER_FILE, first_year=2022)
+    return str(directory)
+
+
+@pytest.fixture(scope='session')
+def csv_files(vra_dir):
+    return sorted(os.path.join(vra_dir, name) for name in os.listdir(vra_dir) if name.endswith('.csv'))
+
+
+@pytest.fixture(scope='session')
+def in_memory(csv_files, tmp_path_factory):
+    """Agregados de referência: todos os CSVs em um único DataFrame"""
+    return results.load_aggregates(csv_files, 1, str(tmp_path_factory.mktemp('cache_ref')))
+
+
+def etag_for(path):
+    stat = os.stat(path)
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+class VRAHandler(SimpleHTTPRequestHandler):
+    """Servidor de teste: listagens de pasta, ETag, If-None-Match e Range com If-Range"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests_log.append((self.path, dict(self.headers)))
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            return super().do_GET()
+        if not os.path.isfile(path):
+            return self.send_error(404)
+
+        etag = etag_for(path)
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        with open(path, 'rb') as f:
+            content = f.read()
+
+        start = 0
+        match = re.fullmatch(r'bytes=(\d+)-', self.headers.get('Range', ''))
+        if match and self.headers.get('If-Range') in (None, etag):
+            start = int(match.group(1))
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(content)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+        self.send_response(206 if start else 200)
+        if start:
+            self.send_header('Content-Range', f'bytes {start}-{len(content) - 1}/{len(content)}')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(content) - start))
+        self.end_headers()
+        self.wfile.write(content[start:])
+
+
+@pytest.fixture
+def anac_server(tmp_path, vra_dir):
+    """Servidor HTTP local com a árvore vra/<ano>/ da ANAC; retorna (URL raiz, pasta servida, log)"""
+    root = tmp_path / 'site'
+    year_dir = root / 'vra' / '2022'
+    year_dir.mkdir(parents=True)
+    for name in sorted(os.listdir(vra_dir)):
+        shutil.copyfile(os.path.join(vra_dir, name), year_dir / name)
+
+    def handler(*args, **kwargs):
+        return VRAHandler(*args, directory=str(root), **kwargs)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.requests_log = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/vra/", str(root / 'vra'), server.requests_log
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / 'cache')
+
+
+def assert_same_aggregates(a, b):
+    """Totais, período e cada contagem de COUNT_KEYS iguais (ignorando chaves com zero)"""
+    assert a['total_flights'] == b['total_flights']
+    assert a['total_cancelled'] == b['total_cancelled']
+    assert a['first_date'] == b['first_date']
+    assert a['last_date'] == b['last_date']
+    for key in vra_aggregates.COUNT_KEYS:
+        left, right = a[key], b[key]
+        left = left[left != 0].sort_index()
+        right = right[right != 0].sort_index()
+        pd.testing.assert_series_equal(left, right, check_dtype=False, check_names=False,
+                                       check_index_type=False, check_categorical=False, obj=key)
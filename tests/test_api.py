@@ -0,0 +1,106 @@
+import json
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+import pytest
+import results
+import vra_api
+import vra_store
+
+
+@pytest.fixture(scope='module')
+def store_path(csv_files, vra_dir, tmp_path_factory):
+    directory = tmp_path_factory.mktemp('api')
+    path = str(directory / 'agregados.sqlite')
+    results.incremental_aggregates(csv_files, 1, str(directory / 'cache'), store_path=path, sources=[vra_dir])
+    return path
+
+
+@pytest.fixture
+def service(store_path):
+    service = vra_api.QueryService(store_path)
+    yield service
+    service.close()
+
+
+def test_totals_match_the_dashboard(service, in_memory):
+    result = service.answer('taxa', {})
+    assert (result['total'], result['cancelados']) == (in_memory['total_flights'], in_memory['total_cancelled'])
+    status = service.answer('status', {})
+    assert status['arquivos'] == 3 and status['total'] == in_memory['total_flights']
+
+
+def test_airline_filter_ignores_case(service, in_memory):
+    airline = in_memory['cancelled_by_airline'].idxmax()
+    expected = service.answer('taxa', {'empresa': [airline]})
+    assert expected['cancelados'] == in_memory['cancelled_by_airline'][airline]
+    assert expected['total'] == in_memory['flights_by_airline'][airline]
+    lower = service.answer('taxa', {'empresa': [f'  {airline.lower()} ']})
+    assert (lower['total'], lower['cancelados']) == (expected['total'], expected['cancelados'])
+
+
+def test_top_follows_the_dashboard_ranking(service, in_memory):
+    result = service.answer('top', {'por': ['empresa'], 'n': ['3']})
+    expected = in_memory['cancelled_by_airline'].sort_values(ascending=False, kind='stable').head(3)
+    assert [item['empresa'] for item in result['itens']] == list(expected.index)
+    assert [item['cancelados'] for item in result['itens']] == list(expected.values)
+
+
+@pytest.mark.parametrize('query', [{'n': ['0']}, {'n': ['-1']}, {'n': ['x']}, {'metrica': ['media']},
+                                   {'por': ['cidade']}, {'inicio': ['2022-13']}])
+def test_invalid_parameters(service, query):
+    with pytest.raises(vra_api.BadRequest):
+        service.answer('top', {'por': ['empresa'], **query})
+
+
+def test_dimension_values_are_read_once_per_store_version(service, monkeypatch):
+    calls = []
+    original = vra_store.distinct_values
+
+    def counting(conn, column):
+        calls.append(column)
+        return original(conn, column)
+    monkeypatch.setattr(vra_store, 'distinct_values', counting)
+    for airline in ('A', 'B', 'C'):
+        service.answer('taxa', {'empresa': [airline]})
+    assert calls == ['empresa']
+
+
+@pytest.fixture
+def api_url(service):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), vra_api.make_handler(service))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_http_handler(api_url, in_memory):
+    status, body = _get(f"{api_url}/taxa?por=mes")
+    assert status == 200
+    assert [item['mes'] for item in body['itens']] == [1, 2, 3]
+    assert sum(item['total'] for item in body['itens']) == in_memory['total_flights']
+    assert _get(f"{api_url}/top?por=empresa&n=-2")[0] == 400
+    assert _get(f"{api_url}/desconhecido")[0] == 404
+
+
+def test_concurrent_requests_share_the_connection(api_url, in_memory):
+    # Cada requisição roda em uma thread nova do servidor
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        answers = list(executor.map(lambda month: _get(f"{api_url}/taxa?inicio=2022-{month:02d}&fim=2022-{month:02d}"),
+                                    [1, 2, 3] * 10))
+    assert all(status == 200 for status, _ in answers)
+    assert sum(body['total'] for _, body in answers[:3]) == in_memory['total_flights']
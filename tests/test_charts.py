@@ -0,0 +1,38 @@
+import os
+import time
+
+import vra_charts
+
+
+def test_render_charts_prunes_stale_images(in_memory, tmp_path):
+    cache_dir = str(tmp_path / 'graficos')
+    charts = vra_charts.render_charts(in_memory, dpi=20, cache_dir=cache_dir)
+    produced = set(os.listdir(cache_dir))
+    assert len(produced) == len(charts)
+
+    old = time.time() - vra_charts.CHART_CACHE_GRACE_SECONDS - 60
+    stale = os.path.join(cache_dir, 'velho.png')
+    recent = os.path.join(cache_dir, 'recente.svg')
+    for path in (stale, recent):
+        with open(path, 'wb') as f:
+            f.write(b'imagem')
+    os.utime(stale, (old, old))
+    # Uma imagem reaproveitada tem o uso renovado e não é apagada
+    reused = os.path.join(cache_dir, sorted(produced)[0])
+    os.utime(reused, (old, old))
+
+    again = vra_charts.render_charts(in_memory, dpi=20, cache_dir=cache_dir)
+    assert [image for title, image, mime in again] == [image for title, image, mime in charts]
+    assert set(os.listdir(cache_dir)) == produced | {'recente.svg'}
+    assert os.path.getmtime(reused) > old
+
+
+def test_prune_cache_keeps_current_images(tmp_path):
+    cache_dir = tmp_path / 'graficos'
+    cache_dir.mkdir()
+    for name in ('atual.png', 'antigo.png'):
+        (cache_dir / name).write_bytes(b'imagem')
+    now = time.time() + 2 * vra_charts.CHART_CACHE_GRACE_SECONDS
+    assert vra_charts.prune_cache(str(cache_dir), {'atual.png'}, now=now) == 1
+    assert os.listdir(cache_dir) == ['atual.png']
+    assert vra_charts.prune_cache(str(tmp_path / 'nao_existe'), set()) == 0
@@ -0,0 +1,58 @@
+import os
+import gzip
+import pytest
+import results
+import scraper_anac
+import vra_compression
+from conftest import assert_same_aggregates
+
+
+def _compress(source, path, compression):
+    with open(source, 'rb') as f:
+        content = f.read()
+    with open(path, 'wb') as raw:
+        writer = vra_compression.compressing_writer(raw, compression)
+        writer.write(content)
+        writer.close()
+    return content
+
+
+@pytest.mark.parametrize('compression', [
+    'gzip',
+    pytest.param('zstd', marks=pytest.mark.skipif(not vra_compression.HAS_ZSTD, reason="sem o zstandard")),
+])
+def test_compressed_csvs_match_plain(compression, csv_files, tmp_path, in_memory):
+    data_dir = tmp_path / 'dados'
+    data_dir.mkdir()
+    for file in csv_files:
+        path = vra_compression.with_suffix(str(data_dir / os.path.basename(file)), compression)
+        content = _compress(file, path, compression)
+        assert vra_compression.uncompressed_size(path) == len(content)
+
+    found = results.find_csv_files([str(data_dir)])
+    assert sorted(map(os.path.basename, found)) == sorted(
+        os.path.basename(vra_compression.with_suffix(file, compression)) for file in csv_files)
+    cache_dir = str(tmp_path / 'cache')
+    assert_same_aggregates(results.load_aggregates(found, 1, cache_dir), in_memory)
+    assert_same_aggregates(results.stream_aggregates(found, 1, str(tmp_path / 'cache_stream'), chunksize=700),
+                           in_memory)
+
+
+def test_compressed_download(anac_server, tmp_path):
+    base_url, served, _ = anac_server
+    with open(os.path.join(served, '2022', 'VRA_2022_02.csv'), 'rb') as f:
+        content = f.read()
+    local_path = str(tmp_path / 'VRA_2022_02.csv.gz')
+    manifest = scraper_anac.Manifest(str(tmp_path / scraper_anac.MANIFEST_NAME))
+    url = base_url + '2022/VRA_2022_02.csv'
+
+    status = scraper_anac.download_file(url, local_path, scraper_anac.create_session(), manifest=manifest,
+                                        compression='gzip')
+    assert status == scraper_anac.DOWNLOADED
+    with gzip.open(local_path, 'rb') as f:
+        assert f.read() == content
+    assert manifest.get(url)['compression'] == 'gzip'
+    # Revalidação do arquivo comprimido: o servidor responde 304
+    status = scraper_anac.download_file(url, local_path, scraper_anac.create_session(), manifest=manifest,
+                                        compression='gzip')
+    assert status == scraper_anac.NOT_MODIFIED
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+import vra_dates
+import vra_schema
+
+
+def _reference(values):
+    # Conversão valor a valor, para comparar com a vetorizada
+    parsed = []
+    for value in values:
+        result = pd.NaT
+        for date_format in vra_schema.DATE_FORMATS['Partida Prevista']:
+            try:
+                result = pd.to_datetime(value.strip(), format=date_format)
+                break
+            except (ValueError, TypeError, AttributeError):
+                continue
+        parsed.append(result)
+    return pd.Series(parsed, dtype='datetime64[ns]')
+
+
+def test_mixed_formats_match_row_by_row_parsing():
+    values = ['03/01/2022 10:05', '2022-01-03 10:05:00', '2022-01-04 23:59', '04/01/2022 00:00:30',
+              ' 05/01/2022 07:15 ', '', 'sem data', '31/02/2022 10:00', '03/01/2022 10:05']
+    reference = _reference(values)
+    # Acima de _SPLIT_MIN_VALUES as datas e os horários são convertidos separadamente
+    for repeat in (1, vra_dates._SPLIT_MIN_VALUES):
+        column = pd.Series(values * repeat)
+        expected = pd.concat([reference] * repeat, ignore_index=True)
+        for series in (column, column.astype('category')):
+            dates, codes, uniques = vra_dates.parse_dates(series, vra_schema.DATE_FORMATS['Partida Prevista'])
+            pd.testing.assert_series_equal(dates.astype('datetime64[ns]'), expected, check_names=False)
+
+
+def test_apply_schema_derives_columns_from_distinct_dates():
+    df = pd.DataFrame({
+        'Partida Prevista': ['03/01/2022 10:05', '2022-01-09 23:10:00', 'inválida'],
+        'Referência': ['2022-01-03', '09/01/2022', ''],
+    })
+    df = vra_schema.apply_schema(df)
+    assert list(df['Ano']) == [2022, 2022, vra_dates.MISSING]
+    assert list(df['Mês']) == [1, 1, vra_dates.MISSING]
+    assert list(df['Dia_Semana']) == [0, 6, vra_dates.MISSING]
+    assert list(df['Hora_Partida']) == [10, 23, vra_dates.MISSING]
+    assert df['Ano'].dtype == np.int16
+
+
+def test_missing_reference_uses_scheduled_departure():
+    df = vra_schema.apply_schema(pd.DataFrame({'Partida Prevista': ['03/01/2022 10:05', '2022-02-01 06:00:00']}))
+    assert list(df['Referência']) == [pd.Timestamp('2022-01-03'), pd.Timestamp('2022-02-01')]
+    assert list(df['Mês']) == [1, 2]
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import vra_aggregates
+import vra_delays
+
+
+def test_quantiles_from_histogram_match_exact():
+    rng = np.random.default_rng(3)
+    minutes = np.concatenate([rng.normal(5, 20, 5000).round(), rng.exponential(90, 500).round()]).astype('int64')
+    minutes = minutes[(minutes >= vra_delays.HISTOGRAM_RANGE[0]) & (minutes <= vra_delays.HISTOGRAM_RANGE[1])]
+    estimated = vra_delays.quantiles(vra_delays.histogram(minutes))
+    for q in vra_delays.QUANTILES:
+        assert estimated[q] == int(np.quantile(minutes, q, method='inverted_cdf'))
+    assert vra_delays.quantiles(pd.Series(dtype='int64')) == {q: None for q in vra_delays.QUANTILES}
+
+
+def test_merged_histograms_give_the_quantiles_of_all_flights():
+    first, second = np.arange(-10, 50), np.arange(100, 400)
+    merged = vra_aggregates._merge_counts(vra_delays.histogram(first), vra_delays.histogram(second))
+    both = np.concatenate([first, second])
+    assert vra_delays.quantiles(merged) == {q: int(np.quantile(both, q, method='inverted_cdf'))
+                                            for q in vra_delays.QUANTILES}
+
+
+def test_delay_minutes_and_on_time():
+    df = pd.DataFrame({
+        'Empresa Aérea': pd.Categorical(['AZUL', 'AZUL', 'GOL', 'GOL']),
+        'Partida Prevista': pd.to_datetime(['2022-01-03 10:00', '2022-01-03 11:00', '2022-01-03 12:00',
+                                            '2022-01-03 13:00']),
+        'Partida Real': pd.to_datetime(['2022-01-03 10:15', '2022-01-03 11:16', '2022-01-04 13:00', None]),
+    })
+    minutes, valid = vra_delays.delay_minutes(df, 'Partida Prevista', 'Partida Real')
+    assert list(valid) == [True, True, True, False]
+    assert list(minutes[valid]) == [15, 16, 1500]
+
+    result = vra_delays.delay_aggregates(df, np.array([False, False, False, True]))
+    # Acima do histograma, o atraso acumula na ponta (HISTOGRAM_RANGE)
+    assert result['departure_delay_hist'].to_dict() == {15: 1, 16: 1, vra_delays.HISTOGRAM_RANGE[1]: 1}
+    assert result['departures_by_airline'].to_dict() == {'AZUL': 2, 'GOL': 1}
+    assert result['on_time_by_airline'].to_dict() == {'AZUL': 1}
+    assert result['delay_sum_by_airline'].to_dict() == {'AZUL': 31, 'GOL': vra_delays.HISTOGRAM_RANGE[1]}
+    assert result['arrival_delay_hist'].empty
@@ -0,0 +1,38 @@
+import results
+import vra_aggregates
+import vra_cache
+import vra_filters
+from conftest import assert_same_aggregates
+
+
+def test_empty_filter_matches_in_memory(csv_files, cache_dir, in_memory):
+    for streaming in (False, True):
+        [(aggregates, used_files)] = results.filtered_aggregates(
+            csv_files, [vra_filters.DashboardFilter()], 1, cache_dir, 300, streaming, store_path=None)
+        assert_same_aggregates(aggregates, in_memory)
+        assert sorted(used_files) == sorted(csv_files)
+
+
+def test_period_filter_matches_single_month(csv_files, cache_dir, tmp_path):
+    february = [file for file in csv_files if file.endswith('VRA_2022_02.csv')]
+    expected = results.load_aggregates(february, 1, str(tmp_path / 'cache_fev'))
+    for streaming in (False, True):
+        [(aggregates, used_files)] = results.filtered_aggregates(
+            csv_files, [vra_filters.DashboardFilter('2022-02', '2022-02')], 1, cache_dir, 300, streaming,
+            store_path=None)
+        assert_same_aggregates(aggregates, expected)
+        assert used_files == february
+
+
+def test_several_filters_in_one_pass(csv_files, cache_dir):
+    frame = vra_cache.concat_frames([vra_cache.load_vra_file(file, cache_dir, use_threads=False)[0]
+                                     for file in csv_files])
+    airline = frame['Empresa Aérea'].value_counts().index[0]
+    filters = [vra_filters.DashboardFilter(airlines=[airline.lower()]),
+               vra_filters.DashboardFilter('2022-03-01', '2022-03-31', line_types=['N'])]
+    expected = [vra_aggregates.aggregate_frame(dashboard_filter.apply(frame)) for dashboard_filter in filters]
+    for streaming in (False, True):
+        results_by_filter = results.filtered_aggregates(csv_files, filters, 1, cache_dir, 300, streaming,
+                                                        store_path=None)
+        for (aggregates, used_files), reference in zip(results_by_filter, expected):
+            assert_same_aggregates(aggregates, reference)
@@ -0,0 +1,114 @@
+import pandas as pd
+import pytest
+
+import vra_cache
+import vra_format
+
+HEADER = ['Empresa Aérea', 'Número Voo', 'Código Tipo Linha', 'Sigla ICAO Aeroporto Origem',
+          'Descrição Aeroporto Origem', 'Partida Prevista', 'Partida Real', 'Situação Voo', 'Referência']
+ROWS = [
+    ['AZUL', '4001', 'N', 'SBKP', 'VIRACOPOS - CAMPINAS', '03/01/2022 10:00', '03/01/2022 10:05', 'REALIZADO',
+     '2022-01-03'],
+    ['GOL', '1002', 'N', 'SBGR', 'GUARULHOS - SÃO PAULO', '04/01/2022 08:30', '', 'CANCELADO', '2022-01-04'],
+    ['LATAM', '3003', 'I', 'SBGR', 'GUARULHOS - SÃO PAULO', '05/01/2022 22:15', '05/01/2022 22:40', 'REALIZADO',
+     '2022-01-05'],
+]
+
+
+def write_csv(path, header=HEADER, rows=ROWS, delimiter=';', encoding='utf-8', preamble=()):
+    lines = list(preamble) + [delimiter.join(header)] + [delimiter.join(row) for row in rows]
+    path.write_bytes(('\n'.join(lines) + '\n').encode(encoding))
+    return str(path)
+
+
+def test_detects_latin1_with_commas(tmp_path, cache_dir):
+    path = write_csv(tmp_path / 'antigo.csv', delimiter=',', encoding='latin-1')
+    file_format = vra_format.detect_format(path)
+    assert file_format['encoding'] == 'latin-1'
+    assert file_format['delimiter'] == ','
+    assert file_format['skip_rows'] == 0
+
+    df, from_cache = vra_cache.load_vra_file(path, cache_dir, use_threads=False)
+    assert not from_cache
+    assert len(df) == len(ROWS)
+    assert 'GUARULHOS - SÃO PAULO' in set(df['Descrição Aeroporto Origem'])
+
+
+def test_skips_preamble_and_renames_columns(tmp_path, cache_dir):
+    header = ['Nome Empresa Aérea', 'Número Voo', 'Tipo Linha', 'ICAO Aeródromo Origem', 'Descrição Aeródromo Origem',
+              'Data Partida Prevista', 'Data Partida Real', 'Situação do Voo', 'Data Referência']
+    path = write_csv(tmp_path / 'renomeado.csv', header=header,
+                     preamble=['Voo Regular Ativo (VRA)', 'Atualizado em 10/02/2022', ''])
+    file_format = vra_format.detect_format(path)
+    assert file_format['skip_rows'] == 3
+    assert file_format['renames']['ICAO Aeródromo Origem'] == 'Sigla ICAO Aeroporto Origem'
+
+    df, _ = vra_cache.load_vra_file(path, cache_dir, use_threads=False)
+    assert list(df['Sigla ICAO Aeroporto Origem']) == ['SBKP', 'SBGR', 'SBGR']
+    assert (df['Situação Voo'] == 'CANCELADO').sum() == 1
+
+
+def test_ingestion_report(tmp_path, cache_dir):
+    good = write_csv(tmp_path / 'bom.csv', rows=ROWS + [['AZUL', '4001', 'N']])
+    unread = write_csv(tmp_path / 'nao_lido.csv')
+    broken = tmp_path / 'quebrado.csv'
+    broken.write_text('isto não é um CSV do VRA\n1;2;3\n')
+    vra_cache.load_vra_file(good, cache_dir, use_threads=False)
+    with pytest.raises(vra_format.FormatError):
+        vra_cache.load_vra_file(str(broken), cache_dir, use_threads=False)
+
+    report = vra_cache.ingestion_report([good, unread, str(broken)], cache_dir)
+    by_path = {entry['path']: entry for entry in report['files']}
+    assert by_path[good]['status'] == 'ok'
+    assert by_path[good]['rows'] == len(ROWS)
+    assert by_path[good]['delimiter'] == ';'
+    assert by_path[unread]['status'] == 'not_read'
+    assert by_path[str(broken)]['status'] == 'failed'
+    assert report['totals']['ok'] == 1 and report['totals']['failed'] == 1 and report['totals']['not_read'] == 1
+
+
+def test_missing_required_column_fails_once(tmp_path, cache_dir, monkeypatch):
+    header = [column for column in HEADER if column != 'Situação Voo']
+    rows = [row[:7] + row[8:] for row in ROWS]
+    path = write_csv(tmp_path / 'sem_situacao.csv', header=header, rows=rows)
+    with pytest.raises(vra_format.FormatError, match='Situação Voo'):
+        vra_cache.load_vra_file(path, cache_dir, use_threads=False)
+    assert vra_cache.ingestion_info(path, cache_dir)['permanent']
+
+    # A falha fica registrada: o arquivo não é detectado nem lido de novo enquanto não mudar
+    monkeypatch.setattr(vra_format, 'detect_format', lambda path: pytest.fail("arquivo lido de novo"))
+    with pytest.raises(vra_format.FormatError, match='falha registrada'):
+        vra_cache.load_vra_file(path, cache_dir, use_threads=False)
+    report = vra_cache.ingestion_report([path], cache_dir)
+    assert report['files'][0]['status'] == 'failed'
+    assert 'Situação Voo' in report['files'][0]['error']
+
+
+def test_missing_optional_columns_are_reported(tmp_path, cache_dir):
+    path = write_csv(tmp_path / 'sem_destino.csv')
+    df, _ = vra_cache.load_vra_file(path, cache_dir, use_threads=False)
+    assert pd.api.types.is_datetime64_any_dtype(df['Referência'])
+    entry = vra_cache.ingestion_report([path], cache_dir)['files'][0]
+    assert 'Sigla ICAO Aeroporto Destino' in entry['missing_columns']
+    assert 'Situação Voo' not in entry['missing_columns']
+
+
+def test_airline_code_is_not_the_airline_name(tmp_path, cache_dir):
+    # Arquivos atuais trazem sigla e nome; só o nome identifica a empresa nos agregados
+    header = ['Sigla ICAO Empresa Aérea'] + HEADER
+    rows = [[code] + row for code, row in zip(['AZU', 'GLO', 'TAM'], ROWS)]
+    path = write_csv(tmp_path / 'com_sigla.csv', header=header, rows=rows)
+    file_format = vra_format.detect_format(path)
+    assert 'Sigla ICAO Empresa Aérea' not in file_format['renames']
+    df, _ = vra_cache.load_vra_file(path, cache_dir, use_threads=False)
+    assert set(df['Empresa Aérea']) == {'AZUL', 'GOL', 'LATAM'}
+
+
+def test_code_only_layout_is_rejected(tmp_path, cache_dir):
+    # Só com a sigla, as empresas ficariam com nomes diferentes dos outros meses
+    header = ['ICAO Empresa Aérea'] + HEADER[1:]
+    rows = [['AZU'] + row[1:] for row in ROWS]
+    path = write_csv(tmp_path / 'so_sigla.csv', header=header, rows=rows)
+    with pytest.raises(vra_format.FormatError, match='Empresa Aérea'):
+        vra_cache.load_vra_file(path, cache_dir, use_threads=False)
+    assert vra_cache.ingestion_info(path, cache_dir)['permanent']
@@ -0,0 +1,60 @@
+import os
+import re
+import json
+import results
+import vra_charts
+import vra_output
+
+
+def _write(aggregates, html_path, output_mode):
+    results.write_dashboard(aggregates, 3, dpi=20, output_mode=output_mode, output_path=str(html_path))
+    with open(html_path, encoding='utf-8') as f:
+        return f.read()
+
+
+def test_files_mode_writes_hashed_images(in_memory, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    html_path = tmp_path / 'dashboard.html'
+    page = _write(in_memory, html_path, 'files')
+    assets = vra_output.assets_dir_for(str(html_path))
+    sources = re.findall(r'<img src="([^"]+)"', page)
+    assert sources and 'data:image' not in page
+    for source in sources:
+        assert os.path.isfile(os.path.join(str(tmp_path), source))
+    # Mesmos agregados: mesmos nomes, nada regravado
+    assert re.findall(r'<img src="([^"]+)"', _write(in_memory, html_path, 'files')) == sources
+    assert sorted(os.listdir(assets)) == sorted([os.path.basename(source) for source in sources]
+                                                + [vra_output.RETIRED_NAME])
+
+
+def test_json_mode_writes_aggregates_for_the_browser(in_memory, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    html_path = tmp_path / 'dashboard.html'
+    page = _write(in_memory, html_path, 'json')
+    assert '<img' not in page
+    data_source = re.search(r'VraGraficos\.load\("([^"]+)"\)', page).group(1)
+    library_source = re.search(r'<script src="([^"]+)"', page).group(1)
+    assert os.path.isfile(os.path.join(str(tmp_path), library_source))
+    with open(os.path.join(str(tmp_path), data_source), encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['summary']['total_flights'] == in_memory['total_flights']
+    chart_ids = re.findall(r'data-chart="([^"]+)"', page)
+    assert chart_ids and set(chart_ids) == set(data['charts'])
+    assert set(chart_ids) <= set(vra_charts.CHARTS)
+
+
+def test_unreferenced_assets_wait_for_the_grace_period(tmp_path):
+    directory = str(tmp_path / 'assets')
+    os.makedirs(directory)
+    for name in ('atual.png', 'antigo.png'):
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(b'imagem')
+    vra_output.remove_unreferenced(directory, {'atual.png'}, now=1000)
+    assert os.path.exists(os.path.join(directory, 'antigo.png'))
+    # Volta a ser usado antes do prazo: sai do registro de retirados
+    vra_output.remove_unreferenced(directory, {'atual.png', 'antigo.png'}, now=2000)
+    vra_output.remove_unreferenced(directory, {'atual.png'}, now=3000)
+    vra_output.remove_unreferenced(directory, {'atual.png'}, now=3000 + vra_output.ASSET_GRACE_SECONDS - 1)
+    assert os.path.exists(os.path.join(directory, 'antigo.png'))
+    vra_output.remove_unreferenced(directory, {'atual.png'}, now=3000 + vra_output.ASSET_GRACE_SECONDS)
+    assert sorted(os.listdir(directory)) == [vra_output.RETIRED_NAME, 'atual.png']
@@ -0,0 +1,62 @@
+import os
+import shutil
+import pytest
+import pipeline
+import vra_cache
+import vra_schema
+import vra_sketches
+
+
+@pytest.fixture
+def data_dir(csv_files, tmp_path):
+    directory = tmp_path / 'dados_vra_anac' / '2022'
+    directory.mkdir(parents=True)
+    for file in csv_files:
+        shutil.copyfile(file, directory / os.path.basename(file))
+    return str(tmp_path / 'dados_vra_anac')
+
+
+def test_sketches_come_from_the_columnar_cache(data_dir, cache_dir, monkeypatch):
+    files = sorted(os.path.join(data_dir, '2022', name) for name in os.listdir(os.path.join(data_dir, '2022')))
+    from_csv = [vra_sketches.build_sketches(file) for file in files]
+    assert pipeline.ingest(files, 1, cache_dir) == 0
+
+    def no_csv_read(*args, **kwargs):
+        raise AssertionError("o CSV foi lido de novo")
+    monkeypatch.setattr(vra_schema, 'read_vra_columns', no_csv_read)
+    assert pipeline.sketch(files, 1, cache_dir) == 0
+    for file, expected in zip(files, from_csv):
+        stored = vra_sketches.load_sketches(file)
+        assert stored['total_flights'] == expected['total_flights']
+        assert (stored['first_date'], stored['last_date']) == (expected['first_date'], expected['last_date'])
+        assert (stored['cancelled'].table == expected['cancelled'].table).all()
+        assert (stored['flight_numbers'].registers == expected['flight_numbers'].registers).all()
+
+
+def test_prune_removes_cache_and_sketches_of_deleted_csvs(data_dir, cache_dir):
+    removed, kept = (os.path.join(data_dir, '2022', name) for name in ('VRA_2022_01.csv', 'VRA_2022_02.csv'))
+    pipeline.ingest([removed, kept], 1, cache_dir)
+    pipeline.sketch([removed, kept], 1, cache_dir)
+    os.remove(removed)
+
+    pipeline.prune(data_dir, cache_dir)
+    assert not os.path.exists(vra_sketches.sketch_path(removed))
+    assert os.path.exists(vra_sketches.sketch_path(kept))
+    sources = {vra_cache._read_meta(os.path.join(cache_dir, name))['source']
+               for name in os.listdir(cache_dir) if name.endswith('.json')}
+    assert sources == {os.path.abspath(kept)}
+
+
+def test_second_run_exits_while_the_lock_is_held(data_dir, tmp_path):
+    lock_path = str(tmp_path / 'pipeline.lock')
+    holder = pipeline.PipelineLock(lock_path)
+    assert holder.acquire()
+    try:
+        assert not pipeline.PipelineLock(lock_path).acquire()
+        assert pipeline.main(['--skip-download', '--data-dir', data_dir, '--lock', lock_path]) == \
+            pipeline.EXIT_LOCKED == 75
+    finally:
+        holder.release()
+    after = pipeline.PipelineLock(lock_path)
+    assert after.acquire()
+    after.release()
@@ -0,0 +1,49 @@
+import pandas as pd
+import vra_cache
+import vra_routes
+
+
+def _frame(csv_files, cache_dir):
+    return vra_cache.concat_frames([vra_cache.load_vra_file(file, cache_dir, use_threads=False)[0]
+                                    for file in csv_files])
+
+
+def _groupby_counts(df, columns):
+    counts = df.dropna(subset=columns).groupby(columns, observed=True).size()
+    counts.index = [vra_routes.KEY_SEP.join(map(str, keys)) for keys in counts.index]
+    return counts[counts > 0].sort_index()
+
+
+def test_route_keys_match_groupby(csv_files, cache_dir, monkeypatch):
+    df = _frame(csv_files, cache_dir)
+    for dense_limit in (vra_routes._DENSE_LIMIT, 0):
+        # Limite 0: força o caminho esparso (np.unique) usado com muitas combinações
+        monkeypatch.setattr(vra_routes, '_DENSE_LIMIT', dense_limit)
+        for group, columns in vra_routes.ROUTE_GROUPS.items():
+            pd.testing.assert_series_equal(vra_routes.grouped_counts(df, columns), _groupby_counts(df, columns),
+                                           check_dtype=False, check_index_type=False, obj=group)
+
+
+def test_route_keys_skip_missing_airports():
+    df = pd.DataFrame({
+        'Empresa Aérea': ['AZUL', 'AZUL', 'GOL', 'GOL'],
+        'Sigla ICAO Aeroporto Origem': ['SBKP', 'SBKP', 'SBGR', None],
+        'Sigla ICAO Aeroporto Destino': ['SBRJ', 'SBRJ', None, 'SBSP'],
+    })
+    routes = vra_routes.grouped_counts(df, vra_routes.ROUTE_GROUPS['route'])
+    assert routes.to_dict() == {'SBKP|SBRJ': 2}
+    airline_routes = vra_routes.grouped_counts(df, vra_routes.ROUTE_GROUPS['airline_route'])
+    assert airline_routes.to_dict() == {'AZUL|SBKP|SBRJ': 2}
+    assert vra_routes.route_label('AZUL|SBKP|SBRJ') == 'AZUL → SBKP → SBRJ'
+    # Sem a coluna de destino (layouts antigos), não há rotas
+    assert vra_routes.grouped_counts(df.drop(columns='Sigla ICAO Aeroporto Destino'),
+                                     vra_routes.ROUTE_GROUPS['route']).empty
+
+
+def test_route_aggregates_in_dashboard(in_memory, csv_files, cache_dir):
+    df = _frame(csv_files, cache_dir)
+    cancelled = df[df['Situação Voo'] == 'CANCELADO']
+    expected = _groupby_counts(cancelled, vra_routes.ROUTE_GROUPS['route'])
+    pd.testing.assert_series_equal(in_memory['cancelled_by_route'].sort_index(), expected,
+                                   check_dtype=False, check_index_type=False, check_names=False)
+    assert in_memory['flights_by_route'].sum() <= in_memory['total_flights']
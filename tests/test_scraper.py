@@ -0,0 +1,179 @@
+import os
+import scraper_anac
+from conftest import etag_for
+
+
+def _sync(base_url, output_dir, *extra):
+    return scraper_anac.sync(scraper_anac.parse_args(
+        ['--base-url', base_url, '--output-dir', output_dir, '--workers', '2', *extra]))
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_sync_downloads_then_revalidates(anac_server, tmp_path):
+    base_url, served, _ = anac_server
+    output_dir = str(tmp_path / 'dados')
+    names = sorted(os.listdir(os.path.join(served, '2022')))
+
+    totals = _sync(base_url, output_dir)
+    assert totals == {scraper_anac.DOWNLOADED: len(names), scraper_anac.NOT_MODIFIED: 0, scraper_anac.FAILED: 0}
+    for name in names:
+        assert _read(os.path.join(output_dir, '2022', name)) == _read(os.path.join(served, '2022', name))
+
+    totals = _sync(base_url, output_dir, '--revalidate')
+    assert totals == {scraper_anac.DOWNLOADED: 0, scraper_anac.NOT_MODIFIED: len(names), scraper_anac.FAILED: 0}
+
+
+def test_sync_downloads_repeated_links_once(anac_server, tmp_path):
+    base_url, served, requests_log = anac_server
+    year_dir = os.path.join(served, '2022')
+    names = sorted(os.listdir(year_dir))
+    with open(os.path.join(year_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(''.join(f'<a href="{name}">{name}</a> <a href="./{name}">de novo</a>' for name in names))
+
+    totals = _sync(base_url, str(tmp_path / 'dados'), '--years', '2022', '--max-per-host', '1')
+    assert totals[scraper_anac.DOWNLOADED] == len(names)
+    downloads = [path for path, headers in requests_log if path.endswith('.csv')]
+    assert sorted(downloads) == sorted(f"/vra/2022/{name}" for name in names)
+
+
+def test_extract_links_resolves_and_dedupes():
+    html = """
+    <a href="2022/">2022/</a> <a href=" VRA_2022_01.csv ">jan</a>
+    <a href="VRA_2022_01.csv#topo">de novo</a> <a href="/outro/VRA_2021_12.csv">dez</a> <a>sem href</a>
+    """
+    links = scraper_anac.extract_links(html, 'https://anac.example/vra/2022/')
+    assert links == ['https://anac.example/vra/2022/2022/', 'https://anac.example/vra/2022/VRA_2022_01.csv',
+                     'https://anac.example/outro/VRA_2021_12.csv']
+    assert scraper_anac.csv_links(links) == links[1:]
+
+
+def test_discover_years(anac_server, tmp_path):
+    base_url, served, _ = anac_server
+    os.makedirs(os.path.join(served, '2023'))
+    os.makedirs(os.path.join(served, 'documentos'))
+    assert scraper_anac.discover_years(base_url) == ['2022', '2023']
+    # Raiz inacessível: usa os anos padrão
+    assert scraper_anac.discover_years('http://127.0.0.1:9/vra/') == scraper_anac.DEFAULT_YEARS
+
+
+def test_recent_months_use_the_date_in_the_name():
+    assert scraper_anac.month_from_name('VRA_2022_9.csv') == (2022, 9)
+    assert scraper_anac.month_from_name('VRA_202210.csv') == (2022, 10)
+    assert scraper_anac.month_from_name('VRA_Março_2021.csv') == (2021, 3)
+    assert scraper_anac.month_from_name('dados.csv') is None
+
+    base = 'https://anac.example/vra/'
+    files = [('2022', base + '2022/VRA_2022_10.csv', None), ('2022', base + '2022/VRA_2022_9.csv', None),
+             ('2021', base + '2021/VRA_Dezembro_2021.csv', None),
+             # Sem mês no nome: depois dos meses do ano, pelo Last-Modified
+             ('2023', base + '2023/b.csv', {'last_modified': 'Mon, 06 Mar 2023 10:00:00 GMT'}),
+             ('2023', base + '2023/a.csv', {'last_modified': 'Wed, 08 Feb 2023 10:00:00 GMT'})]
+    ordered = sorted(files, key=lambda file: scraper_anac.publication_order(*file))
+    assert [os.path.basename(url) for year, url, entry in ordered] == [
+        'VRA_Dezembro_2021.csv', 'VRA_2022_9.csv', 'VRA_2022_10.csv', 'a.csv', 'b.csv']
+
+
+def test_republished_month_is_downloaded_with_unchanged_listing(anac_server, tmp_path):
+    base_url, served, _ = anac_server
+    output_dir = str(tmp_path / 'dados')
+    _sync(base_url, output_dir)
+
+    # Mesmo nome, conteúdo corrigido: a listagem do ano continua igual
+    latest = os.path.join(served, '2022', sorted(os.listdir(os.path.join(served, '2022')))[-1])
+    with open(latest, 'ab') as f:
+        f.write(b'\n')
+    totals = _sync(base_url, output_dir, '--recent-months', '1')
+    assert totals[scraper_anac.DOWNLOADED] == 1
+    assert _read(os.path.join(output_dir, '2022', os.path.basename(latest))) == _read(latest)
+
+
+def test_resume_uses_range_with_if_range(anac_server, tmp_path):
+    base_url, served, requests_log = anac_server
+    source = os.path.join(served, '2022', 'VRA_2022_01.csv')
+    content = _read(source)
+    local_path = str(tmp_path / 'VRA_2022_01.csv')
+    with open(local_path + '.part', 'wb') as f:
+        f.write(content[:len(content) // 2])
+    manifest = scraper_anac.Manifest(str(tmp_path / scraper_anac.MANIFEST_NAME))
+    url = base_url + '2022/VRA_2022_01.csv'
+    manifest.set_partial(url, {'etag': etag_for(source), 'last_modified': None})
+
+    status = scraper_anac.download_file(url, local_path, scraper_anac.create_session(), manifest=manifest)
+    assert status == scraper_anac.DOWNLOADED
+    assert _read(local_path) == content
+    headers = [headers for path, headers in requests_log if path.endswith('VRA_2022_01.csv')][-1]
+    assert headers['Range'] == f"bytes={len(content) // 2}-"
+    assert headers['If-Range'] == etag_for(source)
+    assert manifest.get(url)['size'] == len(content)
+
+
+def test_resume_with_stale_validator_restarts(anac_server, tmp_path):
+    base_url, served, _ = anac_server
+    content = _read(os.path.join(served, '2022', 'VRA_2022_01.csv'))
+    local_path = str(tmp_path / 'VRA_2022_01.csv')
+    with open(local_path + '.part', 'wb') as f:
+        f.write(b'conteudo de outra versao')
+    manifest = scraper_anac.Manifest(str(tmp_path / scraper_anac.MANIFEST_NAME))
+    url = base_url + '2022/VRA_2022_01.csv'
+    manifest.set_partial(url, {'etag': '"versao-antiga"', 'last_modified': None})
+
+    status = scraper_anac.download_file(url, local_path, scraper_anac.create_session(), manifest=manifest)
+    assert status == scraper_anac.DOWNLOADED
+    assert _read(local_path) == content
+
+
+class RecordingLimiter(scraper_anac.HostLimiter):
+    """HostLimiter que registra se alguma conexão do host está ocupada"""
+
+    def __init__(self, max_per_host):
+        super().__init__(max_per_host)
+        self.busy = 0
+
+    def slot(self, url):
+        limiter, semaphore = self, super().slot(url)
+
+        class Slot:
+            def __enter__(self):
+                semaphore.acquire()
+                limiter.busy += 1
+
+            def __exit__(self, *exc):
+                limiter.busy -= 1
+                semaphore.release()
+
+        return Slot()
+
+
+def test_verify_hashes_outside_the_host_slot(anac_server, tmp_path, monkeypatch):
+    base_url, served, _ = anac_server
+    content = _read(os.path.join(served, '2022', 'VRA_2022_02.csv'))
+    local_path = str(tmp_path / 'VRA_2022_02.csv')
+    manifest = scraper_anac.Manifest(str(tmp_path / scraper_anac.MANIFEST_NAME))
+    url = base_url + '2022/VRA_2022_02.csv'
+    session = scraper_anac.create_session()
+    limiter = RecordingLimiter(1)
+    assert scraper_anac.download_file(url, local_path, session, limiter, manifest) == scraper_anac.DOWNLOADED
+
+    hashed_while_busy = []
+    hash_file_into = scraper_anac.hash_file_into
+
+    def recording_hash(path, digest):
+        hashed_while_busy.append(limiter.busy)
+        return hash_file_into(path, digest)
+
+    monkeypatch.setattr(scraper_anac, 'hash_file_into', recording_hash)
+    status = scraper_anac.download_file(url, local_path, session, limiter, manifest, verify=True)
+    assert status == scraper_anac.NOT_MODIFIED
+    assert hashed_while_busy == [0]
+
+    # Conteúdo corrompido com o mesmo tamanho: só o --verify percebe e baixa de novo
+    with open(local_path, 'r+b') as f:
+        f.write(b'X' * 16)
+    assert scraper_anac.download_file(url, local_path, session, limiter, manifest) == scraper_anac.NOT_MODIFIED
+    status = scraper_anac.download_file(url, local_path, session, limiter, manifest, verify=True)
+    assert status == scraper_anac.DOWNLOADED
+    assert _read(local_path) == content
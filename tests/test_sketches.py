@@ -0,0 +1,99 @@
+import numpy as np
+import vra_cache
+import vra_sketches
+
+
+def test_count_min_never_underestimates():
+    rng = np.random.default_rng(7)
+    keys = [f'chave{index}' for index in range(500)]
+    counts = rng.integers(1, 100, size=len(keys))
+    # Tabela pequena de propósito, para haver colisões
+    sketch = vra_sketches.CountMinSketch(width=64, depth=4)
+    sketch.add(keys, counts)
+    estimates = sketch.estimate(keys)
+    assert (estimates >= counts).all()
+    within = (estimates - counts <= sketch.error_bound()).mean()
+    assert within >= sketch.confidence() - 0.05
+
+
+def test_misra_gries_bounds_hold_after_merge():
+    rng = np.random.default_rng(11)
+    parts = []
+    exact = {}
+    for _ in range(4):
+        keys = [f'k{index}' for index in rng.zipf(1.5, size=3000) % 300]
+        values, counts = np.unique(keys, return_counts=True)
+        summary = vra_sketches.HeavyHitters(k=16)
+        summary.add(list(values), counts)
+        parts.append(summary)
+        for key, count in zip(values, counts):
+            exact[key] = exact.get(key, 0) + int(count)
+    merged = parts[0]
+    for part in parts[1:]:
+        merged = merged.merge(part)
+
+    assert merged.total == sum(exact.values())
+    bound = merged.error_bound()
+    for key, count in exact.items():
+        stored = merged.counters.get(key, 0)
+        assert stored <= count <= stored + bound
+
+
+def test_hyperloglog_relative_error():
+    for n in (100, 10_000, 100_000):
+        hll = vra_sketches.HyperLogLog()
+        hll.add([f'rota{index}' for index in range(n)])
+        assert abs(hll.estimate() - n) <= 4 * hll.relative_error() * n
+
+
+def test_preview_estimates_contain_exact_values(csv_files):
+    per_file = [vra_sketches.build_sketches(file) for file in csv_files]
+    merged = vra_sketches.merge_all(per_file)
+    exact = None
+    for file in csv_files:
+        counts = vra_sketches.exact_counts(file)
+        exact = counts if exact is None else vra_sketches.merge_exact(exact, counts)
+
+    assert merged['total_flights'] == exact['total_flights']
+    assert merged['total_cancelled'] == exact['total_cancelled']
+    for dimension in vra_sketches.DIMENSION_PREFIXES:
+        rows = vra_sketches.top_estimates(merged, dimension, 10)
+        assert rows
+        for key, estimate, lower, upper, flights in rows:
+            true_cancelled = int(exact[f'cancelled_by_{dimension}'].get(key, 0))
+            assert lower <= true_cancelled <= upper <= estimate
+            assert flights >= int(exact[f'flights_by_{dimension}'].get(key, 0))
+    for key in ('routes', 'flight_numbers'):
+        estimate, margin = vra_sketches.distinct_estimate(merged, key)
+        assert abs(estimate - len(exact[key])) <= 2 * margin
+
+
+def test_sketches_from_cache_match_csv(csv_files, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    from_csv = vra_sketches.build_sketches(csv_files[0])
+    vra_cache.ensure_cached(csv_files[0], cache_dir, use_threads=False)
+    from_cache = vra_sketches.build_sketches(csv_files[0], cache_dir=cache_dir)
+    assert from_cache['total_cancelled'] == from_csv['total_cancelled']
+    assert from_cache['last_date'] == from_csv['last_date']
+    np.testing.assert_array_equal(from_cache['cancelled'].table, from_csv['cancelled'].table)
+    np.testing.assert_array_equal(from_cache['routes'].registers, from_csv['routes'].registers)
+
+
+def test_sketches_round_trip_next_to_csv(csv_files, tmp_path):
+    source = tmp_path / 'VRA_2022_01.csv'
+    with open(csv_files[0], 'rb') as f:
+        source.write_bytes(f.read())
+    built = vra_sketches.build_sketches(str(source))
+    vra_sketches.save_sketches(str(source), built)
+    loaded = vra_sketches.load_sketches(str(source))
+
+    assert loaded['total_flights'] == built['total_flights']
+    assert loaded['first_date'] == built['first_date']
+    np.testing.assert_array_equal(loaded['cancelled'].table, built['cancelled'].table)
+    np.testing.assert_array_equal(loaded['routes'].registers, built['routes'].registers)
+    assert loaded['top_origins'].counters == built['top_origins'].counters
+
+    # CSV alterado: os sketches gravados deixam de valer
+    with open(source, 'ab') as f:
+        f.write(b'\n')
+    assert vra_sketches.load_sketches(str(source)) is None
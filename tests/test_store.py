@@ -0,0 +1,67 @@
+import os
+import shutil
+import pytest
+import results
+import vra_store
+from conftest import assert_same_aggregates
+
+
+def test_store_matches_in_memory(csv_files, vra_dir, cache_dir, tmp_path, in_memory):
+    store_path = str(tmp_path / 'agregados.sqlite')
+    first = results.incremental_aggregates(csv_files, 1, cache_dir, 300, store_path, [vra_dir])
+    assert_same_aggregates(first, in_memory)
+    # Segunda execução: tudo vem dos parciais salvos
+    second = results.incremental_aggregates(csv_files, 1, cache_dir, 300, store_path, [vra_dir])
+    assert_same_aggregates(second, in_memory)
+
+
+@pytest.fixture
+def data_dir(vra_dir, tmp_path):
+    """Dois meses em subpastas, como a árvore do scraper"""
+    directory = tmp_path / 'dados'
+    for month in ('01', '02'):
+        (directory / month).mkdir(parents=True)
+        shutil.copyfile(os.path.join(vra_dir, f'VRA_2022_{month}.csv'), directory / month / f'VRA_2022_{month}.csv')
+    return directory
+
+
+def test_narrower_source_keeps_other_partials(data_dir, tmp_path):
+    everything = [str(data_dir / month / f'VRA_2022_{month}.csv') for month in ('01', '02')]
+    store_path = str(tmp_path / 'agregados.sqlite')
+    cache_dir = str(tmp_path / 'cache')
+
+    results.incremental_aggregates(everything, 1, cache_dir, store_path=store_path, sources=[str(data_dir)])
+    results.incremental_aggregates(everything[1:], 1, cache_dir, store_path=store_path,
+                                   sources=[str(data_dir / '02')])
+    conn = vra_store.open_store(store_path)
+    try:
+        assert vra_store.file_totals(conn, everything[0]) == 2000
+        os.remove(everything[0])
+        assert vra_store.retract_missing(conn, everything[1:], [str(data_dir / '02')]) == [everything[0]]
+    finally:
+        conn.close()
+
+
+def test_relative_paths_do_not_depend_on_working_directory(data_dir, tmp_path, monkeypatch):
+    store_path = str(tmp_path / 'agregados.sqlite')
+    cache_dir = str(tmp_path / 'cache')
+    monkeypatch.chdir(tmp_path)
+    relative = results.find_csv_files(['dados'])
+    results.incremental_aggregates(relative, 1, cache_dir, store_path=store_path, sources=['dados'])
+
+    # Outro diretório: nada some do banco, e a mesma árvore pelo caminho absoluto não duplica os voos
+    monkeypatch.chdir(data_dir / '01')
+    conn = vra_store.open_store(store_path)
+    try:
+        assert vra_store.missing_files(conn, []) == []
+    finally:
+        conn.close()
+    absolute = results.find_csv_files([str(data_dir)])
+    aggregates = results.incremental_aggregates(absolute, 1, cache_dir, store_path=store_path,
+                                                sources=[str(data_dir)])
+    assert aggregates['total_flights'] == 4000
+    conn = vra_store.open_store(store_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 2
+    finally:
+        conn.close()
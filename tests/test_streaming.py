@@ -0,0 +1,15 @@
+import results
+from conftest import assert_same_aggregates
+
+
+def test_streaming_matches_in_memory(csv_files, cache_dir, in_memory):
+    # Pedaços menores que os arquivos, para exercitar a soma entre pedaços
+    streamed = results.stream_aggregates(csv_files, 1, cache_dir, chunksize=300)
+    assert_same_aggregates(streamed, in_memory)
+
+
+def test_streaming_in_worker_processes(csv_files, cache_dir, in_memory):
+    streamed = results.stream_aggregates(csv_files, 2, cache_dir, chunksize=700)
+    assert_same_aggregates(streamed, in_memory)
+    # Segunda execução: os pedaços saem do cache colunar
+    assert_same_aggregates(results.stream_aggregates(csv_files, 1, cache_dir, chunksize=700), in_memory)
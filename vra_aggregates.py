@@ -0,0 +1,210 @@
+import pandas as pd
+import vra_dates
+import vra_delays
+import vra_profiling
+import vra_routes
+
+# Agregados por trás de cada gráfico do dashboard. Cada arquivo (ou pedaço de
+# arquivo) gera um dicionário parcial; parciais se combinam somando contagens,
+# então o resultado não depende de o corpus inteiro caber na memória.
+
+CANCELLED_STATUS = 'CANCELADO'
+
+# Contagens indexadas por chave (empresa, aeroporto, hora...)
+COUNT_KEYS = [
+    'flights_by_airline',
+    'cancelled_by_airline',
+    'cancelled_by_origin',
+    'cancelled_by_origin_icao',
+    'cancelled_by_hour',
+    'cancelled_by_month',
+    'cancelled_by_year',
+    'cancelled_by_weekday',
+    'cancelled_by_line_type',
+    # Chaves 'ORIGEM|DESTINO' e 'EMPRESA|ORIGEM|DESTINO' (vra_routes)
+    'flights_by_route',
+    'cancelled_by_route',
+    'flights_by_airline_route',
+    'cancelled_by_airline_route',
+    # Atrasos e pontualidade (vra_delays)
+    *vra_delays.DELAY_COUNT_KEYS,
+]
+
+# Totais escalares
+TOTAL_KEYS = ['total_flights', 'total_cancelled']
+
+# Quantos itens os rankings do dashboard (e da API) mostram
+TOP_N = 15
+
+# Cubo opcional com voos e cancelamentos por ano, mês, empresa e aeroporto de
+# origem, usado para consultas filtradas (vra_store/vra_api). Só é calculado
+# quando pedido, porque o dashboard não precisa dele.
+CUBE_KEY = 'cube'
+CUBE_DIMENSIONS = {
+    'ano': 'Ano',
+    'mes': 'Mês',
+    'empresa': 'Empresa Aérea',
+    'origem_icao': 'Sigla ICAO Aeroporto Origem',
+}
+CUBE_MEASURES = ['total', 'cancelados']
+
+
+def empty_aggregates():
+    """Agregados de um conjunto vazio de voos"""
+    aggregates = {key: pd.Series(dtype='int64') for key in COUNT_KEYS}
+    aggregates.update({key: 0 for key in TOTAL_KEYS})
+    aggregates['first_date'] = None
+    aggregates['last_date'] = None
+    return aggregates
+
+
+def empty_cube():
+    index = pd.MultiIndex.from_arrays([[]] * len(CUBE_DIMENSIONS), names=list(CUBE_DIMENSIONS))
+    return pd.DataFrame({measure: pd.Series(dtype='int64') for measure in CUBE_MEASURES}, index=index)
+
+
+def _count(values):
+    """Contagem por valor, só com os valores presentes e índice simples ordenado"""
+    counts = values.value_counts(sort=False)
+    counts = counts[counts > 0]
+    return pd.Series(counts.values.astype('int64'), index=pd.Index(list(counts.index))).sort_index()
+
+
+def _count_valid(values):
+    """Contagem de uma coluna inteira derivada, ignorando datas inválidas"""
+    return _count(values[values != vra_dates.MISSING])
+
+
+# Contagens dos voos cancelados: chave -> (coluna, função de contagem).
+# Ano, mês, dia da semana e hora já vêm como inteiros da ingestão (vra_schema).
+CANCELLED_COUNTS = {
+    'cancelled_by_airline': ('Empresa Aérea', _count),
+    'cancelled_by_origin': ('Descrição Aeroporto Origem', _count),
+    'cancelled_by_origin_icao': ('Sigla ICAO Aeroporto Origem', _count),
+    'cancelled_by_hour': ('Hora_Partida', _count_valid),
+    'cancelled_by_month': ('Mês', _count_valid),
+    'cancelled_by_year': ('Ano', _count_valid),
+    'cancelled_by_weekday': ('Dia_Semana', _count_valid),  # 0 = segunda ... 6 = domingo
+    'cancelled_by_line_type': ('Código Tipo Linha', _count),
+}
+
+
+def cube_frame(df):
+    """Voos e cancelamentos por combinação de ano, mês, empresa e origem"""
+    if len(df) == 0:
+        return empty_cube()
+    keys = [df[column] for column in CUBE_DIMENSIONS.values()]
+    cancelled = (df['Situação Voo'] == CANCELLED_STATUS).astype('int64')
+    grouped = cancelled.groupby(keys, observed=True, sort=True, dropna=False)
+    cube = pd.DataFrame({'total': grouped.size().astype('int64'), 'cancelados': grouped.sum().astype('int64')})
+    if len(cube) == 0:
+        return empty_cube()
+    # Níveis simples (sem categorias), para somar com cubos de outros arquivos;
+    # empresa ou aeroporto em branco ficam como '' para o voo continuar no total
+    tuples = [tuple('' if pd.isna(value) else value for value in keys) for keys in cube.index]
+    cube.index = pd.MultiIndex.from_tuples(tuples, names=list(CUBE_DIMENSIONS))
+    return cube.groupby(level=list(range(len(CUBE_DIMENSIONS)))).sum()
+
+
+def aggregate_frame(df, cube=False):
+    """Calcula os agregados do dashboard para um DataFrame no esquema do VRA
+
+    Com cube=True inclui também o cubo de consultas (CUBE_KEY).
+    """
+    aggregates = empty_aggregates()
+    if cube:
+        with vra_profiling.stage('aggregate:cube', rows=len(df)):
+            aggregates[CUBE_KEY] = cube_frame(df)
+    if len(df) == 0:
+        return aggregates
+
+    with vra_profiling.stage('filter', rows=len(df)):
+        is_cancelled = (df['Situação Voo'] == CANCELLED_STATUS).to_numpy()
+        cancelled = df[is_cancelled]
+    aggregates['total_flights'] = len(df)
+    aggregates['total_cancelled'] = len(cancelled)
+    with vra_profiling.stage('aggregate:flights_by_airline', rows=len(df)):
+        aggregates['flights_by_airline'] = _count(df['Empresa Aérea'])
+    for group, columns in vra_routes.ROUTE_GROUPS.items():
+        with vra_profiling.stage(f'aggregate:flights_by_{group}', rows=len(df)):
+            aggregates[f'flights_by_{group}'] = vra_routes.grouped_counts(df, columns)
+    with vra_profiling.stage('aggregate:delays', rows=len(df)):
+        aggregates.update(vra_delays.delay_aggregates(df, is_cancelled))
+    if len(cancelled) == 0:
+        return aggregates
+
+    for key, (column, count) in CANCELLED_COUNTS.items():
+        with vra_profiling.stage(f'aggregate:{key}', rows=len(cancelled)):
+            aggregates[key] = count(cancelled[column])
+    for group, columns in vra_routes.ROUTE_GROUPS.items():
+        with vra_profiling.stage(f'aggregate:cancelled_by_{group}', rows=len(cancelled)):
+            aggregates[f'cancelled_by_{group}'] = vra_routes.grouped_counts(cancelled, columns)
+    dates = cancelled['Referência']
+    aggregates['first_date'] = _none_if_nat(dates.min())
+    aggregates['last_date'] = _none_if_nat(dates.max())
+    return aggregates
+
+
+def _none_if_nat(value):
+    return None if pd.isna(value) else value
+
+
+def _merge_counts(a, b):
+    if len(a) == 0:
+        return b
+    if len(b) == 0:
+        return a
+    return pd.concat([a, b]).groupby(level=0).sum()
+
+
+def merge_aggregates(a, b):
+    """Combina dois agregados parciais"""
+    merged = {key: _merge_counts(a[key], b[key]) for key in COUNT_KEYS}
+    merged.update({key: a[key] + b[key] for key in TOTAL_KEYS})
+    first_dates = [d for d in (a['first_date'], b['first_date']) if d is not None]
+    last_dates = [d for d in (a['last_date'], b['last_date']) if d is not None]
+    merged['first_date'] = min(first_dates) if first_dates else None
+    merged['last_date'] = max(last_dates) if last_dates else None
+    if CUBE_KEY in a or CUBE_KEY in b:
+        merged[CUBE_KEY] = _merge_cubes(a.get(CUBE_KEY), b.get(CUBE_KEY))
+    return merged
+
+
+def _merge_cubes(a, b):
+    if a is None or len(a) == 0:
+        return b if b is not None else a
+    if b is None or len(b) == 0:
+        return a
+    return pd.concat([a, b]).groupby(level=list(range(len(CUBE_DIMENSIONS)))).sum()
+
+
+def merge_all(partials):
+    """Combina uma sequência de agregados parciais"""
+    merged = empty_aggregates()
+    for partial in partials:
+        merged = merge_aggregates(merged, partial)
+    return merged
+
+
+def top(counts, n):
+    """As n maiores contagens, em ordem decrescente"""
+    return counts.sort_values(ascending=False, kind='stable').head(n)
+
+
+def cancellation_rate(cancelled, total):
+    """Porcentagem de voos cancelados por chave (chaves sem cancelamento ficam com 0)"""
+    return (cancelled / total * 100).fillna(0)
+
+
+def rates_with_min_flights(cancelled, total, min_flights):
+    """Taxa de cancelamento só das chaves com pelo menos `min_flights` voos"""
+    total = total[total >= min_flights]
+    return cancellation_rate(cancelled.reindex(total.index, fill_value=0), total)
+
+
+def top_with_totals(cancelled, total, n):
+    """As n chaves com mais cancelamentos: lista de (chave, voos, cancelados, taxa)"""
+    selected = top(cancelled, n)
+    totals = total.reindex(selected.index, fill_value=0)
+    rates = cancellation_rate(selected, totals)
+    return [(key, int(totals[key]), int(value), float(rates[key])) for key, value in selected.items()]
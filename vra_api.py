@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import pandas as pd
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import vra_aggregates
+import vra_filters
+import vra_store
+
+# API HTTP local sobre o banco de agregados (vra_store). Responde contagens e
+# taxas de cancelamento filtradas sem reprocessar os CSVs; o banco é mantido
+# em dia pelo results.py. As taxas e rankings usam as mesmas funções do
+# dashboard (vra_aggregates.cancellation_rate e vra_aggregates.top).
+#
+# Exemplos:
+#   /taxa?empresa=AZUL&inicio=2023-03&fim=2023-03
+#   /taxa?por=ano&por=mes&origem=SBGR
+#   /top?por=empresa&metrica=taxa&inicio=2024
+#   /status
+
+METRICS = ['cancelamentos', 'taxa']
+
+# Nome do parâmetro de filtro -> dimensão do cubo
+FILTERS = {'empresa': 'empresa', 'origem': 'origem_icao'}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def parse_period(value, end=False):
+    """'2023' ou '2023-03' -> (ano, mês); um ano sozinho vale do mês 1 ao 12"""
+    try:
+        parts = [int(part) for part in value.split('-')]
+    except ValueError:
+        raise BadRequest(f"Período inválido: {value} (use AAAA ou AAAA-MM)")
+    if len(parts) == 1:
+        return (parts[0], 12 if end else 1)
+    if len(parts) == 2 and 1 <= parts[1] <= 12:
+        return tuple(parts)
+    raise BadRequest(f"Período inválido: {value} (use AAAA ou AAAA-MM)")
+
+
+def _single(query, name, default=None):
+    values = query.get(name)
+    if not values:
+        return default
+    if len(values) > 1:
+        raise BadRequest(f"Parâmetro repetido: {name}")
+    return values[0]
+
+
+def _dimension(name):
+    dimension = FILTERS.get(name, name)
+    if dimension not in vra_aggregates.CUBE_DIMENSIONS:
+        raise BadRequest(f"Dimensão inválida: {name} (use {', '.join(['ano', 'mes', 'empresa', 'origem'])})")
+    return dimension
+
+
+def normalize_query(query):
+    """Parâmetros da URL em uma tupla canônica (chave do cache LRU)"""
+    start = _single(query, 'inicio')
+    end = _single(query, 'fim')
+    metric = _single(query, 'metrica', 'cancelamentos')
+    if metric not in METRICS:
+        raise BadRequest(f"Métrica inválida: {metric} (use {' ou '.join(METRICS)})")
+    try:
+        n = int(_single(query, 'n', vra_aggregates.TOP_N))
+    except ValueError:
+        raise BadRequest("n deve ser um número inteiro")
+    if n <= 0:
+        raise BadRequest("n deve ser maior que zero")
+    return (
+        tuple(_dimension(name) for name in query.get('por', [])),
+        parse_period(start) if start else None,
+        parse_period(end, end=True) if end else None,
+        tuple(sorted(set(vra_filters.normalize_value(value) for value in query.get('empresa', [])))),
+        tuple(sorted(set(vra_filters.normalize_value(value) for value in query.get('origem', [])))),
+        metric,
+        n,
+    )
+
+
+def _rate(cancelled, total):
+    """Taxa de um único total, com a mesma definição do dashboard"""
+    rate = vra_aggregates.cancellation_rate(pd.Series([cancelled]), pd.Series([total]))
+    return round(float(rate.iloc[0]), 4)
+
+
+def _filters(key):
+    group_by, start, end, airlines, origins, metric, n = key
+    return {
+        'inicio': '%04d-%02d' % start if start else None,
+        'fim': '%04d-%02d' % end if end else None,
+        'empresa': list(airlines),
+        'origem': list(origins),
+    }
+
+
+def _rows(frame, group_by, rates):
+    rows = []
+    for values, rate in zip(frame.itertuples(index=False), rates):
+        row = dict(zip(group_by, values))
+        row['total'] = int(values[-2])
+        row['cancelados'] = int(values[-1])
+        row['taxa'] = round(float(rate), 4)
+        rows.append(row)
+    return rows
+
+
+class QueryService:
+    """Consultas ao cubo do banco, com cache LRU invalidado quando o banco muda"""
+
+    def __init__(self, store_path=vra_store.STORE_PATH, cache_size=1024):
+        if not os.path.exists(store_path):
+            raise FileNotFoundError(f"Banco de agregados não encontrado: {store_path} (rode o results.py antes)")
+        self.store_path = store_path
+        # O ThreadingHTTPServer cria uma thread por requisição: todas usam a
+        # mesma conexão somente leitura, uma consulta de cada vez
+        self._conn = sqlite3.connect(f"file:{os.path.abspath(store_path)}?mode=ro", uri=True,
+                                     check_same_thread=False)
+        # Reentrante: a consulta ao cubo pode buscar os valores das dimensões (_distinct) com o lock já obtido
+        self._lock = threading.RLock()
+        self._answer_cached = lru_cache(maxsize=cache_size)(self._answer)
+        # Valores de cada dimensão, para os filtros sem diferenciar maiúsculas; refeitos quando o banco muda
+        self._distinct_cached = lru_cache(maxsize=8)(self._distinct)
+        with self._lock:
+            version = self._conn.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        if version is None or version[0] != vra_store.STORE_VERSION:
+            self.close()
+            raise RuntimeError(f"Banco de agregados de outra versão: {store_path} (rode o results.py de novo)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def generation(self):
+        """Muda sempre que o results.py grava no banco (arquivo principal ou WAL)"""
+        stamps = []
+        for path in (self.store_path, self.store_path + '-wal'):
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def answer(self, endpoint, query):
+        return self._answer_cached(endpoint, normalize_query(query), self.generation())
+
+    def cache_info(self):
+        return self._answer_cached.cache_info()
+
+    def _distinct(self, column, generation):
+        with self._lock:
+            return vra_store.distinct_values(self._conn, column)
+
+    def _answer(self, endpoint, key, generation):
+        group_by, start, end, airlines, origins, metric, n = key
+        if endpoint == 'status':
+            return self.status()
+        if endpoint == 'top' and len(group_by) != 1:
+            raise BadRequest("/top precisa de exatamente um parâmetro por (ex.: por=empresa)")
+        if endpoint not in ('taxa', 'top'):
+            return None
+
+        with self._lock:
+            frame = vra_store.query_cube(self._conn, group_by, start, end, airlines, origins,
+                                         distinct=lambda conn, column: self._distinct_cached(column, generation))
+        result = {'filtros': _filters(key)}
+        if not group_by:
+            total, cancelled = (int(value) for value in frame.iloc[0])
+            result.update({'total': total, 'cancelados': cancelled, 'taxa': _rate(cancelled, total)})
+            return result
+
+        rates = vra_aggregates.cancellation_rate(frame['cancelados'], frame['total'])
+        if endpoint == 'top':
+            counts = frame['cancelados'] if metric == 'cancelamentos' else rates
+            selected = vra_aggregates.top(counts, n).index
+            frame, rates = frame.loc[selected], rates.loc[selected]
+            result['metrica'] = metric
+        result['por'] = list(group_by)
+        result['itens'] = _rows(frame, group_by, rates)
+        return result
+
+    def status(self):
+        with self._lock:
+            files, total, cancelled, first, last = self._conn.execute(
+                "SELECT COUNT(*), SUM(total_flights), SUM(total_cancelled), MIN(first_date), MAX(last_date) FROM files"
+            ).fetchone()
+        return {
+            'banco': self.store_path,
+            'arquivos': files,
+            'total': total or 0,
+            'cancelados': cancelled or 0,
+            'taxa': _rate(cancelled or 0, total or 0),
+            'primeira_data': first,
+            'ultima_data': last,
+        }
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            endpoint = url.path.strip('/') or 'status'
+            start = time.perf_counter()
+            try:
+                result = service.answer(endpoint, parse_qs(url.query))
+            except BadRequest as e:
+                return self._send(400, {'erro': str(e)}, start)
+            except sqlite3.OperationalError as e:
+                # Banco bloqueado por uma gravação do results.py, ou de outro esquema: tente de novo depois
+                return self._send(503, {'erro': f"Banco de agregados indisponível: {e}"}, start)
+            except sqlite3.Error as e:
+                return self._send(500, {'erro': f"Erro no banco de agregados: {e}"}, start)
+            if result is None:
+                return self._send(404, {'erro': f"Endereço desconhecido: {url.path} (use /taxa, /top ou /status)"}, start)
+            self._send(200, result, start)
+
+        def _send(self, status, body, start):
+            content = json.dumps(body, ensure_ascii=False, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(content)))
+            self.send_header('X-Tempo-Consulta-ms', f"{(time.perf_counter() - start) * 1000:.2f}")
+            self.end_headers()
+            self.wfile.write(content)
+
+    return Handler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP local com taxas de cancelamento do banco de agregados")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--store', default=vra_store.STORE_PATH,
+                        help=f"Banco gerado pelo results.py (padrão: {vra_store.STORE_PATH})")
+    parser.add_argument('--cache-size', type=int, default=1024,
+                        help="Consultas mantidas no cache LRU (padrão: 1024)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    service = QueryService(args.store, args.cache_size)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"🌐 API de cancelamentos em http://{args.host}:{args.port}/ (Ctrl+C para sair)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+import os
+import json
+import re
+import hashlib
+import pandas as pd
+import vra_schema
+import vra_format
+
+# Diretório onde ficam as versões colunares já tipadas dos CSVs
+CACHE_DIR = '.cache_vra'
+
+# Aumente quando a conversão mudar, para invalidar caches antigos
+CACHE_VERSION = 6
+
+# Parquet precisa do pyarrow; sem ele o cache usa pickle do próprio pandas
+CACHE_FORMAT = 'parquet' if vra_schema.HAS_PYARROW else 'pickle'
+
+# Relatório de ingestão gravado pelo results.py (formato, linhas inválidas e falhas de cada CSV)
+INGESTION_REPORT = os.path.join(CACHE_DIR, 'relatorio_ingestao.json')
+
+# Erros que se repetem enquanto o arquivo não muda (cabeçalho não reconhecido,
+# encoding ou linhas inválidas: FormatError, UnicodeDecodeError e os erros de
+# parse do pyarrow e do pandas são todos ValueError). Ficam registrados para o
+# arquivo não ser lido de novo até mudar.
+PERMANENT_ERRORS = (ValueError,)
+
+
+def file_sha256(path):
+    """SHA-256 do conteúdo de um arquivo"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_base(path, cache_dir):
+    source_id = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{os.path.basename(path)}.{source_id}")
+
+
+def cache_paths(path, cache_dir=CACHE_DIR):
+    """Caminhos do arquivo colunar e dos metadados de um CSV de origem"""
+    base = _cache_base(path, cache_dir)
+    extension = 'parquet' if CACHE_FORMAT == 'parquet' else 'pkl'
+    return f"{base}.{extension}", f"{base}.json"
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def _read_cached(data_path, row_filter=None):
+    if data_path.endswith('.parquet'):
+        # O período é filtrado pelo pyarrow, antes de converter para pandas
+        filters = row_filter.parquet_filters() if row_filter is not None else None
+        df = pd.read_parquet(data_path, filters=filters)
+    else:
+        df = pd.read_pickle(data_path)
+    return row_filter.apply(df) if row_filter is not None else df
+
+
+def _write_cached(df, data_path):
+    tmp_path = data_path + '.tmp'
+    if data_path.endswith('.parquet'):
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, data_path)
+
+
+def read_cached_columns(path, columns, cache_dir=CACHE_DIR):
+    """Só as colunas pedidas (as que existirem) do cache colunar do CSV, ou None se o cache não está em dia"""
+    cached = fresh_cache_path(path, cache_dir)
+    if not cached:
+        return None
+    if cached.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        available = set(pq.read_schema(cached).names)
+        return pd.read_parquet(cached, columns=[column for column in columns if column in available])
+    df = pd.read_pickle(cached)
+    return df[[column for column in columns if column in df.columns]]
+
+
+def fresh_cache_path(path, cache_dir=CACHE_DIR):
+    """Caminho do cache colunar do CSV, ou None se ele não existe ou está velho
+
+    O cache é identificado pelo mtime e tamanho do CSV; se só o mtime mudou
+    (arquivo copiado de novo, por exemplo), o SHA-256 decide se ainda vale.
+    """
+    data_path, meta_path = cache_paths(path, cache_dir)
+    stat = os.stat(path)
+    meta = _read_meta(meta_path)
+
+    if meta and meta.get('version') == CACHE_VERSION and os.path.exists(data_path):
+        if meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+            return data_path
+        if meta['size'] == stat.st_size and meta['sha256'] == file_sha256(path):
+            meta['mtime_ns'] = stat.st_mtime_ns
+            _write_meta(meta_path, meta)
+            return data_path
+    return None
+
+
+def date_range(path, cache_dir=CACHE_DIR):
+    """Primeira e última data (Referência) de um CSV já lido, ou (None, None)
+
+    Vem do cache colunar ou, para arquivos lidos só em modo streaming, do
+    registro de ingestão. Usado para descartar arquivos fora do período de um
+    filtro sem lê-los.
+    """
+    meta = _read_meta(cache_paths(path, cache_dir)[1]) if fresh_cache_path(path, cache_dir) else None
+    if not meta or not meta.get('first_date') or not meta.get('last_date'):
+        meta = ingestion_info(path, cache_dir)
+    if not meta or not meta.get('first_date') or not meta.get('last_date'):
+        return None, None
+    return pd.Timestamp(meta['first_date']), pd.Timestamp(meta['last_date'])
+
+
+def date_range_from_name(path):
+    """Período sugerido pelo nome do arquivo (VRA_2024_01.csv -> janeiro de 2024), ou (None, None)
+
+    Último recurso para arquivos nunca lidos: os da ANAC trazem ano e mês no nome.
+    """
+    name = os.path.basename(path)
+    match = re.search(r'(?<!\d)((?:19|20)\d{2})[_\-.]?(0[1-9]|1[0-2])(?!\d)', name)
+    if match:
+        start = pd.Timestamp(year=int(match.group(1)), month=int(match.group(2)), day=1)
+        return start, start + pd.offsets.MonthEnd(0)
+    match = re.search(r'(?<!\d)((?:19|20)\d{2})(?!\d)', name)
+    if match:
+        year = int(match.group(1))
+        return pd.Timestamp(year=year, month=1, day=1), pd.Timestamp(year=year, month=12, day=31)
+    return None, None
+
+
+def ingestion_path(path, cache_dir=CACHE_DIR):
+    """Caminho do registro de ingestão (formato detectado e resultado da leitura) de um CSV"""
+    return _cache_base(path, cache_dir) + '.ingestao.json'
+
+
+def ingestion_info(path, cache_dir=CACHE_DIR):
+    """Registro de ingestão do CSV, ou None se não existe ou o arquivo mudou depois dele"""
+    info = _read_meta(ingestion_path(path, cache_dir))
+    stat = os.stat(path)
+    if (not info or info.get('version') != vra_format.DETECTOR_VERSION
+            or info.get('size') != stat.st_size or info.get('mtime_ns') != stat.st_mtime_ns):
+        return None
+    return info
+
+
+def _record_ingestion(path, cache_dir, file_format=None, rows=None, bad_lines=None, error=None, dates=None):
+    stat = os.stat(path)
+    info = ingestion_info(path, cache_dir) or {}
+    info.update({
+        'version': vra_format.DETECTOR_VERSION,
+        'source': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    })
+    if file_format is not None:
+        info['format'] = file_format
+    if dates is not None:
+        info.update({'first_date': _isoformat(dates[0]), 'last_date': _isoformat(dates[1])})
+    if rows is not None:
+        info.update({'rows': rows, 'bad_lines': bad_lines})
+        info.pop('error', None)
+        info.pop('permanent', None)
+    if error is not None:
+        info.update({'error': f"{type(error).__name__}: {error}",
+                     'permanent': isinstance(error, PERMANENT_ERRORS)})
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_meta(ingestion_path(path, cache_dir), info)
+
+
+def cached_format(path, cache_dir=CACHE_DIR):
+    """Formato do CSV (vra_format.detect_format), detectado uma vez por versão do arquivo
+
+    Um arquivo sem alguma das colunas obrigatórias (vra_schema.REQUIRED_COLUMNS)
+    falha já aqui, antes de ser lido. Se o arquivo já falhou com um erro que
+    se repete, o erro volta na hora, sem ler o arquivo de novo.
+    """
+    info = ingestion_info(path, cache_dir)
+    if info and info.get('permanent'):
+        raise vra_format.FormatError(f"{info['error']} (falha registrada; o arquivo não mudou desde então)")
+    if info and info.get('format'):
+        return info['format']
+    try:
+        file_format = vra_format.detect_format(path)
+        vra_format.require_columns(file_format, vra_schema.REQUIRED_COLUMNS)
+    except vra_format.FormatError as e:
+        _record_ingestion(path, cache_dir, error=e)
+        raise
+    _record_ingestion(path, cache_dir, file_format=file_format)
+    return file_format
+
+
+def _parse_csv(path, cache_dir, use_threads):
+    """Lê o CSV inteiro com o formato detectado, registrando linhas inválidas ou a falha"""
+    file_format = cached_format(path, cache_dir)
+    stats = {}
+    try:
+        df = vra_schema.read_vra_csv(path, use_threads, file_format, stats)
+    except Exception as e:
+        _record_ingestion(path, cache_dir, error=e)
+        raise
+    _record_ingestion(path, cache_dir, rows=len(df), bad_lines=stats.get('bad_lines'))
+    return df
+
+
+def _isoformat(value):
+    return None if pd.isna(value) else value.isoformat()
+
+
+def load_vra_file(path, cache_dir=CACHE_DIR, use_threads=True, row_filter=None):
+    """Carrega um CSV do VRA usando o cache colunar quando ele ainda é válido
+
+    Com `row_filter` (vra_filters.DashboardFilter) só as linhas que passam no
+    filtro são devolvidas; o cache sempre guarda o arquivo inteiro.
+    Retorna (df, from_cache).
+    """
+    cached = fresh_cache_path(path, cache_dir)
+    if cached:
+        return _read_cached(cached, row_filter), True
+
+    data_path, meta_path = cache_paths(path, cache_dir)
+    stat = os.stat(path)
+    df = _parse_csv(path, cache_dir, use_threads)
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_cached(df, data_path)
+    dates = df['Referência'] if 'Referência' in df.columns else pd.Series(dtype='datetime64[s]')
+    _write_meta(meta_path, {
+        'version': CACHE_VERSION,
+        'source': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_sha256(path),
+        'rows': len(df),
+        'first_date': _isoformat(dates.min()),
+        'last_date': _isoformat(dates.max()),
+    })
+    if row_filter is not None:
+        df = row_filter.apply(df)
+    return df, False
+
+
+def ensure_cached(path, cache_dir=CACHE_DIR, use_threads=True):
+    """Converte o CSV para o cache colunar se ele ainda não está lá (ou está velho)
+
+    Retorna o número de linhas convertidas, 0 se o cache já valia.
+    """
+    if fresh_cache_path(path, cache_dir):
+        return 0
+    df, _ = load_vra_file(path, cache_dir, use_threads)
+    return len(df)
+
+
+def iter_vra_file(path, cache_dir=CACHE_DIR, chunksize=500_000, use_threads=True, row_filter=None):
+    """Lê um arquivo do VRA em pedaços, do cache colunar se válido ou do CSV
+
+    Nunca monta o arquivo inteiro na memória; o CSV não é gravado no cache
+    neste modo. Com `row_filter`, cada pedaço já vem filtrado.
+    Gera (df, from_cache) para cada pedaço.
+    """
+    def filtered(df):
+        return row_filter.apply(df) if row_filter is not None else df
+
+    cached = fresh_cache_path(path, cache_dir)
+    if cached and cached.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(cached)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, use_threads=use_threads):
+            yield filtered(vra_schema.apply_schema(batch.to_pandas())), True
+        return
+    if cached:
+        yield _read_cached(cached, row_filter), True
+        return
+
+    file_format = cached_format(path, cache_dir)
+    stats = {}
+    rows = 0
+    first_dates, last_dates = [], []
+    try:
+        for chunk in vra_schema.iter_vra_csv(path, chunksize, use_threads, file_format, stats):
+            rows += len(chunk)
+            # O período vai para o registro de ingestão, para filtros futuros pularem o arquivo (date_range)
+            if 'Referência' in chunk.columns:
+                first_dates.append(chunk['Referência'].min())
+                last_dates.append(chunk['Referência'].max())
+            yield filtered(chunk), False
+    except Exception as e:
+        _record_ingestion(path, cache_dir, error=e)
+        raise
+    _record_ingestion(path, cache_dir, rows=rows, bad_lines=stats.get('bad_lines'),
+                      dates=(pd.Series(first_dates, dtype='datetime64[s]').min(),
+                             pd.Series(last_dates, dtype='datetime64[s]').max()))
+
+
+def prune_orphans(cache_dir=CACHE_DIR):
+    """Apaga as entradas do cache (dados, metadados e registro de ingestão) de CSVs que não existem mais
+
+    Um CSV renomeado ou substituído (por exemplo, X.csv por X.csv.zst ao mudar
+    a compressão do scraper) deixaria uma segunda cópia do mês no cache.
+    Retorna os caminhos dos CSVs cujas entradas foram apagadas.
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+    removed = []
+    for name in sorted(os.listdir(cache_dir)):
+        if not name.endswith('.json'):
+            continue
+        source = (_read_meta(os.path.join(cache_dir, name)) or {}).get('source')
+        if not source or os.path.exists(source) or source in removed:
+            continue
+        base = _cache_base(source, cache_dir)
+        for path in (f"{base}.parquet", f"{base}.pkl", f"{base}.json", ingestion_path(source, cache_dir)):
+            if os.path.exists(path):
+                os.remove(path)
+        removed.append(source)
+    return removed
+
+
+def concat_frames(frames):
+    """Concatena DataFrames mantendo as colunas categóricas como categorias
+
+    pd.concat converte para object quando as categorias diferem entre os
+    arquivos; unificá-las antes evita essa cópia cara em strings.
+    """
+    frames = list(frames)
+    for column in vra_schema.CATEGORY_COLUMNS:
+        parts = [frame[column] for frame in frames if column in frame.columns]
+        if len(parts) < 2 or not all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            continue
+        categories = parts[0].cat.categories
+        for part in parts[1:]:
+            categories = categories.union(part.cat.categories)
+        for frame in frames:
+            if column in frame.columns:
+                frame[column] = frame[column].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def ingestion_report(csv_files, cache_dir=CACHE_DIR):
+    """Resumo da ingestão de cada CSV: formato detectado, linhas lidas e descartadas, falhas
+
+    status: 'ok', 'failed' (o erro está em 'error') ou 'not_read' (arquivo ainda
+    não lido nesta versão, por exemplo fora do período de um filtro).
+    bad_lines fica None quando o leitor não contou as linhas (sem o pyarrow).
+    """
+    files = []
+    for path in csv_files:
+        info = ingestion_info(path, cache_dir) or {}
+        file_format = info.get('format') or {}
+        if info.get('error'):
+            status = 'failed'
+        elif 'rows' in info:
+            status = 'ok'
+        else:
+            status = 'not_read'
+        files.append({
+            'path': path,
+            'status': status,
+            'encoding': file_format.get('encoding'),
+            'delimiter': file_format.get('delimiter'),
+            'skipped_preamble_lines': file_format.get('skip_rows'),
+            'renamed_columns': file_format.get('renames', {}),
+            'missing_columns': sorted(set(vra_schema.USECOLS) - set(file_format['columns']))
+            if file_format else None,
+            'rows': info.get('rows'),
+            'bad_lines': info.get('bad_lines'),
+            'error': info.get('error'),
+        })
+    totals = {status: sum(entry['status'] == status for entry in files) for status in ('ok', 'failed', 'not_read')}
+    totals.update({
+        'files': len(files),
+        'rows': sum(entry['rows'] or 0 for entry in files),
+        'bad_lines': sum(entry['bad_lines'] or 0 for entry in files),
+    })
+    return {'totals': totals, 'files': files}
@@ -0,0 +1,526 @@
+import os
+import json
+import hashlib
+import time
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+import matplotlib.style
+from matplotlib.figure import Figure
+import vra_aggregates
+import vra_cache
+import vra_delays
+import vra_routes
+import vra_profiling
+
+# Gráficos do dashboard desenhados com a API orientada a objetos do
+# Matplotlib (sem o estado global do pyplot), o que permite renderizá-los em
+# processos separados. Cada imagem fica em cache, identificada pelo hash dos
+# dados agregados que a geraram.
+
+CHART_CACHE_DIR = os.path.join(vra_cache.CACHE_DIR, 'graficos')
+
+# Aumente quando o desenho dos gráficos mudar, para invalidar o cache
+CHART_VERSION = 1
+
+# Imagens do cache que nenhuma renderização usa há tanto tempo são apagadas.
+# O prazo mantém as de outros formatos/dpi usados de vez em quando.
+CHART_CACHE_GRACE_SECONDS = 7 * 24 * 3600
+
+MIME_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'webp': 'image/webp',
+}
+
+MONTH_NAMES = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun',
+               'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+DAY_NAMES_PT = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
+LINE_TYPE_LABELS = {'I': 'Internacional', 'N': 'Nacional', 'R': 'Regional'}
+
+
+def apply_style():
+    """Configurar estilo dos gráficos (em cada processo que desenha)"""
+    import seaborn as sns
+
+    matplotlib.style.use('default')
+    sns.set_palette("husl")
+    matplotlib.rcParams['figure.figsize'] = (12, 8)
+    matplotlib.rcParams['font.size'] = 10
+
+
+def _plain(value):
+    # Valores do numpy viram tipos do Python para o hash e o pickle
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _series_payload(series):
+    return {'labels': [_plain(k) for k in series.index], 'values': [_plain(v) for v in series.values]}
+
+
+def chart_payloads(aggregates):
+    """Dados de cada gráfico, na ordem do dashboard: (id, título, dados)"""
+    rate = vra_aggregates.cancellation_rate(aggregates['cancelled_by_airline'], aggregates['flights_by_airline'])
+    line_types = aggregates['cancelled_by_line_type']
+    route_rate = vra_aggregates.rates_with_min_flights(aggregates['cancelled_by_route'], aggregates['flights_by_route'],
+                                                       vra_routes.MIN_FLIGHTS_FOR_RATE)
+    return [
+        ('airlines', 'Empresas que Mais Cancelam Voos',
+         _series_payload(vra_aggregates.top(aggregates['cancelled_by_airline'], vra_aggregates.TOP_N))),
+        ('airline_rate', 'Taxa de Cancelamento por Empresa',
+         _series_payload(vra_aggregates.top(rate, vra_aggregates.TOP_N))),
+        ('origins', 'Aeroportos de Origem com Mais Cancelamentos',
+         _series_payload(vra_aggregates.top(aggregates['cancelled_by_origin'], vra_aggregates.TOP_N))),
+        ('hours', 'Cancelamentos por Horário',
+         _series_payload(aggregates['cancelled_by_hour'].sort_index())),
+        ('months', 'Cancelamentos por Mês',
+         _series_payload(aggregates['cancelled_by_month'].sort_index())),
+        ('years', 'Cancelamentos por Ano',
+         _series_payload(aggregates['cancelled_by_year'].sort_index())),
+        # Dias da semana vêm numerados de 0 (segunda) a 6 (domingo)
+        ('weekdays', 'Cancelamentos por Dia da Semana',
+         _series_payload(aggregates['cancelled_by_weekday'].reindex(range(7), fill_value=0))),
+        ('line_types', 'Distribuição por Tipo de Linha',
+         _series_payload(vra_aggregates.top(line_types, len(line_types)))),
+        # Rotas com chave 'ORIGEM|DESTINO'; a taxa só considera rotas com voos suficientes
+        ('routes', 'Rotas com Mais Cancelamentos',
+         _series_payload(vra_aggregates.top(aggregates['cancelled_by_route'], vra_aggregates.TOP_N))),
+        ('route_rate', 'Taxa de Cancelamento por Rota',
+         _series_payload(vra_aggregates.top(route_rate, vra_aggregates.TOP_N))),
+        *delay_payloads(aggregates),
+    ]
+
+
+def delay_payloads(aggregates):
+    """Gráficos de atrasos e pontualidade (vra_delays)"""
+    departures = aggregates['departures_by_airline']
+    busiest = vra_aggregates.top(departures, vra_aggregates.TOP_N).index
+    airline_on_time = vra_delays.on_time_rate(aggregates['on_time_by_airline'], departures[busiest])
+    hour_on_time = vra_delays.on_time_rate(aggregates['on_time_by_hour'], aggregates['departures_by_hour'])
+    buckets, correlation = vra_delays.cancellation_by_delay_bucket(aggregates)
+    distribution = _series_payload(vra_delays.binned(aggregates['departure_delay_hist']))
+    distribution['quantiles'] = {str(q): value for q, value in
+                                 vra_delays.quantiles(aggregates['departure_delay_hist']).items()}
+    relationship = _series_payload(buckets)
+    relationship['correlation'] = None if correlation is None else round(correlation, 4)
+    return [
+        ('delay_distribution', 'Distribuição dos Atrasos de Partida', distribution),
+        ('on_time_airline', 'Pontualidade por Empresa',
+         _series_payload(vra_aggregates.top(airline_on_time, len(airline_on_time)))),
+        ('on_time_hour', 'Pontualidade por Horário', _series_payload(hour_on_time.sort_index())),
+        ('delay_vs_cancellation', 'Atrasos x Cancelamentos', relationship),
+    ]
+
+
+def delay_tables(aggregates):
+    """Tabelas de atrasos do dashboard: (título, cabeçalhos, linhas)"""
+    rows = []
+    for kind, label in (('departure', 'Partida'), ('arrival', 'Chegada')):
+        hist = aggregates[f'{kind}_delay_hist']
+        quantiles = vra_delays.quantiles(hist)
+        rows.append([label, int(hist.sum()), *(quantiles[q] for q in vra_delays.QUANTILES),
+                     vra_delays.on_time_share(hist)])
+    departures = aggregates['departures_by_origin_icao']
+    busiest = vra_aggregates.top(departures, vra_aggregates.TOP_N).index
+    on_time = vra_delays.on_time_rate(aggregates['on_time_by_origin_icao'], departures[busiest])
+    delays = vra_delays.mean_delay(aggregates['delay_sum_by_origin_icao'], departures[busiest])
+    cancelled = aggregates['cancelled_by_origin_icao'].reindex(busiest, fill_value=0)
+    airports = [[icao, int(departures[icao]), float(on_time[icao]), f"{delays[icao]:.1f} min", int(cancelled[icao])]
+                for icao in busiest]
+    return [
+        (f'Atrasos em Minutos (no horário = até {vra_delays.ON_TIME_MINUTES} min)',
+         ['Tipo', 'Voos com horário real', 'Mediana (p50)', 'p90', 'p99', 'No horário'], rows),
+        ('Pontualidade nos Aeroportos com Mais Partidas',
+         ['Aeroporto', 'Partidas', 'No horário', 'Atraso médio', 'Cancelamentos'], airports),
+    ]
+
+
+def route_tables(aggregates):
+    """Tabelas de rotas do dashboard: (título, cabeçalhos, linhas)"""
+    routes = vra_aggregates.top_with_totals(aggregates['cancelled_by_route'], aggregates['flights_by_route'],
+                                            vra_aggregates.TOP_N)
+    airline_routes = vra_aggregates.top_with_totals(aggregates['cancelled_by_airline_route'],
+                                                    aggregates['flights_by_airline_route'], vra_aggregates.TOP_N)
+    return [
+        ('Rotas com Mais Cancelamentos',
+         ['Origem', 'Destino', 'Voos', 'Cancelamentos', 'Taxa'],
+         [[*vra_routes.split_key(key), flights, cancelled, rate] for key, flights, cancelled, rate in routes]),
+        ('Rotas por Empresa com Mais Cancelamentos',
+         ['Empresa Aérea', 'Origem', 'Destino', 'Voos', 'Cancelamentos', 'Taxa'],
+         [[*vra_routes.split_key(key), flights, cancelled, rate] for key, flights, cancelled, rate in airline_routes]),
+    ]
+
+
+def _bar_labels(ax, bars, values, offset, fmt=str, skip_zero=False, **kwargs):
+    # Adicionar valores nas barras
+    for bar, value in zip(bars, values):
+        if skip_zero and not value > 0:
+            continue
+        ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + offset,
+                fmt(value), ha='center', va='bottom', fontweight='bold', **kwargs)
+
+
+def _titles(ax, title, xlabel, ylabel):
+    ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
+    ax.set_xlabel(xlabel, fontsize=12)
+    ax.set_ylabel(ylabel, fontsize=12)
+
+
+def draw_airlines(fig, data):
+    # 1. Empresas aéreas que mais cancelam voos
+    ax = fig.subplots()
+    labels, values = data['labels'], data['values']
+    bars = ax.bar(range(len(values)), values, color='#e74c3c', alpha=0.8)
+    _titles(ax, 'Top 15 Empresas Aéreas com Mais Cancelamentos', 'Empresa Aérea', 'Número de Cancelamentos')
+    ax.set_xticks(range(len(labels)), labels, rotation=45, ha='right')
+    _bar_labels(ax, bars, values, 0.5)
+
+
+def draw_airline_rate(fig, data):
+    # 2. Porcentagem de voos cancelados por empresa
+    ax = fig.subplots()
+    labels, values = data['labels'], data['values']
+    bars = ax.bar(range(len(values)), values, color='#c0392b', alpha=0.8)
+    _titles(ax, 'Taxa de Cancelamento por Empresa Aérea (%)', 'Empresa Aérea', 'Porcentagem de Cancelamentos (%)')
+    ax.set_xticks(range(len(labels)), labels, rotation=45, ha='right')
+    _bar_labels(ax, bars, values, 0.1, fmt=lambda value: f'{value:.1f}%')
+
+
+def draw_origins(fig, data):
+    # 3. Aeroportos de origem com mais cancelamentos
+    ax = fig.subplots()
+    values = data['values']
+    # Encurtar nomes muito longos
+    labels = [label[:50] + '...' if len(label) > 50 else label for label in data['labels']]
+    bars = ax.bar(range(len(values)), values, color='#f39c12', alpha=0.8)
+    _titles(ax, 'Top 15 Aeroportos de Origem com Mais Cancelamentos', 'Aeroporto de Origem', 'Número de Cancelamentos')
+    ax.set_xticks(range(len(labels)), labels, rotation=45, ha='right')
+    _bar_labels(ax, bars, values, 0.5)
+
+
+def draw_hours(fig, data):
+    # 4. Horários com mais cancelamentos
+    ax = fig.subplots()
+    bars = ax.bar(data['labels'], data['values'], color='#9b59b6', alpha=0.8)
+    _titles(ax, 'Cancelamentos por Hora do Dia', 'Hora do Dia', 'Número de Cancelamentos')
+    ax.set_xticks(range(0, 24, 2))
+    ax.grid(True, alpha=0.3, axis='y')
+    _bar_labels(ax, bars, data['values'], 0.5, skip_zero=True, fontsize=9)
+
+
+def draw_months(fig, data):
+    # 5. Épocas (meses) com mais cancelamentos
+    ax = fig.subplots()
+    values = data['values']
+    bars = ax.bar(range(len(values)), values, color='#27ae60', alpha=0.8)
+    _titles(ax, 'Cancelamentos por Mês', 'Mês', 'Número de Cancelamentos')
+    ax.set_xticks(range(len(values)), [MONTH_NAMES[i-1] for i in data['labels']])
+    _bar_labels(ax, bars, values, 0.5)
+
+
+def draw_years(fig, data):
+    # 6. Anos com mais cancelamentos
+    ax = fig.subplots()
+    years, values = data['labels'], data['values']
+    ax.plot(years, values, marker='o', linewidth=3, markersize=10, color='#e74c3c')
+    _titles(ax, 'Evolução dos Cancelamentos por Ano', 'Ano', 'Número de Cancelamentos')
+    ax.grid(True, alpha=0.3)
+
+    # Adicionar valores nos pontos
+    for x, y in zip(years, values):
+        ax.text(x, y + max(values) * 0.02, str(y), ha='center', va='bottom', fontweight='bold')
+
+
+def draw_weekdays(fig, data):
+    # 7. Dia da semana com mais cancelamentos
+    ax = fig.subplots()
+    bars = ax.bar(DAY_NAMES_PT, data['values'], color='#16a085', alpha=0.8)
+    _titles(ax, 'Cancelamentos por Dia da Semana', 'Dia da Semana', 'Número de Cancelamentos')
+    _bar_labels(ax, bars, data['values'], 0.5, skip_zero=True)
+
+
+def draw_line_types(fig, data):
+    # 8. Gráfico de pizza - Distribuição por tipo de linha
+    ax = fig.subplots()
+    labels = [LINE_TYPE_LABELS.get(code, f'Tipo {code}') for code in data['labels']]
+    colors = ['#e74c3c', '#3498db', '#f39c12']
+    wedges, texts, autotexts = ax.pie(data['values'], labels=labels, autopct='%1.1f%%',
+                                      colors=colors, startangle=90, textprops={'fontsize': 12})
+    ax.set_title('Distribuição de Cancelamentos por Tipo de Linha', fontsize=16, fontweight='bold', pad=20)
+
+    # Melhorar aparência dos textos
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontweight('bold')
+
+
+def draw_routes(fig, data):
+    # 9. Rotas (origem → destino) com mais cancelamentos
+    ax = fig.subplots()
+    values = data['values']
+    labels = [vra_routes.route_label(key) for key in data['labels']]
+    bars = ax.bar(range(len(values)), values, color='#2980b9', alpha=0.8)
+    _titles(ax, 'Top 15 Rotas com Mais Cancelamentos', 'Rota (Origem → Destino)', 'Número de Cancelamentos')
+    ax.set_xticks(range(len(labels)), labels, rotation=45, ha='right')
+    _bar_labels(ax, bars, values, 0.5)
+
+
+def draw_route_rate(fig, data):
+    # 10. Porcentagem de voos cancelados por rota
+    ax = fig.subplots()
+    values = data['values']
+    labels = [vra_routes.route_label(key) for key in data['labels']]
+    bars = ax.bar(range(len(values)), values, color='#1f618d', alpha=0.8)
+    _titles(ax, f'Taxa de Cancelamento por Rota (%) - rotas com {vra_routes.MIN_FLIGHTS_FOR_RATE}+ voos',
+            'Rota (Origem → Destino)', 'Porcentagem de Cancelamentos (%)')
+    ax.set_xticks(range(len(labels)), labels, rotation=45, ha='right')
+    _bar_labels(ax, bars, values, 0.1, fmt=lambda value: f'{value:.1f}%')
+
+
+def draw_delay_distribution(fig, data):
+    # 11. Distribuição dos atrasos de partida, com os quantis
+    ax = fig.subplots()
+    starts, values = data['labels'], data['values']
+    ax.bar(starts, values, width=4.5, align='edge', color='#8e44ad', alpha=0.8)
+    _titles(ax, 'Distribuição dos Atrasos de Partida (faixas de 5 min; pontas acumuladas)',
+            'Atraso (minutos)', 'Número de Voos')
+    quantiles = {q: minutes for q, minutes in data['quantiles'].items() if minutes is not None}
+    for (q, minutes), color in zip(quantiles.items(), ['#27ae60', '#f39c12', '#c0392b']):
+        # Quantis fora das faixas do gráfico ficam marcados na ponta
+        position = min(max(minutes, starts[0]), starts[-1] + 5)
+        ax.axvline(position, color=color, linestyle='--', linewidth=2, label=f'p{round(float(q) * 100)}: {minutes} min')
+    if quantiles:
+        ax.legend(fontsize=11)
+    ax.grid(True, alpha=0.3, axis='y')
+
+
+def draw_on_time_airline(fig, data):
+    # 12. Pontualidade das empresas com mais voos
+    ax = fig.subplots()
+    labels, values = data['labels'], data['values']
+    bars = ax.bar(range(len(values)), values, color='#2ecc71', alpha=0.8)
+    _titles(ax, f'Partidas no Horário por Empresa Aérea (%) - até {vra_delays.ON_TIME_MINUTES} min de atraso',
+            'Empresa Aérea', 'Partidas no Horário (%)')
+    ax.set_xticks(range(len(labels)), labels, rotation=45, ha='right')
+    _bar_labels(ax, bars, values, 0.5, fmt=lambda value: f'{value:.1f}%')
+
+
+def draw_on_time_hour(fig, data):
+    # 13. Pontualidade por hora prevista de partida
+    ax = fig.subplots()
+    bars = ax.bar(data['labels'], data['values'], color='#1abc9c', alpha=0.8)
+    _titles(ax, 'Partidas no Horário por Hora do Dia (%)', 'Hora do Dia', 'Partidas no Horário (%)')
+    ax.set_xticks(range(0, 24, 2))
+    ax.grid(True, alpha=0.3, axis='y')
+    _bar_labels(ax, bars, data['values'], 0.5, fmt=lambda value: f'{value:.0f}', skip_zero=True, fontsize=9)
+
+
+def draw_delay_vs_cancellation(fig, data):
+    # 14. Taxa de cancelamento dos dias por faixa de atraso médio
+    ax = fig.subplots()
+    labels, values = data['labels'], data['values']
+    bars = ax.bar(range(len(values)), values, color='#d35400', alpha=0.8)
+    correlation = data.get('correlation')
+    subtitle = f' - correlação diária: {correlation:.2f}' if correlation is not None else ''
+    _titles(ax, f'Taxa de Cancelamento x Atraso Médio do Dia{subtitle}',
+            'Atraso Médio de Partida no Dia', 'Taxa de Cancelamento (%)')
+    ax.set_xticks(range(len(labels)), labels)
+    _bar_labels(ax, bars, values, 0.1, fmt=lambda value: f'{value:.1f}%')
+
+
+# id do gráfico -> (função de desenho, tamanho da figura)
+CHARTS = {
+    'airlines': (draw_airlines, (14, 8)),
+    'airline_rate': (draw_airline_rate, (14, 8)),
+    'origins': (draw_origins, (14, 8)),
+    'hours': (draw_hours, (14, 8)),
+    'months': (draw_months, (14, 8)),
+    'years': (draw_years, (14, 8)),
+    'weekdays': (draw_weekdays, (14, 8)),
+    'line_types': (draw_line_types, (10, 10)),
+    'routes': (draw_routes, (14, 8)),
+    'route_rate': (draw_route_rate, (14, 8)),
+    'delay_distribution': (draw_delay_distribution, (14, 8)),
+    'on_time_airline': (draw_on_time_airline, (14, 8)),
+    'on_time_hour': (draw_on_time_hour, (14, 8)),
+    'delay_vs_cancellation': (draw_delay_vs_cancellation, (14, 8)),
+}
+
+
+# Como cada gráfico é desenhado no navegador (assets/vra_graficos.js)
+CLIENT_SPECS = {
+    'airlines': {'kind': 'bar', 'color': '#e74c3c', 'rotateLabels': True,
+                 'title': 'Top 15 Empresas Aéreas com Mais Cancelamentos',
+                 'xlabel': 'Empresa Aérea', 'ylabel': 'Número de Cancelamentos'},
+    'airline_rate': {'kind': 'bar', 'color': '#c0392b', 'rotateLabels': True, 'format': 'percent',
+                     'title': 'Taxa de Cancelamento por Empresa Aérea (%)',
+                     'xlabel': 'Empresa Aérea', 'ylabel': 'Porcentagem de Cancelamentos (%)'},
+    'origins': {'kind': 'bar', 'color': '#f39c12', 'rotateLabels': True,
+                'title': 'Top 15 Aeroportos de Origem com Mais Cancelamentos',
+                'xlabel': 'Aeroporto de Origem', 'ylabel': 'Número de Cancelamentos'},
+    'hours': {'kind': 'bar', 'color': '#9b59b6', 'skipZero': True,
+              'title': 'Cancelamentos por Hora do Dia',
+              'xlabel': 'Hora do Dia', 'ylabel': 'Número de Cancelamentos'},
+    'months': {'kind': 'bar', 'color': '#27ae60',
+               'title': 'Cancelamentos por Mês',
+               'xlabel': 'Mês', 'ylabel': 'Número de Cancelamentos'},
+    'years': {'kind': 'line', 'color': '#e74c3c',
+              'title': 'Evolução dos Cancelamentos por Ano',
+              'xlabel': 'Ano', 'ylabel': 'Número de Cancelamentos'},
+    'weekdays': {'kind': 'bar', 'color': '#16a085', 'skipZero': True,
+                 'title': 'Cancelamentos por Dia da Semana',
+                 'xlabel': 'Dia da Semana', 'ylabel': 'Número de Cancelamentos'},
+    'line_types': {'kind': 'pie', 'colors': ['#e74c3c', '#3498db', '#f39c12'],
+                   'title': 'Distribuição de Cancelamentos por Tipo de Linha'},
+    'routes': {'kind': 'bar', 'color': '#2980b9', 'rotateLabels': True,
+               'title': 'Top 15 Rotas com Mais Cancelamentos',
+               'xlabel': 'Rota (Origem → Destino)', 'ylabel': 'Número de Cancelamentos'},
+    'route_rate': {'kind': 'bar', 'color': '#1f618d', 'rotateLabels': True, 'format': 'percent',
+                   'title': f'Taxa de Cancelamento por Rota (%) - rotas com {vra_routes.MIN_FLIGHTS_FOR_RATE}+ voos',
+                   'xlabel': 'Rota (Origem → Destino)', 'ylabel': 'Porcentagem de Cancelamentos (%)'},
+    'delay_distribution': {'kind': 'bar', 'color': '#8e44ad',
+                           'title': 'Distribuição dos Atrasos de Partida (faixas de 5 min; pontas acumuladas)',
+                           'xlabel': 'Atraso (minutos)', 'ylabel': 'Número de Voos'},
+    'on_time_airline': {'kind': 'bar', 'color': '#2ecc71', 'rotateLabels': True, 'format': 'percent',
+                        'title': f'Partidas no Horário por Empresa Aérea (%) - até {vra_delays.ON_TIME_MINUTES} min de atraso',
+                        'xlabel': 'Empresa Aérea', 'ylabel': 'Partidas no Horário (%)'},
+    'on_time_hour': {'kind': 'bar', 'color': '#1abc9c', 'format': 'percent', 'skipZero': True,
+                     'title': 'Partidas no Horário por Hora do Dia (%)',
+                     'xlabel': 'Hora do Dia', 'ylabel': 'Partidas no Horário (%)'},
+    'delay_vs_cancellation': {'kind': 'bar', 'color': '#d35400', 'format': 'percent',
+                              'title': 'Taxa de Cancelamento x Atraso Médio do Dia',
+                              'xlabel': 'Atraso Médio de Partida no Dia', 'ylabel': 'Taxa de Cancelamento (%)'},
+}
+
+
+def _display_labels(chart_id, labels):
+    """Rótulos como aparecem nos gráficos (nomes de meses, dias, tipos de linha)"""
+    if chart_id == 'origins':
+        return [label[:50] + '...' if len(label) > 50 else label for label in labels]
+    if chart_id == 'months':
+        return [MONTH_NAMES[i-1] for i in labels]
+    if chart_id == 'weekdays':
+        return DAY_NAMES_PT
+    if chart_id == 'line_types':
+        return [LINE_TYPE_LABELS.get(code, f'Tipo {code}') for code in labels]
+    if chart_id in ('routes', 'route_rate'):
+        return [vra_routes.route_label(key) for key in labels]
+    if chart_id == 'delay_distribution':
+        return [f'{start}+' if start == labels[-1] else str(start) for start in labels]
+    return [str(label) for label in labels]
+
+
+def client_charts(aggregates):
+    """Gráficos do dashboard como dados para o navegador: (id, título, especificação)"""
+    charts = []
+    for chart_id, title, data in chart_payloads(aggregates):
+        spec = dict(CLIENT_SPECS[chart_id])
+        if data.get('correlation') is not None:
+            spec['title'] += f" - correlação diária: {data['correlation']:.2f}"
+        if data.get('quantiles'):
+            spec['title'] += ' - ' + ', '.join(f"p{round(float(q) * 100)}: {minutes} min"
+                                               for q, minutes in data['quantiles'].items() if minutes is not None)
+        spec['labels'] = _display_labels(chart_id, data['labels'])
+        spec['values'] = [round(value, 4) if isinstance(value, float) else value for value in data['values']]
+        charts.append((chart_id, title, spec))
+    return charts
+
+
+def render_chart(chart_id, data, dpi=300, image_format='png'):
+    """Desenha um gráfico e devolve a imagem em bytes"""
+    draw, figsize = CHARTS[chart_id]
+    fig = Figure(figsize=figsize)
+    draw(fig, data)
+    fig.tight_layout()
+    buffer = BytesIO()
+    fig.savefig(buffer, format=image_format, bbox_inches='tight', dpi=dpi, facecolor='white')
+    return buffer.getvalue()
+
+
+def chart_key(chart_id, data, dpi, image_format):
+    """Hash que identifica a imagem: dados agregados + parâmetros de renderização"""
+    key = json.dumps({'chart': chart_id, 'data': data, 'dpi': dpi, 'format': image_format,
+                      'version': CHART_VERSION, 'matplotlib': matplotlib.__version__},
+                     sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _render_to_cache(chart_id, data, dpi, image_format, path):
+    """Renderiza e grava no cache; devolve (imagem, segundos gastos)"""
+    start = time.perf_counter()
+    image = render_chart(chart_id, data, dpi, image_format)
+    if path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(image)
+        os.replace(tmp_path, path)
+    return image, time.perf_counter() - start
+
+
+def prune_cache(cache_dir, keep, grace_seconds=CHART_CACHE_GRACE_SECONDS, now=None):
+    """Apaga do cache as imagens fora de `keep` não usadas há mais de `grace_seconds`
+
+    O mtime de cada imagem marca o último uso (render_charts o renova ao
+    reaproveitá-la). Retorna quantos arquivos foram apagados.
+    """
+    if not cache_dir or not os.path.isdir(cache_dir):
+        return 0
+    now = time.time() if now is None else now
+    removed = 0
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name in keep or not os.path.isfile(path):
+            continue
+        try:
+            if now - os.path.getmtime(path) >= grace_seconds:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            # Outra renderização apagou ou renomeou o arquivo ao mesmo tempo
+            continue
+    return removed
+
+
+def render_charts(aggregates, dpi=300, image_format='png', jobs=1, cache_dir=CHART_CACHE_DIR):
+    """Renderiza os gráficos do dashboard, reaproveitando os que não mudaram
+
+    Retorna uma lista de (título, imagem em bytes, tipo MIME). Os gráficos
+    que não estão no cache são desenhados em até `jobs` processos; depois,
+    as imagens velhas que esta renderização não usou saem do cache (prune_cache).
+    """
+    if image_format not in MIME_TYPES:
+        raise ValueError(f"Formato de imagem não suportado: {image_format}")
+
+    payloads = chart_payloads(aggregates)
+    images = {}
+    missing = []
+    keep = set()
+    for chart_id, title, data in payloads:
+        path = None
+        if cache_dir:
+            name = f"{chart_key(chart_id, data, dpi, image_format)}.{image_format}"
+            keep.add(name)
+            path = os.path.join(cache_dir, name)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    images[chart_id] = f.read()
+                os.utime(path)
+                continue
+        missing.append((chart_id, data, path))
+
+    if missing and jobs > 1 and len(missing) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(missing)), initializer=apply_style) as executor:
+            futures = {chart_id: executor.submit(_render_to_cache, chart_id, data, dpi, image_format, path)
+                       for chart_id, data, path in missing}
+            for chart_id, future in futures.items():
+                images[chart_id], elapsed = future.result()
+                vra_profiling.record(f'render:{chart_id}', elapsed)
+    elif missing:
+        apply_style()
+        for chart_id, data, path in missing:
+            images[chart_id], elapsed = _render_to_cache(chart_id, data, dpi, image_format, path)
+            vra_profiling.record(f'render:{chart_id}', elapsed)
+
+    prune_cache(cache_dir, keep)
+    return [(title, images[chart_id], MIME_TYPES[image_format]) for chart_id, title, data in payloads]
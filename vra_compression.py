@@ -0,0 +1,80 @@
+import os
+import gzip
+import importlib.util
+
+# CSVs comprimidos em repouso: .csv.gz (gzip, da biblioteca padrão) ou
+# .csv.zst (zstd, pacote zstandard). O scraper grava comprimindo enquanto
+# baixa e a leitura descomprime em fluxo: o pyarrow e o pandas reconhecem a
+# compressão pela extensão, e o resto do código só precisa destas funções.
+
+HAS_ZSTD = importlib.util.find_spec('zstandard') is not None
+
+# Compressão -> extensão acrescentada ao nome do CSV
+SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+# Níveis escolhidos para arquivos gravados uma vez e lidos muitas
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 9
+
+CSV_PATTERNS = ['*.csv'] + [f'*.csv{suffix}' for suffix in SUFFIXES.values()]
+
+
+def compression_of(path):
+    """'gzip', 'zstd' ou None, pela extensão do arquivo"""
+    for compression, suffix in SUFFIXES.items():
+        if path.lower().endswith(suffix):
+            return compression
+    return None
+
+
+def is_csv_path(path):
+    """O caminho é um CSV, comprimido ou não?"""
+    compression = compression_of(path)
+    base = path[:-len(SUFFIXES[compression])] if compression else path
+    return base.lower().endswith('.csv')
+
+
+def with_suffix(path, compression):
+    """Caminho do arquivo gravado com a compressão pedida (None = sem compressão)"""
+    return path + SUFFIXES[compression] if compression else path
+
+
+def _zstandard():
+    if not HAS_ZSTD:
+        raise RuntimeError("arquivos .zst precisam do pacote zstandard (pip install zstandard)")
+    import zstandard
+    return zstandard
+
+
+def open_reader(path):
+    """Abre o arquivo para leitura binária, já descomprimindo"""
+    compression = compression_of(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'zstd':
+        return _zstandard().ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+
+def compressing_writer(raw, compression):
+    """Envolve um arquivo binário aberto para gravar comprimido
+
+    Feche o envoltório para terminar o fluxo comprimido; isso não fecha `raw`,
+    que ainda pode receber flush/fsync.
+    """
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=GZIP_LEVEL)
+    if compression == 'zstd':
+        return _zstandard().ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False)
+    raise ValueError(f"Compressão desconhecida: {compression}")
+
+
+def uncompressed_size(path, chunk_size=1024 * 1024):
+    """Tamanho do conteúdo descomprimido (lê o arquivo inteiro)"""
+    if compression_of(path) is None:
+        return os.path.getsize(path)
+    total = 0
+    with open_reader(path) as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            total += len(chunk)
+    return total
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+# Conversão das datas do VRA. As datas se repetem muito (um mês tem poucos
+# dias distintos e alguns milhares de horários), então cada valor distinto é
+# convertido uma vez só e o resultado é espalhado pelas linhas via códigos.
+
+# Valor usado nas colunas inteiras derivadas quando a data é inválida
+MISSING = -1
+
+
+def _codes_and_uniques(values):
+    """Códigos inteiros por linha e os valores distintos da coluna"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return np.asarray(values.cat.codes), pd.Index(values.cat.categories)
+    codes, uniques = pd.factorize(values)
+    return codes, pd.Index(uniques)
+
+
+# Abaixo disso não compensa separar data e hora antes de converter
+_SPLIT_MIN_VALUES = 1000
+
+
+def _split_format(date_format):
+    """'%d/%m/%Y %H:%M' -> ('%d/%m/%Y', '%H:%M'); None se o formato não tem data e hora"""
+    date_part, sep, time_part = date_format.partition(' ')
+    return (date_part, time_part) if sep and '%H' in time_part and '%H' not in date_part else None
+
+
+def _to_datetime(text, date_format):
+    """pd.to_datetime com formato fixo; datas com hora são convertidas em duas partes
+
+    Horários de voo têm dezenas de milhares de valores distintos por mês, mas
+    só ~31 datas e 1440 horários: converter cada metade separadamente e somar
+    evita o strptime em cada valor distinto.
+    """
+    split = _split_format(date_format)
+    if split is None or len(text) < _SPLIT_MIN_VALUES:
+        return pd.to_datetime(text, format=date_format, errors='coerce')
+    parts = text.str.partition(' ')
+    day_codes, day_uniques = pd.factorize(parts[0])
+    time_codes, time_uniques = pd.factorize(parts[2])
+    days = pd.to_datetime(pd.Series(day_uniques), format=split[0], errors='coerce').to_numpy(dtype='datetime64[s]')
+    times = pd.to_datetime(pd.Series(time_uniques), format=split[1], errors='coerce')
+    offsets = (times - times.dt.normalize()).to_numpy(dtype='timedelta64[s]')
+    result = np.full(len(text), np.datetime64('NaT'), dtype='datetime64[s]')
+    valid = (day_codes >= 0) & (time_codes >= 0)
+    result[valid] = days[day_codes[valid]] + offsets[time_codes[valid]]
+    return pd.Series(result, index=text.index)
+
+
+def _parse_uniques(uniques, formats):
+    """Converte os valores distintos tentando cada formato nos que ainda falharam"""
+    parsed = pd.Series(pd.NaT, index=range(len(uniques)), dtype='datetime64[s]')
+    remaining = np.ones(len(uniques), dtype=bool)
+    text = pd.Series(uniques.astype(str), index=parsed.index).str.strip()
+    for date_format in formats:
+        if not remaining.any():
+            break
+        attempt = _to_datetime(text[remaining], date_format)
+        ok = attempt.notna().to_numpy()
+        parsed.loc[attempt.index[ok]] = attempt[ok].astype('datetime64[s]')
+        remaining[attempt.index[ok]] = False
+    return parsed.to_numpy()
+
+
+def parse_dates(values, formats):
+    """Converte uma coluna de datas em texto, aceitando vários formatos
+
+    Retorna (datas datetime64[s], códigos por linha, datas distintas), para
+    que as colunas derivadas também sejam calculadas só sobre os distintos.
+    """
+    codes, uniques = _codes_and_uniques(values)
+    parsed_uniques = _parse_uniques(uniques, formats)
+    dates = np.full(len(codes), np.datetime64('NaT'), dtype='datetime64[s]')
+    valid = codes >= 0
+    dates[valid] = parsed_uniques[codes[valid]]
+    return pd.Series(dates, index=values.index), codes, parsed_uniques
+
+
+def _spread(codes, unique_values, dtype):
+    """Leva um valor calculado por data distinta para cada linha"""
+    result = np.full(len(codes), MISSING, dtype=dtype)
+    valid = codes >= 0
+    result[valid] = unique_values[codes[valid]]
+    return result
+
+
+def date_features(codes, parsed_uniques, features):
+    """Colunas inteiras (ano, mês, dia da semana, hora) a partir das datas distintas
+
+    `features` mapeia nome da coluna -> (atributo, dtype), por exemplo
+    {'Mês': ('month', 'int8')}. Datas inválidas viram MISSING.
+    """
+    index = pd.DatetimeIndex(parsed_uniques)
+    columns = {}
+    for name, (attribute, dtype) in features.items():
+        values = getattr(index, attribute).to_numpy(dtype='float64', na_value=np.nan)
+        values = np.where(np.isnan(values), MISSING, values).astype(dtype)
+        columns[name] = _spread(codes, values, dtype)
+    return columns
+
+
+def date_features_from_datetimes(dates, features):
+    """Mesmas colunas de date_features para uma coluna já convertida"""
+    codes, uniques = pd.factorize(dates)
+    return date_features(codes, np.asarray(uniques, dtype='datetime64[s]'), features)
@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+import vra_dates
+
+# Atrasos de partida e chegada (real - previsto). Os horários já vêm como
+# datetime64[s] da ingestão, então o atraso é uma subtração de inteiros. A
+# distribuição é guardada como histograma de minutos: somável entre arquivos
+# e pedaços como os demais agregados, e os quantis saem dele sem ordenar os
+# voos. Os minutos são exatos dentro de HISTOGRAM_RANGE; fora dele acumulam
+# nas pontas.
+
+ON_TIME_MINUTES = 15
+HISTOGRAM_RANGE = (-180, 1440)
+QUANTILES = [0.5, 0.9, 0.99]
+
+# Tipo de atraso -> (coluna prevista, coluna real)
+DELAY_COLUMNS = {
+    'departure': ('Partida Prevista', 'Partida Real'),
+    'arrival': ('Chegada Prevista', 'Chegada Real'),
+}
+
+# Dimensões da pontualidade (atraso de partida): nome -> coluna
+DIMENSIONS = {
+    'airline': 'Empresa Aérea',
+    'origin_icao': 'Sigla ICAO Aeroporto Origem',
+    'hour': 'Hora_Partida',
+    'day': 'Referência',
+}
+
+# Contagens acrescentadas aos agregados (vra_aggregates.COUNT_KEYS)
+DELAY_COUNT_KEYS = (
+    [f'{kind}_delay_hist' for kind in DELAY_COLUMNS]
+    + [f'{measure}_by_{dimension}' for dimension in DIMENSIONS
+       for measure in ('departures', 'on_time', 'delay_sum')]
+    + ['flights_by_day', 'cancelled_by_day']
+)
+
+# Faixas de atraso médio do dia, para relacionar atrasos e cancelamentos
+DELAY_BUCKETS = [-np.inf, 0, 10, 20, 30, 60, np.inf]
+DELAY_BUCKET_LABELS = ['< 0 min', '0-10 min', '10-20 min', '20-30 min', '30-60 min', '60+ min']
+
+_NAT = np.iinfo('int64').min
+
+
+def _seconds(df, column):
+    return df[column].to_numpy(dtype='datetime64[s]').view('int64')
+
+
+def delay_minutes(df, scheduled, actual):
+    """Atraso em minutos de cada linha; retorna (minutos, válido) com válido=False sem horário real"""
+    if scheduled not in df.columns or actual not in df.columns:
+        return np.zeros(len(df), dtype='int64'), np.zeros(len(df), dtype=bool)
+    scheduled, actual = _seconds(df, scheduled), _seconds(df, actual)
+    valid = (scheduled != _NAT) & (actual != _NAT)
+    minutes = np.zeros(len(df), dtype='int64')
+    minutes[valid] = (actual[valid] - scheduled[valid]) // 60
+    return minutes, valid
+
+
+def histogram(minutes):
+    """Histograma de minutos (só as faixas presentes), com os extremos acumulados nas pontas"""
+    low, high = HISTOGRAM_RANGE
+    counts = np.bincount(np.clip(minutes, low, high) - low, minlength=high - low + 1)
+    present = np.flatnonzero(counts)
+    return pd.Series(counts[present].astype('int64'), index=pd.Index((present + low).tolist()))
+
+
+def quantiles(hist, qs=QUANTILES):
+    """Quantis (em minutos) a partir do histograma; None se ele estiver vazio"""
+    if len(hist) == 0 or hist.sum() == 0:
+        return {q: None for q in qs}
+    hist = hist.sort_index()
+    cumulative = hist.to_numpy().cumsum()
+    return {q: int(hist.index[np.searchsorted(cumulative, q * cumulative[-1])]) for q in qs}
+
+
+def _key_codes(series):
+    """Códigos inteiros e rótulos de uma coluna-chave (categoria, inteiro ou data)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), list(series.cat.categories)
+    codes, uniques = pd.factorize(series)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return codes, list(pd.DatetimeIndex(uniques).strftime('%Y-%m-%d'))
+    labels = [value.item() if hasattr(value, 'item') else value for value in uniques]
+    # Horas inválidas (vra_dates.MISSING) ficam de fora, como nos demais agregados
+    missing = [index for index, label in enumerate(labels) if label == vra_dates.MISSING]
+    if missing:
+        codes = np.where(np.isin(codes, missing), -1, codes)
+    return codes, labels
+
+
+def _sum_by(codes, labels, mask, weights=None):
+    """Soma (ou contagem) por chave das linhas em `mask`, só com as chaves presentes"""
+    selected = mask & (codes >= 0)
+    sums = np.bincount(codes[selected], weights=None if weights is None else weights[selected],
+                       minlength=len(labels))
+    present = np.flatnonzero(sums)
+    index = pd.Index([labels[i] for i in present])
+    return pd.Series(np.rint(sums[present]).astype('int64'), index=index).sort_index()
+
+
+def delay_aggregates(df, cancelled):
+    """Contagens de atraso e pontualidade de um DataFrame; `cancelled` marca os cancelados"""
+    minutes = {kind: delay_minutes(df, *columns) for kind, columns in DELAY_COLUMNS.items()}
+    result = {f'{kind}_delay_hist': histogram(values[valid]) for kind, (values, valid) in minutes.items()}
+
+    # Pontualidade e atraso médio usam o atraso de partida, limitado às pontas do histograma
+    delays, departures = minutes['departure']
+    delays = np.clip(delays, *HISTOGRAM_RANGE)
+    on_time = departures & (delays <= ON_TIME_MINUTES)
+    everything = np.ones(len(df), dtype=bool)
+    for dimension, column in DIMENSIONS.items():
+        if column not in df.columns:
+            for measure in ('departures', 'on_time', 'delay_sum'):
+                result[f'{measure}_by_{dimension}'] = pd.Series(dtype='int64')
+            continue
+        codes, labels = _key_codes(df[column])
+        result[f'departures_by_{dimension}'] = _sum_by(codes, labels, departures)
+        result[f'on_time_by_{dimension}'] = _sum_by(codes, labels, on_time)
+        result[f'delay_sum_by_{dimension}'] = _sum_by(codes, labels, departures, delays.astype('float64'))
+        if dimension == 'day':
+            result['flights_by_day'] = _sum_by(codes, labels, everything)
+            result['cancelled_by_day'] = _sum_by(codes, labels, cancelled)
+    return result
+
+
+def on_time_rate(on_time, departures):
+    """Porcentagem de partidas com até ON_TIME_MINUTES de atraso, por chave"""
+    return (on_time.reindex(departures.index, fill_value=0) / departures * 100).fillna(0)
+
+
+def mean_delay(delay_sum, departures):
+    """Atraso médio de partida (minutos) por chave"""
+    return (delay_sum.reindex(departures.index, fill_value=0) / departures).fillna(0)
+
+
+def daily_delay_and_cancellation(aggregates):
+    """Por dia: atraso médio de partida e taxa de cancelamento (dias sem partidas ficam de fora)"""
+    departures = aggregates['departures_by_day']
+    daily = pd.DataFrame({
+        'atraso_medio': mean_delay(aggregates['delay_sum_by_day'], departures),
+        'voos': aggregates['flights_by_day'].reindex(departures.index, fill_value=0),
+        'cancelados': aggregates['cancelled_by_day'].reindex(departures.index, fill_value=0),
+    })
+    daily['taxa_cancelamento'] = (daily['cancelados'] / daily['voos'] * 100).fillna(0)
+    return daily
+
+
+def cancellation_by_delay_bucket(aggregates):
+    """Taxa de cancelamento dos dias agrupados pela faixa de atraso médio do dia
+
+    Faixas sem nenhum dia ficam de fora. Retorna (Series faixa -> taxa, correlação de Pearson entre atraso médio e
+    taxa de cancelamento diários, ou None com menos de 3 dias).
+    """
+    daily = daily_delay_and_cancellation(aggregates)
+    buckets = pd.cut(daily['atraso_medio'], DELAY_BUCKETS, labels=DELAY_BUCKET_LABELS, right=False)
+    grouped = daily.groupby(buckets, observed=False)[['voos', 'cancelados']].sum()
+    grouped = grouped[grouped['voos'] > 0]
+    rates = grouped['cancelados'] / grouped['voos'] * 100
+    correlation = None
+    if len(daily) >= 3 and daily['atraso_medio'].std() > 0 and daily['taxa_cancelamento'].std() > 0:
+        correlation = float(daily['atraso_medio'].corr(daily['taxa_cancelamento']))
+    return rates, correlation
+
+
+def on_time_share(hist):
+    """Porcentagem do histograma com até ON_TIME_MINUTES de atraso"""
+    total = hist.sum()
+    return float(hist[hist.index <= ON_TIME_MINUTES].sum() / total * 100) if total else 0.0
+
+
+def binned(hist, width=5, low=-30, high=180):
+    """Histograma reagrupado em faixas de `width` minutos entre low e high, com as pontas acumuladas"""
+    if len(hist) == 0:
+        return pd.Series(dtype='int64')
+    minutes = np.clip(hist.index.to_numpy(), low, high)
+    starts = (minutes - low) // width * width + low
+    return hist.groupby(starts).sum().reindex(range(low, high + 1, width), fill_value=0)
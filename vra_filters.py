@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+# Filtros dos dashboards por período, empresa, aeroportos e tipo de linha.
+# Os filtros são aplicados o mais cedo possível: arquivos fora do período nem
+# são lidos (vra_cache guarda o intervalo de datas de cada arquivo) e, no cache
+# Parquet, o período é filtrado pelo pyarrow antes de virar DataFrame.
+
+# Filtro por lista de valores: atributo -> coluna do esquema (vra_schema)
+VALUE_FILTERS = {
+    'airlines': 'Empresa Aérea',
+    'origins': 'Sigla ICAO Aeroporto Origem',
+    'destinations': 'Sigla ICAO Aeroporto Destino',
+    'line_types': 'Código Tipo Linha',
+}
+
+DATE_COLUMN = 'Referência'
+
+_LABELS = {
+    'airlines': 'Empresas',
+    'origins': 'Origens',
+    'destinations': 'Destinos',
+    'line_types': 'Tipos de linha',
+}
+
+
+def parse_date_bound(value, end=False):
+    """'2023', '2023-03' ou '2023-03-15' -> Timestamp; no fim, o período é inclusivo"""
+    if value is None or isinstance(value, pd.Timestamp):
+        return value
+    text = str(value).strip()
+    parts = text.split('-')
+    try:
+        if len(parts) == 1:
+            period = pd.Period(text, freq='Y')
+        elif len(parts) == 2:
+            period = pd.Period(text, freq='M')
+        else:
+            period = pd.Period(text, freq='D')
+    except ValueError:
+        raise ValueError(f"Data inválida: {value} (use AAAA, AAAA-MM ou AAAA-MM-DD)")
+    return (period.end_time if end else period.start_time).normalize()
+
+
+def normalize_value(value):
+    """Forma usada nas comparações dos filtros: sem espaços nas pontas e em maiúsculas"""
+    return str(value).strip().upper()
+
+
+def _normalize(values):
+    return frozenset(normalize_value(value) for value in values or () if str(value).strip())
+
+
+class DashboardFilter:
+    """Recorte dos dados de um dashboard; sem nenhum critério, aceita tudo"""
+
+    def __init__(self, start=None, end=None, airlines=None, origins=None, destinations=None, line_types=None):
+        self.start = parse_date_bound(start)
+        self.end = parse_date_bound(end, end=True)
+        if self.start is not None and self.end is not None and self.start > self.end:
+            raise ValueError("A data inicial é posterior à final")
+        self.airlines = _normalize(airlines)
+        self.origins = _normalize(origins)
+        self.destinations = _normalize(destinations)
+        self.line_types = _normalize(line_types)
+
+    @classmethod
+    def from_dict(cls, spec):
+        """Cria o filtro a partir de um dicionário (por exemplo, uma entrada de --reports)"""
+        unknown = set(spec) - {'start', 'end'} - set(VALUE_FILTERS)
+        if unknown:
+            raise ValueError(f"Filtro desconhecido: {', '.join(sorted(unknown))}")
+        return cls(**spec)
+
+    def is_empty(self):
+        return self.start is None and self.end is None and not any(
+            getattr(self, name) for name in VALUE_FILTERS)
+
+    def overlaps(self, first_date, last_date):
+        """O período do filtro cruza o de um arquivo? Sem datas conhecidas, sim"""
+        if first_date is None or last_date is None:
+            return True
+        if self.start is not None and last_date < self.start:
+            return False
+        if self.end is not None and first_date > self.end:
+            return False
+        return True
+
+    def mask(self, df):
+        """Linhas do DataFrame que passam no filtro"""
+        keep = np.ones(len(df), dtype=bool)
+        if self.start is not None or self.end is not None:
+            dates = df[DATE_COLUMN]
+            if self.start is not None:
+                keep &= (dates >= self.start).to_numpy()
+            if self.end is not None:
+                keep &= (dates <= self.end).to_numpy()
+        for name, column in VALUE_FILTERS.items():
+            values = getattr(self, name)
+            if not values:
+                continue
+            if column not in df.columns:
+                # Arquivo sem a coluna (layout antigo): nenhuma linha atende ao filtro
+                keep[:] = False
+            else:
+                keep &= _isin_upper(df[column], values)
+        return keep
+
+    def apply(self, df):
+        if self.is_empty():
+            return df
+        return df[self.mask(df)]
+
+    def parquet_filters(self):
+        """Filtro de período no formato do pyarrow (ou None), para ler só as linhas do período"""
+        filters = []
+        if self.start is not None:
+            filters.append((DATE_COLUMN, '>=', self.start))
+        if self.end is not None:
+            filters.append((DATE_COLUMN, '<=', self.end))
+        return filters or None
+
+    def describe(self):
+        """Resumo legível do filtro, para o cabeçalho do dashboard"""
+        parts = []
+        if self.start is not None or self.end is not None:
+            start = self.start.strftime('%d/%m/%Y') if self.start is not None else 'início'
+            end = self.end.strftime('%d/%m/%Y') if self.end is not None else 'hoje'
+            parts.append(f"Período: {start} a {end}")
+        for name in VALUE_FILTERS:
+            values = getattr(self, name)
+            if values:
+                parts.append(f"{_LABELS[name]}: {', '.join(sorted(values))}")
+        return '; '.join(parts)
+
+
+def _isin_upper(series, values):
+    """isin sem diferenciar maiúsculas; em categorias, compara só os valores distintos"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        if len(categories) == 0:
+            return np.zeros(len(series), dtype=bool)
+        wanted = pd.Index(categories.astype(str).str.strip().str.upper()).isin(values)
+        codes = series.cat.codes.to_numpy()
+        return (codes >= 0) & wanted[np.maximum(codes, 0)]
+    return series.astype(str).str.strip().str.upper().isin(values).to_numpy()
+
+
+def envelope(filters):
+    """Menor filtro que contém todos os outros (o que precisa ser lido para atendê-los)"""
+    filters = list(filters)
+    if not filters or any(f.is_empty() for f in filters):
+        return DashboardFilter()
+    starts = [f.start for f in filters]
+    ends = [f.end for f in filters]
+    spec = {
+        'start': None if None in starts else min(starts),
+        'end': None if None in ends else max(ends),
+    }
+    for name in VALUE_FILTERS:
+        values = [getattr(f, name) for f in filters]
+        spec[name] = None if not all(values) else frozenset().union(*values)
+    return DashboardFilter(**spec)
@@ -0,0 +1,143 @@
+import re
+import csv
+import codecs
+import unicodedata
+import vra_compression
+
+# Detecção do formato de cada CSV do VRA a partir dos primeiros KB: encoding,
+# separador, linhas antes do cabeçalho e nomes de colunas. Os arquivos da ANAC
+# mudaram ao longo dos anos (Latin-1 e vírgula nos mais antigos, colunas
+# renomeadas); com o formato detectado antes, cada arquivo é lido uma única
+# vez já com os parâmetros certos e as colunas no nome canônico (vra_schema).
+
+# Aumente quando a detecção mudar, para refazer as detecções guardadas
+DETECTOR_VERSION = 4
+
+SAMPLE_BYTES = 64 * 1024
+DELIMITERS = [';', ',', '\t', '|']
+
+# Linhas procuradas antes do cabeçalho (títulos, "Atualizado em ..." etc.)
+MAX_PREAMBLE_LINES = 20
+
+# Uma linha só é o cabeçalho se reconhecer pelo menos tantas colunas
+MIN_KNOWN_COLUMNS = 3
+
+# Nome canônico -> nomes alternativos, do preferido ao menos preferido.
+# A comparação ignora acentos, maiúsculas e pontuação (normalize_name).
+COLUMN_ALIASES = {
+    'Empresa Aérea': ['Nome Empresa Aérea', 'nm_empresa'],
+    # A sigla é outra coluna: no mesmo arquivo, nome e sigla dividiriam a empresa em duas
+    'Sigla ICAO Empresa Aérea': ['ICAO Empresa Aérea', 'sg_empresa_icao'],
+    'Número Voo': ['Número do Voo', 'nr_voo'],
+    'Código Tipo Linha': ['Tipo Linha', 'cd_tipo_linha'],
+    'Sigla ICAO Aeroporto Origem': ['ICAO Aeródromo Origem', 'Sigla ICAO Aeródromo Origem', 'sg_icao_origem'],
+    'Descrição Aeroporto Origem': ['Descrição Aeródromo Origem', 'Nome Aeródromo Origem', 'nm_aerodromo_origem'],
+    'Sigla ICAO Aeroporto Destino': ['ICAO Aeródromo Destino', 'Sigla ICAO Aeródromo Destino', 'sg_icao_destino'],
+    'Partida Prevista': ['Data Partida Prevista', 'dt_partida_prevista'],
+    'Partida Real': ['Data Partida Real', 'dt_partida_real'],
+    'Chegada Prevista': ['Data Chegada Prevista', 'dt_chegada_prevista'],
+    'Chegada Real': ['Data Chegada Real', 'dt_chegada_real'],
+    'Situação Voo': ['Situação do Voo', 'ds_situacao_voo'],
+    'Referência': ['Data Referência', 'dt_referencia'],
+}
+
+
+class FormatError(ValueError):
+    """O arquivo não parece um CSV do VRA (cabeçalho não reconhecido)"""
+
+
+def normalize_name(name):
+    """'Situação Voo' -> 'situacao_voo': sem acentos, minúsculo, só letras, dígitos e _"""
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
+
+
+# Nome normalizado -> (nome canônico, preferência; 0 é o próprio nome canônico)
+_ALIAS_INDEX = {}
+for _canonical, _aliases in COLUMN_ALIASES.items():
+    for _rank, _alias in enumerate([_canonical] + _aliases):
+        _ALIAS_INDEX.setdefault(normalize_name(_alias), (_canonical, _rank))
+
+
+def canonical_columns(header):
+    """Cabeçalho do arquivo -> {coluna do arquivo: nome canônico}
+
+    Se duas colunas do arquivo correspondem ao mesmo nome canônico, fica a de
+    nome preferido (por exemplo, 'Empresa Aérea' antes de 'Nome Empresa Aérea').
+    """
+    best = {}
+    for column in header:
+        match = _ALIAS_INDEX.get(normalize_name(column))
+        if match is None:
+            continue
+        canonical, rank = match
+        if canonical not in best or rank < best[canonical][1]:
+            best[canonical] = (column, rank)
+    return {column: canonical for canonical, (column, rank) in best.items()}
+
+
+def sniff_encoding(sample):
+    """Encoding provável a partir dos primeiros bytes: BOM, UTF-8 válido ou Latin-1"""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        # final=False: um caractere cortado no fim da amostra não é erro
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        # Latin-1 aceita qualquer byte; é o dos arquivos antigos da ANAC
+        return 'latin-1'
+
+
+def detect_format(path, sample_bytes=SAMPLE_BYTES):
+    """Formato de um CSV a partir da amostra inicial
+
+    Retorna um dicionário com encoding, delimiter, skip_rows (linhas antes do
+    cabeçalho), header (colunas do arquivo) e renames ({coluna do arquivo:
+    nome canônico}). Levanta FormatError se nenhuma linha parecer o cabeçalho.
+    """
+    with vra_compression.open_reader(path) as f:
+        sample = f.read(sample_bytes)
+    encoding = sniff_encoding(sample)
+    lines = sample.decode(encoding, errors='replace').lstrip('\ufeff').splitlines()
+
+    for index, line in enumerate(lines[:MAX_PREAMBLE_LINES]):
+        candidates = []
+        for delimiter in DELIMITERS:
+            # Os nomes ficam como estão no arquivo: é por eles que o leitor seleciona as colunas
+            header = next(csv.reader([line], delimiter=delimiter), [])
+            renames = canonical_columns(header)
+            candidates.append((len(renames), delimiter, header, renames))
+        known, delimiter, header, renames = max(candidates, key=lambda candidate: candidate[0])
+        if known >= MIN_KNOWN_COLUMNS:
+            return {
+                'version': DETECTOR_VERSION,
+                'encoding': encoding,
+                'delimiter': delimiter,
+                'skip_rows': index,
+                'header': header,
+                'renames': {column: canonical for column, canonical in renames.items() if column != canonical},
+                'columns': sorted(renames.values()),
+            }
+    raise FormatError(f"cabeçalho do VRA não encontrado nas primeiras {MAX_PREAMBLE_LINES} linhas "
+                      f"(encoding {encoding})")
+
+
+def require_columns(file_format, required):
+    """Levanta FormatError se faltar no arquivo alguma das colunas canônicas em `required`"""
+    missing = [column for column in required if column not in file_format['columns']]
+    if missing:
+        raise FormatError(f"colunas obrigatórias ausentes: {', '.join(missing)}")
+
+
+def source_columns(file_format, wanted):
+    """{coluna do arquivo: nome canônico} só das colunas canônicas em `wanted`"""
+    canonical = canonical_columns(file_format['header'])
+    return {column: name for column, name in canonical.items() if name in wanted}
+
+
+def arrow_encoding(encoding):
+    """Nome do encoding para o pyarrow, que já ignora o BOM do UTF-8 sozinho"""
+    return 'utf8' if encoding in ('utf-8', 'utf-8-sig') else encoding
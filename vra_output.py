@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import base64
+import html
+import hashlib
+import vra_charts
+
+# Formas de entregar os gráficos no HTML do dashboard:
+#   inline - imagens embutidas como data URI (um único arquivo, pesado)
+#   files  - imagens em arquivos separados com hash do conteúdo no nome
+#   json   - agregados em JSON, desenhados no navegador por assets/vra_graficos.js
+OUTPUT_MODES = ['inline', 'files', 'json']
+
+CLIENT_LIBRARY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'vra_graficos.js')
+
+# Assets que o HTML deixou de usar continuam no disco por este tempo: páginas
+# antigas ainda em cache no navegador ou em um CDN seguem achando as imagens
+ASSET_GRACE_SECONDS = 7 * 24 * 3600
+
+# Registro, dentro do diretório de assets, de quando cada arquivo deixou de ser usado
+RETIRED_NAME = '.retirados.json'
+
+_EXTENSIONS = {mime: extension for extension, mime in vra_charts.MIME_TYPES.items()}
+
+
+def assets_dir_for(html_path):
+    """Diretório dos arquivos auxiliares de um dashboard (ao lado do HTML)"""
+    stem = os.path.splitext(os.path.basename(html_path))[0]
+    return os.path.join(os.path.dirname(html_path), f"{stem}_assets")
+
+
+def plot_to_base64(image, mime='image/png'):
+    """Converte uma imagem renderizada em data URI para embutir no HTML"""
+    image_base64 = base64.b64encode(image).decode()
+    return f"data:{mime};base64,{image_base64}"
+
+
+def write_hashed(content, directory, stem, extension):
+    """Grava o conteúdo com o hash no nome (cache eterno no navegador/servidor)
+
+    Retorna o nome do arquivo, relativo ao diretório.
+    """
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    name = f"{stem}.{digest}.{extension}"
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    return name
+
+
+def remove_unreferenced(directory, keep, grace_seconds=ASSET_GRACE_SECONDS, now=None):
+    """Apaga os assets que o HTML não usa há mais de `grace_seconds`
+
+    Quando um arquivo sai de `keep`, o momento fica registrado em RETIRED_NAME;
+    ele só é apagado depois do prazo, para que páginas antigas em cache não
+    fiquem sem as imagens. Um arquivo que volta a ser usado sai do registro.
+    """
+    if not os.path.isdir(directory):
+        return
+    now = time.time() if now is None else now
+    retired_path = os.path.join(directory, RETIRED_NAME)
+    try:
+        with open(retired_path, 'r', encoding='utf-8') as f:
+            retired = json.load(f)
+    except (OSError, ValueError):
+        retired = {}
+
+    current = {}
+    for name in os.listdir(directory):
+        if name == RETIRED_NAME or name in keep:
+            continue
+        since = retired.get(name, now)
+        if now - since >= grace_seconds:
+            os.remove(os.path.join(directory, name))
+        else:
+            current[name] = since
+
+    tmp_path = retired_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(current, f, indent=2)
+    os.replace(tmp_path, retired_path)
+
+
+def chart_block(title, body):
+    return f"""
+        <div class="chart-container">
+            <div class="chart-title">{title}</div>
+            {body}
+        </div>
+        """
+
+
+def _cell(value):
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f"{value:.2f}%"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return html.escape(str(value))
+
+
+def table_blocks(tables):
+    """Blocos HTML com as tabelas (título, cabeçalhos, linhas), iguais em todos os modos"""
+    blocks = []
+    for title, headers, rows in tables:
+        head = ''.join(f'<th>{html.escape(header)}</th>' for header in headers)
+        body = ''.join('<tr>' + ''.join(f'<td>{_cell(value)}</td>' for value in row) + '</tr>' for row in rows)
+        blocks.append(chart_block(title, f'<table class="data-table"><thead><tr>{head}</tr></thead>'
+                                         f'<tbody>{body}</tbody></table>'))
+    return blocks
+
+
+def inline_chart_blocks(charts):
+    """Blocos HTML com as imagens embutidas em base64"""
+    return [chart_block(title, f'<img src="{plot_to_base64(image, mime)}" alt="{title}" class="chart-image">')
+            for title, image, mime in charts]
+
+
+def file_chart_blocks(charts, html_path):
+    """Grava cada imagem em um arquivo com hash no nome e devolve os blocos HTML"""
+    directory = assets_dir_for(html_path)
+    prefix = os.path.basename(directory)
+    blocks, written = [], set()
+    for index, (title, image, mime) in enumerate(charts, start=1):
+        name = write_hashed(image, directory, f"grafico{index}", _EXTENSIONS[mime])
+        written.add(name)
+        blocks.append(chart_block(
+            title, f'<img src="{prefix}/{name}" alt="{title}" class="chart-image" loading="lazy">'))
+    remove_unreferenced(directory, written)
+    return blocks
+
+
+def json_chart_blocks(aggregates, html_path, summary):
+    """Grava os agregados em JSON e a biblioteca JS; devolve (blocos HTML, scripts)"""
+    directory = assets_dir_for(html_path)
+    prefix = os.path.basename(directory)
+    charts = vra_charts.client_charts(aggregates)
+    data = {
+        'summary': summary,
+        'charts': {chart_id: spec for chart_id, title, spec in charts},
+    }
+    content = json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+    data_name = write_hashed(content, directory, 'dados', 'json')
+    with open(CLIENT_LIBRARY, 'rb') as f:
+        library_name = write_hashed(f.read(), directory, 'vra_graficos', 'js')
+    remove_unreferenced(directory, {data_name, library_name})
+
+    blocks = [chart_block(title, f'<div class="chart-canvas" data-chart="{chart_id}"></div>')
+              for chart_id, title, spec in charts]
+    scripts = f"""
+    <script src="{prefix}/{library_name}"></script>
+    <script>VraGraficos.load("{prefix}/{data_name}");</script>
+    """
+    return blocks, scripts
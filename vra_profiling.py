@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import threading
+import cProfile
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Instrumentação por etapa (tempo, linhas/s e memória). Fica desligada até
+# enable() ser chamado; desligada, stage() não mede nada e quase não custa.
+
+_profiler = None
+
+
+def _current_rss_mb():
+    """Memória residente atual (MB), ou None se não der para medir"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_mb():
+    """Maior pico de memória residente (MB): o deste processo ou o do maior worker já encerrado
+
+    RUSAGE_CHILDREN guarda o pico do maior filho, não a soma dos filhos; por
+    isso o valor não é o total simultâneo, só o maior processo individual
+    (como em benchmarks/run_benchmarks.py).
+    """
+    if resource is None:
+        return None
+    return max(_max_rss_mb(resource.RUSAGE_SELF), _max_rss_mb(resource.RUSAGE_CHILDREN))
+
+
+def _max_rss_mb(who):
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+class Profiler:
+    """Registra as etapas de uma execução; etapas com o mesmo nome são somadas"""
+
+    def __init__(self, sample_interval=0.01):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._sample_interval = sample_interval
+        self._open_peaks = {}
+        self._sampler = None
+        if _current_rss_mb() is not None:
+            self._stop = threading.Event()
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+
+    def _sample(self):
+        # Amostra o RSS para saber o pico de cada etapa em andamento
+        while not self._stop.wait(self._sample_interval):
+            rss = _current_rss_mb()
+            with self._lock:
+                for peak in self._open_peaks.values():
+                    peak[0] = max(peak[0], rss)
+
+    def record(self, name, wall, rows=None, peak_rss_mb=None, calls=1, **extra):
+        """Soma uma medição (ou `calls` medições já somadas) à etapa `name`"""
+        with self._lock:
+            stage = self.stages.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'rows': None, 'peak_rss_mb': None})
+            stage['calls'] += calls
+            stage['wall_s'] += wall
+            if rows is not None:
+                stage['rows'] = (stage['rows'] or 0) + rows
+            if peak_rss_mb is not None:
+                stage['peak_rss_mb'] = max(stage['peak_rss_mb'] or 0, peak_rss_mb)
+            for key, value in extra.items():
+                stage[key] = stage.get(key, 0) + value
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        info = {'rows': rows}
+        peak = [_current_rss_mb() or 0]
+        with self._lock:
+            # Chave por identidade: etapas aninhadas podem ter o mesmo pico
+            self._open_peaks[id(peak)] = peak
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            wall = time.perf_counter() - start
+            with self._lock:
+                del self._open_peaks[id(peak)]
+            peak[0] = max(peak[0], _current_rss_mb() or 0)
+            extra = {key: value for key, value in info.items() if key != 'rows'}
+            self.record(name, wall, info['rows'], peak[0] or None, **extra)
+
+    def report(self):
+        """Relatório em dicionário, pronto para JSON"""
+        stages = {}
+        with self._lock:
+            for name, stage in self.stages.items():
+                stage = dict(stage)
+                stage['wall_s'] = round(stage['wall_s'], 6)
+                if stage['rows'] is not None and stage['wall_s'] > 0:
+                    stage['rows_per_s'] = round(stage['rows'] / stage['wall_s'], 1)
+                if stage.get('bytes') is not None and stage['wall_s'] > 0:
+                    stage['bytes_per_s'] = round(stage['bytes'] / stage['wall_s'], 1)
+                if stage['peak_rss_mb'] is not None:
+                    stage['peak_rss_mb'] = round(stage['peak_rss_mb'], 1)
+                stages[name] = stage
+        return {
+            'total_wall_s': round(time.perf_counter() - self.started, 6),
+            'peak_rss_mb': _max_rss_mb(resource.RUSAGE_SELF) if resource else None,
+            'children_peak_rss_mb': _max_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+            'stages': stages,
+        }
+
+    def close(self):
+        if self._sampler:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+
+
+def enable():
+    """Liga a instrumentação para o processo atual"""
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+
+def enabled():
+    return _profiler is not None
+
+
+@contextmanager
+def stage(name, rows=None):
+    """Mede uma etapa; o dicionário devolvido aceita 'rows' e contadores extras"""
+    if _profiler is None:
+        yield {'rows': rows}
+        return
+    with _profiler.stage(name, rows) as info:
+        yield info
+
+
+def record(name, wall, rows=None, **extra):
+    """Registra uma medição feita fora deste processo (por exemplo, em um worker)"""
+    if _profiler is not None:
+        _profiler.record(name, wall, rows, **extra)
+
+
+def merge(stages):
+    """Soma ao relatório as etapas medidas em outro processo (veja collect)"""
+    for name, stage in stages.items():
+        stage = dict(stage)
+        record(name, stage.pop('wall_s'), stage.pop('rows'), **stage)
+
+
+@contextmanager
+def collect(active=True):
+    """Mede as etapas de uma tarefa de um worker à parte
+
+    O dicionário devolvido recebe, no fim do bloco, as etapas medidas dentro
+    dele, para o processo pai somá-las com merge(). Com active=False (o pai
+    não está medindo) nada é medido e o dicionário fica vazio.
+    """
+    global _profiler
+    stages = {}
+    if not active:
+        yield stages
+        return
+    # Um worker criado por fork herda o Profiler do pai; as etapas dele não voltariam
+    previous, _profiler = _profiler, Profiler()
+    try:
+        yield stages
+    finally:
+        _profiler.close()
+        stages.update(_profiler.stages)
+        _profiler = previous
+
+
+def write_report(path):
+    """Grava o relatório JSON da instrumentação"""
+    if _profiler is None:
+        return
+    _profiler.close()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(_profiler.report(), f, indent=2, ensure_ascii=False)
+    print(f"⏱ Relatório de desempenho salvo em: {path}")
+
+
+@contextmanager
+def profiled(report_path=None, cprofile_path=None):
+    """Executa o bloco com instrumentação e/ou cProfile, gravando os relatórios no fim"""
+    if report_path:
+        enable()
+    profile = cProfile.Profile() if cprofile_path else None
+    if profile:
+        profile.enable()
+    try:
+        yield
+    finally:
+        if profile:
+            profile.disable()
+            profile.dump_stats(cprofile_path)
+            print(f"⏱ Perfil do cProfile salvo em: {cprofile_path} (veja com: python -m pstats {cprofile_path})")
+        if report_path:
+            write_report(report_path)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+# Contagens por rota (origem -> destino) e por empresa x rota. São dezenas de
+# milhares de combinações, então as chaves são montadas a partir dos códigos
+# inteiros das colunas categóricas e só as combinações presentes viram saída.
+# O resultado é uma Series comum, somável como os demais agregados
+# (vra_aggregates), com chaves em texto no formato 'SBGR|SBRJ'.
+
+KEY_SEP = '|'
+
+# Grupo -> colunas que formam a chave
+ROUTE_GROUPS = {
+    'route': ['Sigla ICAO Aeroporto Origem', 'Sigla ICAO Aeroporto Destino'],
+    'airline_route': ['Empresa Aérea', 'Sigla ICAO Aeroporto Origem', 'Sigla ICAO Aeroporto Destino'],
+}
+
+# Rotas com poucos voos distorcem o ranking por taxa (1 voo, 1 cancelamento = 100%)
+MIN_FLIGHTS_FOR_RATE = 100
+
+# Até este número de combinações possíveis a contagem usa um vetor denso (bincount)
+_DENSE_LIMIT = 1 << 22
+
+
+def _codes(series):
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    return series.cat.codes.to_numpy(), series.cat.categories
+
+
+def grouped_counts(df, columns):
+    """Número de linhas por combinação dos valores de `columns` (só as presentes)"""
+    if len(df) == 0 or any(column not in df.columns for column in columns):
+        return pd.Series(dtype='int64')
+
+    codes, categories = zip(*(_codes(df[column]) for column in columns))
+    valid = np.logical_and.reduce([code >= 0 for code in codes])
+    codes = [code[valid].astype('int64') for code in codes]
+    sizes = tuple(max(len(category), 1) for category in categories)
+    if not valid.any():
+        return pd.Series(dtype='int64')
+
+    keys = np.ravel_multi_index(codes, sizes)
+    if np.prod(sizes, dtype='float64') <= _DENSE_LIMIT:
+        counts = np.bincount(keys, minlength=int(np.prod(sizes)))
+        keys = np.flatnonzero(counts)
+        counts = counts[keys]
+    else:
+        keys, counts = np.unique(keys, return_counts=True)
+
+    parts = [np.asarray(category, dtype=object)[position].astype(str)
+             for category, position in zip(categories, np.unravel_index(keys, sizes))]
+    labels = parts[0]
+    for part in parts[1:]:
+        labels = np.char.add(np.char.add(labels, KEY_SEP), part)
+    return pd.Series(counts.astype('int64'), index=pd.Index(labels.astype(object))).sort_index()
+
+
+def split_key(key):
+    """'EMPRESA|SBGR|SBRJ' -> ['EMPRESA', 'SBGR', 'SBRJ']"""
+    return str(key).split(KEY_SEP)
+
+
+def route_label(key):
+    """Chave de rota como aparece no dashboard: 'SBGR → SBRJ'"""
+    return ' → '.join(split_key(key))
@@ -0,0 +1,218 @@
+import pandas as pd
+import threading
+import importlib.util
+import vra_dates
+import vra_format
+
+# Esquema declarado dos CSVs do VRA: toda leitura dos arquivos passa por aqui,
+# para que só as colunas usadas sejam carregadas e já com tipos compactos.
+
+# Colunas lidas dos CSVs (as demais são descartadas já na leitura)
+USECOLS = [
+    'Empresa Aérea',
+    'Número Voo',  # só para os sketches da prévia (vra_sketches), que saem do cache colunar
+    'Código Tipo Linha',
+    'Sigla ICAO Aeroporto Origem',
+    'Descrição Aeroporto Origem',
+    'Sigla ICAO Aeroporto Destino',
+    'Partida Prevista',
+    'Partida Real',
+    'Chegada Prevista',
+    'Chegada Real',
+    'Situação Voo',
+    'Referência',
+]
+
+# Colunas sem as quais os agregados do dashboard não saem (vra_aggregates.aggregate_frame).
+# As demais podem faltar: sem Referência vale o dia da partida prevista, e
+# rotas e atrasos ficam de fora sem o destino ou os horários reais.
+REQUIRED_COLUMNS = [
+    'Empresa Aérea',
+    'Código Tipo Linha',
+    'Sigla ICAO Aeroporto Origem',
+    'Descrição Aeroporto Origem',
+    'Partida Prevista',
+    'Situação Voo',
+]
+
+# Colunas de texto com poucos valores distintos, lidas direto como categorias
+CATEGORY_COLUMNS = [
+    'Empresa Aérea',
+    'Número Voo',
+    'Código Tipo Linha',
+    'Sigla ICAO Aeroporto Origem',
+    'Descrição Aeroporto Origem',
+    'Sigla ICAO Aeroporto Destino',
+    'Situação Voo',
+]
+
+# Colunas de data/hora e os formatos aceitos, do mais comum ao mais raro
+# (os arquivos da ANAC mudaram de formato ao longo dos anos)
+DATE_FORMATS = {
+    'Referência': ['%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S'],
+    'Partida Prevista': ['%d/%m/%Y %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%d/%m/%Y %H:%M:%S'],
+    'Partida Real': ['%d/%m/%Y %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%d/%m/%Y %H:%M:%S'],
+    'Chegada Prevista': ['%d/%m/%Y %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%d/%m/%Y %H:%M:%S'],
+    'Chegada Real': ['%d/%m/%Y %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%d/%m/%Y %H:%M:%S'],
+}
+
+# Colunas inteiras derivadas das datas na ingestão: nome -> (atributo, dtype).
+# Datas inválidas ficam com vra_dates.MISSING (-1).
+DERIVED_COLUMNS = {
+    'Referência': {
+        'Ano': ('year', 'int16'),
+        'Mês': ('month', 'int8'),
+        'Dia_Semana': ('dayofweek', 'int8'),  # 0 = segunda ... 6 = domingo
+    },
+    'Partida Prevista': {
+        'Hora_Partida': ('hour', 'int8'),
+    },
+}
+
+# Datas também são lidas como categorias: cada valor distinto é convertido uma vez só
+DICTIONARY_COLUMNS = CATEGORY_COLUMNS + list(DATE_FORMATS)
+
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+def read_vra_csv(path, use_threads=True, file_format=None, stats=None):
+    """Lê um CSV do VRA aplicando o esquema (colunas, categorias e datas)
+
+    `file_format` é o formato do arquivo (vra_format.detect_format), detectado
+    aqui se não vier pronto. Com o pyarrow, linhas com o número errado de
+    campos são descartadas e somadas em stats['bad_lines']; o pandas não as
+    identifica quando lê só algumas colunas, e aí a contagem fica de fora.
+    """
+    file_format = file_format or vra_format.detect_format(path)
+    columns = vra_format.source_columns(file_format, USECOLS)
+    if HAS_PYARROW:
+        df = _read_csv_pyarrow(path, use_threads, file_format, columns, stats)
+    else:
+        df = pd.read_csv(path, **_pandas_options(file_format, columns))
+    return apply_schema(df.rename(columns=columns))
+
+
+def iter_vra_csv(path, chunksize=500_000, use_threads=True, file_format=None, stats=None):
+    """Lê um CSV do VRA em pedaços de ~chunksize linhas, já no esquema"""
+    file_format = file_format or vra_format.detect_format(path)
+    columns = vra_format.source_columns(file_format, USECOLS)
+    if HAS_PYARROW:
+        from pyarrow import csv as pa_csv
+
+        # O bloco em bytes é aproximado a partir do tamanho típico de uma linha
+        read_options, parse_options, convert_options = _pyarrow_options(
+            file_format, columns, use_threads, stats, block_size=max(1 << 20, chunksize * 256))
+        reader = pa_csv.open_csv(path, read_options=read_options,
+                                 parse_options=parse_options, convert_options=convert_options)
+        for batch in reader:
+            yield apply_schema(batch.to_pandas().rename(columns=columns))
+        return
+
+    reader = pd.read_csv(path, chunksize=chunksize, **_pandas_options(file_format, columns))
+    with reader:
+        for chunk in reader:
+            yield apply_schema(chunk.rename(columns=columns))
+
+
+def read_vra_columns(path, wanted, use_threads=True, file_format=None):
+    """Leitura leve: só as colunas em `wanted` (nomes canônicos), todas como categorias
+
+    Nada é convertido (nem as datas); serve para quem só conta valores, como os
+    sketches da prévia (vra_sketches). Colunas ausentes no arquivo ficam de fora.
+    """
+    file_format = file_format or vra_format.detect_format(path)
+    columns = vra_format.source_columns(file_format, wanted)
+    dictionary_columns = set(columns.values())
+    if HAS_PYARROW:
+        df = _read_csv_pyarrow(path, use_threads, file_format, columns, dictionary_columns=dictionary_columns)
+    else:
+        df = pd.read_csv(path, **_pandas_options(file_format, columns, dictionary_columns))
+    return df.rename(columns=columns)
+
+
+def _pandas_options(file_format, columns, dictionary_columns=DICTIONARY_COLUMNS):
+    """Parâmetros do pd.read_csv para o formato detectado, só com as colunas do esquema"""
+    return {
+        'sep': file_format['delimiter'],
+        'encoding': file_format['encoding'],
+        'skiprows': file_format['skip_rows'],
+        'usecols': lambda column: column in columns,
+        'dtype': {column: 'category' if name in dictionary_columns else str for column, name in columns.items()},
+    }
+
+
+def _skip_invalid_rows(stats):
+    """invalid_row_handler do pyarrow: descarta a linha e conta em stats['bad_lines']"""
+    lock = threading.Lock()
+    if stats is not None:
+        stats.setdefault('bad_lines', 0)
+
+    def handler(row):
+        if stats is not None:
+            with lock:
+                stats['bad_lines'] = stats.get('bad_lines', 0) + 1
+        return 'skip'
+    return handler
+
+
+def _pyarrow_options(file_format, columns, use_threads, stats=None, block_size=None,
+                     dictionary_columns=DICTIONARY_COLUMNS):
+    """Opções do leitor do pyarrow para o formato detectado, só com as colunas do esquema"""
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    column_types = {
+        column: pa.dictionary(pa.int32(), pa.string()) if name in dictionary_columns else pa.string()
+        for column, name in columns.items()
+    }
+    read_options = pa_csv.ReadOptions(use_threads=use_threads, skip_rows=file_format['skip_rows'],
+                                      encoding=vra_format.arrow_encoding(file_format['encoding']))
+    if block_size:
+        read_options.block_size = block_size
+    parse_options = pa_csv.ParseOptions(delimiter=file_format['delimiter'],
+                                        invalid_row_handler=_skip_invalid_rows(stats))
+    convert_options = pa_csv.ConvertOptions(
+        include_columns=list(columns),
+        column_types=column_types,
+        strings_can_be_null=True,
+    )
+    return read_options, parse_options, convert_options
+
+
+def _read_csv_pyarrow(path, use_threads, file_format, columns, stats=None, dictionary_columns=DICTIONARY_COLUMNS):
+    """Lê o CSV com o leitor multithread do pyarrow, só com as colunas do esquema"""
+    from pyarrow import csv as pa_csv
+
+    read_options, parse_options, convert_options = _pyarrow_options(
+        file_format, columns, use_threads, stats, dictionary_columns=dictionary_columns)
+    table = pa_csv.read_csv(path, read_options=read_options,
+                            parse_options=parse_options, convert_options=convert_options)
+    return table.to_pandas()
+
+
+def apply_schema(df):
+    """Garante os tipos do esquema: categorias, datas convertidas e colunas derivadas"""
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    for column, formats in DATE_FORMATS.items():
+        if column not in df.columns:
+            continue
+        features = DERIVED_COLUMNS.get(column, {})
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            missing = {name: spec for name, spec in features.items() if name not in df.columns}
+            if missing:
+                for name, values in vra_dates.date_features_from_datetimes(df[column], missing).items():
+                    df[name] = values
+            continue
+        dates, codes, parsed_uniques = vra_dates.parse_dates(df[column], formats)
+        df[column] = dates
+        for name, values in vra_dates.date_features(codes, parsed_uniques, features).items():
+            df[name] = values
+    if 'Referência' not in df.columns and 'Partida Prevista' in df.columns:
+        # Layouts antigos sem a data de referência: vale o dia da partida prevista
+        df['Referência'] = df['Partida Prevista'].dt.normalize()
+        for name, values in vra_dates.date_features_from_datetimes(
+                df['Referência'], DERIVED_COLUMNS['Referência']).items():
+            df[name] = values
+    return df
@@ -0,0 +1,422 @@
+import os
+import json
+import math
+import hashlib
+import numpy as np
+import pandas as pd
+import vra_dates
+import vra_format
+import vra_schema
+import vra_cache
+import vra_aggregates
+import vra_routes
+
+# Resumos aproximados (sketches) de cada CSV para a prévia rápida do
+# dashboard. Todos têm tamanho fixo e são somáveis entre arquivos:
+#   - Count-Min: voos e cancelamentos por empresa e por aeroporto de origem;
+#   - Misra-Gries: candidatas a maiores canceladoras (heavy hitters);
+#   - HyperLogLog: rotas distintas e voos (empresa + número) distintos.
+# Ficam ao lado de cada CSV (VRA_2024_01.csv.sketch.npz) e são montados a
+# partir do cache colunar (vra_cache), quando o CSV já foi convertido, ou com
+# uma leitura leve do CSV, só das colunas de contagem e sem converter horários.
+
+SKETCH_VERSION = 1
+SKETCH_SUFFIX = '.sketch.npz'
+
+# Count-Min: estimativa <= real + (e / largura) * N com probabilidade 1 - e^-profundidade
+CMS_WIDTH = 2048
+CMS_DEPTH = 5
+# Misra-Gries: até K chaves; a contagem guardada fica até (N - soma) / (K + 1) abaixo da real
+HEAVY_HITTERS_K = 64
+# HyperLogLog com 2^14 registradores: erro padrão relativo de 1,04 / 128 ~ 0,8%
+HLL_PRECISION = 14
+
+# Papel -> coluna lida no modo leve
+SKETCH_COLUMNS = {
+    'airline': 'Empresa Aérea',
+    'flight_number': 'Número Voo',
+    'origin': 'Sigla ICAO Aeroporto Origem',
+    'destination': 'Sigla ICAO Aeroporto Destino',
+    'status': 'Situação Voo',
+}
+
+# Prefixo das chaves nas tabelas Count-Min (uma tabela serve às duas dimensões)
+DIMENSION_PREFIXES = {'airline': 'empresa:', 'origin': 'origem:'}
+
+
+def _hash64(keys):
+    """Hash estável de 64 bits (blake2b) de cada chave; iguais em qualquer processo"""
+    return np.array([int.from_bytes(hashlib.blake2b(str(key).encode('utf-8'), digest_size=8).digest(), 'little')
+                     for key in keys], dtype=np.uint64)
+
+
+class CountMinSketch:
+    """Contagens aproximadas por chave; nunca subestima"""
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH, table=None):
+        self.table = table if table is not None else np.zeros((depth, width), dtype=np.int64)
+
+    def _columns(self, keys):
+        # Kirsch-Mitzenmacher: as linhas usam h1 + i*h2 a partir de um único hash
+        hashes = _hash64(keys)
+        h1, h2 = hashes & np.uint64(0xFFFFFFFF), (hashes >> np.uint64(32)) | np.uint64(1)
+        width = np.uint64(self.table.shape[1])
+        return [((h1 + np.uint64(row) * h2) % width).astype(np.int64) for row in range(self.table.shape[0])]
+
+    def add(self, keys, counts):
+        counts = np.asarray(counts, dtype=np.int64)
+        for row, columns in enumerate(self._columns(keys)):
+            np.add.at(self.table[row], columns, counts)
+
+    def estimate(self, keys):
+        if len(keys) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.min([self.table[row][columns] for row, columns in enumerate(self._columns(keys))], axis=0)
+
+    def total(self):
+        return int(self.table[0].sum())
+
+    def error_bound(self, total=None):
+        """Excesso máximo da estimativa (com probabilidade confidence())"""
+        return math.e / self.table.shape[1] * (self.total() if total is None else total)
+
+    def confidence(self):
+        return 1 - math.exp(-self.table.shape[0])
+
+    def merge(self, other):
+        if self.table.shape != other.table.shape:
+            raise ValueError("Count-Min com dimensões diferentes")
+        return CountMinSketch(table=self.table + other.table)
+
+
+class HeavyHitters:
+    """Resumo de Misra-Gries das chaves mais frequentes"""
+
+    def __init__(self, k=HEAVY_HITTERS_K, counters=None, total=0):
+        self.k = k
+        self.counters = dict(counters or {})
+        self.total = total
+        self._reduce()
+
+    def _reduce(self):
+        # Com mais de k chaves, desconta a (k+1)-ésima contagem de todas e descarta as zeradas
+        if len(self.counters) <= self.k:
+            return
+        cut = sorted(self.counters.values(), reverse=True)[self.k]
+        self.counters = {key: count - cut for key, count in self.counters.items() if count > cut}
+
+    def add(self, keys, counts):
+        exact = HeavyHitters(len(keys) or 1, dict(zip(keys, (int(count) for count in counts))),
+                             int(np.sum(counts)))
+        merged = self.merge(exact)
+        self.counters, self.total = merged.counters, merged.total
+
+    def merge(self, other):
+        counters = dict(self.counters)
+        for key, count in other.counters.items():
+            counters[key] = counters.get(key, 0) + count
+        return HeavyHitters(min(self.k, other.k), counters, self.total + other.total)
+
+    def error_bound(self):
+        """Quanto a contagem guardada de uma chave pode estar abaixo da real"""
+        return (self.total - sum(self.counters.values())) / (self.k + 1)
+
+    def candidates(self, n):
+        return sorted(self.counters, key=lambda key: (-self.counters[key], key))[:n]
+
+
+class HyperLogLog:
+    """Número aproximado de chaves distintas"""
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def precision(self):
+        return int(self.registers.size).bit_length() - 1
+
+    def add(self, keys):
+        if len(keys) == 0:
+            return
+        p = self.precision
+        hashes = _hash64(keys)
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - p)) - 1)
+        # Posição do primeiro bit 1 nos 64 - p bits restantes (frexp é exato até 2^53)
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = (64 - p - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def estimate(self):
+        m = self.registers.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Poucos valores: contagem linear pelos registradores vazios
+            estimate = m * math.log(m / zeros)
+        return estimate
+
+    def relative_error(self):
+        """Erro padrão relativo (1 sigma)"""
+        return 1.04 / math.sqrt(self.registers.size)
+
+    def merge(self, other):
+        if self.registers.size != other.registers.size:
+            raise ValueError("HyperLogLog com precisões diferentes")
+        return HyperLogLog(registers=np.maximum(self.registers, other.registers))
+
+
+def empty_sketches():
+    return {
+        'files': 0,
+        'total_flights': 0,
+        'total_cancelled': 0,
+        'first_date': None,
+        'last_date': None,
+        'flights': CountMinSketch(),
+        'cancelled': CountMinSketch(),
+        'top_airlines': HeavyHitters(),
+        'top_origins': HeavyHitters(),
+        'routes': HyperLogLog(),
+        'flight_numbers': HyperLogLog(),
+    }
+
+
+def _cancelled_mask(df):
+    status = SKETCH_COLUMNS['status']
+    if status not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return (df[status] == vra_aggregates.CANCELLED_STATUS).to_numpy()
+
+
+def _nonzero_counts(values, mask=None):
+    counts = (values[mask] if mask is not None else values).value_counts()
+    return counts[counts > 0]
+
+
+def _date_range(df):
+    """Primeira e última data do arquivo (as datas distintas são convertidas uma vez só)"""
+    column = 'Referência' if 'Referência' in df.columns else 'Partida Prevista'
+    if column not in df.columns:
+        return None, None
+    if pd.api.types.is_datetime64_any_dtype(df[column]):
+        # Do cache colunar as datas já vêm convertidas
+        dates = df[column].dropna()
+        return (dates.min().normalize(), dates.max().normalize()) if len(dates) else (None, None)
+    _, _, parsed_uniques = vra_dates.parse_dates(df[column], vra_schema.DATE_FORMATS[column])
+    parsed = pd.Series(parsed_uniques).dropna()
+    if parsed.empty:
+        return None, None
+    return parsed.min().normalize(), parsed.max().normalize()
+
+
+def build_sketches(path, file_format=None, use_threads=True, cache_dir=None):
+    """Sketches de um CSV
+
+    Com `cache_dir`, as colunas vêm do cache colunar do CSV se ele estiver em
+    dia (o pipeline converte os arquivos novos antes), sem ler o CSV de novo;
+    senão, da leitura leve (vra_schema.read_vra_columns).
+    """
+    columns = list(SKETCH_COLUMNS.values())
+    df = vra_cache.read_cached_columns(path, columns + ['Referência'], cache_dir) if cache_dir else None
+    if df is None:
+        if file_format is None:
+            file_format = vra_cache.cached_format(path, cache_dir) if cache_dir else vra_format.detect_format(path)
+        date_column = 'Referência' if 'Referência' in file_format['columns'] else 'Partida Prevista'
+        df = vra_schema.read_vra_columns(path, columns + [date_column], use_threads, file_format)
+    return sketches_from_frame(df)
+
+
+def sketches_from_frame(df):
+    """Sketches de um DataFrame com as colunas de SKETCH_COLUMNS (as ausentes ficam de fora)"""
+    sketches = empty_sketches()
+    sketches['files'] = 1
+    sketches['total_flights'] = len(df)
+    cancelled = _cancelled_mask(df)
+    sketches['total_cancelled'] = int(cancelled.sum())
+    sketches['first_date'], sketches['last_date'] = _date_range(df)
+
+    for dimension, prefix in DIMENSION_PREFIXES.items():
+        column = SKETCH_COLUMNS[dimension]
+        if column not in df.columns:
+            continue
+        flights = _nonzero_counts(df[column])
+        sketches['flights'].add([prefix + str(key) for key in flights.index], flights.to_numpy())
+        cancelled_counts = _nonzero_counts(df[column], cancelled)
+        sketches['cancelled'].add([prefix + str(key) for key in cancelled_counts.index], cancelled_counts.to_numpy())
+        top = 'top_airlines' if dimension == 'airline' else 'top_origins'
+        sketches[top].add([str(key) for key in cancelled_counts.index], cancelled_counts.to_numpy())
+
+    sketches['routes'].add(list(vra_routes.grouped_counts(
+        df, [SKETCH_COLUMNS['origin'], SKETCH_COLUMNS['destination']]).index))
+    sketches['flight_numbers'].add(list(vra_routes.grouped_counts(
+        df, [SKETCH_COLUMNS['airline'], SKETCH_COLUMNS['flight_number']]).index))
+    return sketches
+
+
+def merge_sketches(a, b):
+    def pick(x, y, choose):
+        values = [value for value in (x, y) if value is not None]
+        return choose(values) if values else None
+
+    return {
+        'files': a['files'] + b['files'],
+        'total_flights': a['total_flights'] + b['total_flights'],
+        'total_cancelled': a['total_cancelled'] + b['total_cancelled'],
+        'first_date': pick(a['first_date'], b['first_date'], min),
+        'last_date': pick(a['last_date'], b['last_date'], max),
+        **{key: a[key].merge(b[key]) for key in ('flights', 'cancelled', 'top_airlines', 'top_origins',
+                                                 'routes', 'flight_numbers')},
+    }
+
+
+def merge_all(sketches):
+    merged = empty_sketches()
+    for sketch in sketches:
+        merged = merge_sketches(merged, sketch)
+    return merged
+
+
+def sketch_path(path):
+    """Os sketches ficam ao lado do CSV"""
+    return path + SKETCH_SUFFIX
+
+
+def _params():
+    return {'cms_width': CMS_WIDTH, 'cms_depth': CMS_DEPTH, 'heavy_hitters_k': HEAVY_HITTERS_K,
+            'hll_precision': HLL_PRECISION}
+
+
+def save_sketches(path, sketches):
+    """Grava os sketches do CSV em `path` + SKETCH_SUFFIX (npz, sem pickle)"""
+    stat = os.stat(path)
+    meta = {
+        'version': SKETCH_VERSION,
+        'params': _params(),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'total_flights': sketches['total_flights'],
+        'total_cancelled': sketches['total_cancelled'],
+        'first_date': sketches['first_date'].isoformat() if sketches['first_date'] is not None else None,
+        'last_date': sketches['last_date'].isoformat() if sketches['last_date'] is not None else None,
+        'heavy_hitters_totals': {key: sketches[key].total for key in ('top_airlines', 'top_origins')},
+    }
+    arrays = {
+        'meta': np.array(json.dumps(meta)),
+        'flights': sketches['flights'].table,
+        'cancelled': sketches['cancelled'].table,
+        'routes': sketches['routes'].registers,
+        'flight_numbers': sketches['flight_numbers'].registers,
+    }
+    for key in ('top_airlines', 'top_origins'):
+        counters = sketches[key].counters
+        arrays[f'{key}_keys'] = np.array(list(counters), dtype=str)
+        arrays[f'{key}_counts'] = np.array(list(counters.values()), dtype=np.int64)
+    target = sketch_path(path)
+    tmp_path = target + '.tmp.npz'
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, target)
+
+
+def prune_orphans(directory):
+    """Apaga os sketches (procurados nas subpastas) cujo CSV não existe mais; retorna os apagados"""
+    removed = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            if name.endswith(SKETCH_SUFFIX) and not os.path.exists(path[:-len(SKETCH_SUFFIX)]):
+                os.remove(path)
+                removed.append(path)
+    return removed
+
+
+def load_sketches(path):
+    """Sketches gravados do CSV, ou None se não existem, são de outra versão ou o CSV mudou"""
+    try:
+        with np.load(sketch_path(path), allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            stat = os.stat(path)
+            if (meta.get('version') != SKETCH_VERSION or meta.get('params') != _params()
+                    or meta['size'] != stat.st_size or meta['mtime_ns'] != stat.st_mtime_ns):
+                return None
+            sketches = {
+                'files': 1,
+                'total_flights': meta['total_flights'],
+                'total_cancelled': meta['total_cancelled'],
+                'first_date': pd.Timestamp(meta['first_date']) if meta['first_date'] else None,
+                'last_date': pd.Timestamp(meta['last_date']) if meta['last_date'] else None,
+                'flights': CountMinSketch(table=data['flights']),
+                'cancelled': CountMinSketch(table=data['cancelled']),
+                'routes': HyperLogLog(registers=data['routes']),
+                'flight_numbers': HyperLogLog(registers=data['flight_numbers']),
+            }
+            for key in ('top_airlines', 'top_origins'):
+                counters = dict(zip(data[f'{key}_keys'].tolist(), data[f'{key}_counts'].tolist()))
+                sketches[key] = HeavyHitters(HEAVY_HITTERS_K, counters, meta['heavy_hitters_totals'][key])
+            return sketches
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def top_estimates(sketches, dimension, n):
+    """Maiores canceladoras estimadas: [(chave, cancelamentos, mínimo, máximo, voos estimados)]
+
+    Os candidatos vêm do Misra-Gries; a estimativa é a do Count-Min, que nunca
+    fica abaixo da real. O intervalo junta as duas garantias: o Count-Min passa
+    do real no máximo error_bound() (com a confiança do sketch) e o Misra-Gries
+    fica abaixo no máximo error_bound() dele.
+    """
+    top = sketches['top_airlines' if dimension == 'airline' else 'top_origins']
+    keys = top.candidates(n)
+    prefix = DIMENSION_PREFIXES[dimension]
+    prefixed = [prefix + key for key in keys]
+    cancelled = sketches['cancelled'].estimate(prefixed)
+    flights = sketches['flights'].estimate(prefixed)
+    cms_error = sketches['cancelled'].error_bound()
+    mg_error = top.error_bound()
+    rows = []
+    for key, estimate, flight_estimate in zip(keys, cancelled, flights):
+        lower = max(top.counters[key], int(math.ceil(estimate - cms_error)))
+        upper = min(int(estimate), int(math.floor(top.counters[key] + mg_error)))
+        rows.append((key, int(estimate), lower, max(lower, upper), int(flight_estimate)))
+    rows.sort(key=lambda row: (-row[1], row[0]))
+    return rows
+
+
+def distinct_estimate(sketches, key):
+    """(estimativa, margem de ~95%) de chaves distintas: 'routes' ou 'flight_numbers'"""
+    hll = sketches[key]
+    estimate = hll.estimate()
+    return estimate, 2 * hll.relative_error() * estimate
+
+
+def exact_counts(path, file_format=None, use_threads=True):
+    """Os mesmos números da prévia, exatos, para conferir os sketches (--exact)"""
+    file_format = file_format or vra_format.detect_format(path)
+    df = vra_schema.read_vra_columns(path, list(SKETCH_COLUMNS.values()), use_threads, file_format)
+    cancelled = _cancelled_mask(df)
+    result = {'total_flights': len(df), 'total_cancelled': int(cancelled.sum())}
+    for dimension in DIMENSION_PREFIXES:
+        column = SKETCH_COLUMNS[dimension]
+        present = column in df.columns
+        result[f'flights_by_{dimension}'] = _nonzero_counts(df[column]) if present else pd.Series(dtype='int64')
+        result[f'cancelled_by_{dimension}'] = _nonzero_counts(df[column], cancelled) if present else \
+            pd.Series(dtype='int64')
+    result['routes'] = set(vra_routes.grouped_counts(
+        df, [SKETCH_COLUMNS['origin'], SKETCH_COLUMNS['destination']]).index)
+    result['flight_numbers'] = set(vra_routes.grouped_counts(
+        df, [SKETCH_COLUMNS['airline'], SKETCH_COLUMNS['flight_number']]).index)
+    return result
+
+
+def merge_exact(a, b):
+    merged = {'total_flights': a['total_flights'] + b['total_flights'],
+              'total_cancelled': a['total_cancelled'] + b['total_cancelled'],
+              'routes': a['routes'] | b['routes'],
+              'flight_numbers': a['flight_numbers'] | b['flight_numbers']}
+    for dimension in DIMENSION_PREFIXES:
+        for measure in ('flights', 'cancelled'):
+            key = f'{measure}_by_{dimension}'
+            merged[key] = a[key].add(b[key], fill_value=0).astype('int64')
+    return merged
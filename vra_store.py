@@ -0,0 +1,255 @@
+import os
+import sqlite3
+import pandas as pd
+import vra_aggregates
+import vra_filters
+import vra_cache
+
+# Banco SQLite com os agregados parciais de cada arquivo de origem. Um mês
+# novo só precisa dos seus próprios parciais; o dashboard soma todos via SQL.
+STORE_PATH = os.path.join(vra_cache.CACHE_DIR, 'agregados.sqlite')
+
+# Aumente quando os agregados mudarem, para recalcular os parciais salvos
+STORE_VERSION = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    total_flights INTEGER NOT NULL,
+    total_cancelled INTEGER NOT NULL,
+    first_date TEXT,
+    last_date TEXT
+);
+CREATE TABLE IF NOT EXISTS counts (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    metric TEXT NOT NULL,
+    key NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (path, metric, key)
+);
+CREATE INDEX IF NOT EXISTS counts_metric ON counts(metric, key);
+CREATE TABLE IF NOT EXISTS cube (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    ano INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    empresa TEXT NOT NULL,
+    origem_icao TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    cancelados INTEGER NOT NULL,
+    PRIMARY KEY (path, ano, mes, empresa, origem_icao)
+);
+CREATE INDEX IF NOT EXISTS cube_periodo ON cube(ano, mes);
+CREATE INDEX IF NOT EXISTS cube_empresa ON cube(empresa, ano, mes);
+CREATE INDEX IF NOT EXISTS cube_origem ON cube(origem_icao, ano, mes);
+"""
+
+
+def open_store(path=STORE_PATH):
+    """Abre (e cria, se preciso) o banco de agregados"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(_SCHEMA)
+    row = conn.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+    if row is None or row[0] != STORE_VERSION:
+        # Parciais de uma versão anterior não são compatíveis: recalcula tudo
+        with conn:
+            conn.execute("DELETE FROM files")
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('version', ?)", (STORE_VERSION,))
+    return conn
+
+
+def _source_key(path):
+    # Caminho absoluto, como no vra_cache: a chave não depende do diretório de onde se roda
+    return os.path.abspath(path)
+
+
+def stale_files(conn, csv_files):
+    """Arquivos sem parciais salvos ou que mudaram desde o último cálculo"""
+    stale = []
+    for file in csv_files:
+        row = conn.execute("SELECT size, mtime_ns, sha256 FROM files WHERE path = ?",
+                           (_source_key(file),)).fetchone()
+        stat = os.stat(file)
+        if row is None or row[0] != stat.st_size:
+            stale.append(file)
+        elif row[1] != stat.st_mtime_ns:
+            # Só o mtime mudou: o conteúdo decide se é preciso recalcular
+            if row[2] == vra_cache.file_sha256(file):
+                with conn:
+                    conn.execute("UPDATE files SET mtime_ns = ? WHERE path = ?",
+                                 (stat.st_mtime_ns, _source_key(file)))
+            else:
+                stale.append(file)
+    return stale
+
+
+def _under(path, roots):
+    path = os.path.abspath(path)
+    return any(path == root or path.startswith(root.rstrip(os.sep) + os.sep) for root in roots)
+
+
+def missing_files(conn, csv_files, sources=None):
+    """Arquivos com parciais salvos que foram removidos
+
+    São os que não existem mais no disco e os que estão dentro das fontes lidas
+    (`sources`, pastas ou arquivos) mas não apareceram em `csv_files`. Parciais
+    de outras fontes ficam: rodar com um --source mais restrito não apaga o resto.
+    """
+    current = {_source_key(file) for file in csv_files}
+    roots = [os.path.abspath(source) for source in sources or []]
+    return [path for (path,) in conn.execute("SELECT path FROM files")
+            if path not in current and (not os.path.exists(path) or _under(path, roots))]
+
+
+def retract_missing(conn, csv_files, sources=None):
+    """Remove os parciais de arquivos removidos (veja missing_files); retorna os removidos"""
+    removed = missing_files(conn, csv_files, sources)
+    with conn:
+        conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+    return removed
+
+
+def _plain(value):
+    # Tipos do numpy viram int/str do Python antes de ir para o SQLite
+    return value.item() if hasattr(value, 'item') else value
+
+
+def save_partial(conn, file, aggregates):
+    """Grava (substituindo) os agregados parciais de um arquivo"""
+    stat = os.stat(file)
+    key = _source_key(file)
+    first_date, last_date = aggregates['first_date'], aggregates['last_date']
+    with conn:
+        conn.execute("DELETE FROM files WHERE path = ?", (key,))
+        conn.execute(
+            "INSERT INTO files (path, size, mtime_ns, sha256, total_flights, total_cancelled, first_date, last_date) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, stat.st_size, stat.st_mtime_ns, vra_cache.file_sha256(file),
+             int(aggregates['total_flights']), int(aggregates['total_cancelled']),
+             first_date.isoformat() if first_date is not None else None,
+             last_date.isoformat() if last_date is not None else None),
+        )
+        conn.executemany(
+            "INSERT INTO counts (path, metric, key, value) VALUES (?, ?, ?, ?)",
+            [(key, metric, _plain(k), int(v))
+             for metric in vra_aggregates.COUNT_KEYS
+             for k, v in aggregates[metric].items()],
+        )
+        cube = aggregates.get(vra_aggregates.CUBE_KEY)
+        if cube is not None:
+            conn.executemany(
+                "INSERT INTO cube (path, ano, mes, empresa, origem_icao, total, cancelados) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(key, *(_plain(k) for k in keys), int(total), int(cancelled))
+                 for keys, total, cancelled in zip(cube.index, cube['total'], cube['cancelados'])],
+            )
+
+
+def file_totals(conn, file):
+    """Total de registros salvo para um arquivo (ou None)"""
+    row = conn.execute("SELECT total_flights FROM files WHERE path = ?", (_source_key(file),)).fetchone()
+    return row[0] if row else None
+
+
+def file_date_range(conn, file):
+    """Primeira e última data salvas para um arquivo que não mudou desde então, ou (None, None)"""
+    row = conn.execute("SELECT size, mtime_ns, first_date, last_date FROM files WHERE path = ?",
+                       (_source_key(file),)).fetchone()
+    stat = os.stat(file)
+    if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns or not row[2] or not row[3]:
+        return None, None
+    return pd.Timestamp(row[2]), pd.Timestamp(row[3])
+
+
+def merged_aggregates(conn, csv_files):
+    """Soma os parciais salvos dos arquivos informados"""
+    keys = [_source_key(file) for file in csv_files]
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS selected (path TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM selected")
+    conn.executemany("INSERT OR IGNORE INTO selected (path) VALUES (?)", [(key,) for key in keys])
+
+    aggregates = vra_aggregates.empty_aggregates()
+    row = conn.execute(
+        "SELECT COUNT(*), SUM(total_flights), SUM(total_cancelled), MIN(first_date), MAX(last_date) "
+        "FROM files JOIN selected USING (path)"
+    ).fetchone()
+    if not row[0]:
+        return None
+    aggregates['total_flights'] = row[1]
+    aggregates['total_cancelled'] = row[2]
+    aggregates['first_date'] = pd.Timestamp(row[3]) if row[3] else None
+    aggregates['last_date'] = pd.Timestamp(row[4]) if row[4] else None
+
+    rows = conn.execute(
+        "SELECT metric, key, SUM(value) FROM counts JOIN selected USING (path) "
+        "GROUP BY metric, key ORDER BY metric, key"
+    ).fetchall()
+    by_metric = {}
+    for metric, key, value in rows:
+        by_metric.setdefault(metric, ([], []))
+        by_metric[metric][0].append(key)
+        by_metric[metric][1].append(value)
+    for metric, (index, values) in by_metric.items():
+        if metric in vra_aggregates.COUNT_KEYS:
+            aggregates[metric] = pd.Series(values, index=pd.Index(index), dtype='int64')
+    return aggregates
+
+
+def distinct_values(conn, column):
+    """Valores gravados em uma dimensão do cubo ('empresa' ou 'origem_icao')"""
+    if column not in vra_aggregates.CUBE_DIMENSIONS:
+        raise ValueError(f"Dimensão desconhecida: {column}")
+    return [value for (value,) in conn.execute(f"SELECT DISTINCT {column} FROM cube")]
+
+
+def _matching_values(stored, values):
+    """Valores de `stored` iguais a algum de `values`, sem diferenciar maiúsculas
+    (como vra_filters); a consulta segue com os valores exatos e usa os índices"""
+    wanted = {vra_filters.normalize_value(value) for value in values}
+    return [value for value in stored if vra_filters.normalize_value(value) in wanted]
+
+
+def query_cube(conn, group_by=(), start=None, end=None, airlines=None, origins=None, distinct=distinct_values):
+    """Soma voos e cancelamentos do cubo com filtros, agrupando pelas dimensões pedidas
+
+    `start`/`end` são (ano, mês) inclusivos; `airlines` e `origins` são listas
+    de empresas e siglas ICAO, comparadas sem diferenciar maiúsculas.
+    `distinct(conn, coluna)` devolve os valores gravados de uma dimensão; quem
+    consulta muitas vezes pode passar uma versão com cache. Retorna um
+    DataFrame com as colunas de `group_by` seguidas de total e cancelados.
+    """
+    unknown = [column for column in group_by if column not in vra_aggregates.CUBE_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Dimensão desconhecida: {', '.join(unknown)}")
+    where, params = [], []
+    if start is not None:
+        # A condição em `ano` sozinha deixa o SQLite usar os índices por período
+        where.append("ano >= ? AND (ano > ? OR mes >= ?)")
+        params += [start[0], start[0], start[1]]
+    if end is not None:
+        where.append("ano <= ? AND (ano < ? OR mes <= ?)")
+        params += [end[0], end[0], end[1]]
+    for column, values in (('empresa', airlines), ('origem_icao', origins)):
+        if values:
+            matches = _matching_values(distinct(conn, column), values)
+            where.append(f"{column} IN ({', '.join('?' * len(matches))})" if matches else "0")
+            params += matches
+
+    columns = ', '.join(group_by)
+    sql = f"SELECT {columns + ', ' if columns else ''}SUM(total), SUM(cancelados) FROM cube"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if group_by:
+        sql += f" GROUP BY {columns} ORDER BY {columns}"
+    rows = conn.execute(sql, params).fetchall()
+    result = pd.DataFrame(rows, columns=list(group_by) + vra_aggregates.CUBE_MEASURES)
+    return result.fillna(0).astype({measure: 'int64' for measure in vra_aggregates.CUBE_MEASURES})